@@ -0,0 +1,215 @@
+"""
+Compara o custo de escrita dos dois modos de auditoria do banco de dados:
+triggers por linha (FOR EACH ROW) e triggers por comando (FOR EACH
+STATEMENT, com tabelas de transição).
+
+Para cada modo, instala os triggers correspondentes e atualiza
+repetidamente um plano de trabalho com muitas contribuições, medindo o
+tempo de cada atualização e a quantidade de registros de auditoria
+gravados. Os dados criados, inclusive os registros de auditoria, são
+removidos ao final.
+
+Deve ser executado no container da API, com o banco de dados no ar:
+
+    docker compose exec api-pgd sh -c \\
+        "cd /api-pgd && python benchmarks/audit_triggers.py"
+
+Atenção: ao final, os triggers de auditoria ficam instalados conforme
+as variáveis de ambiente DB_AUDIT_LOGS_ENABLED e DB_AUDIT_LOGS_MODE,
+como na inicialização da API.
+"""
+
+import argparse
+import asyncio
+from datetime import date
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+# pylint: disable=wrong-import-position
+from sqlalchemy import delete, select
+from sqlalchemy.sql import text
+
+import crud
+from db_config import (
+    DbContextManager,
+    create_audit_ddl,
+    create_db_and_tables,
+    engine,
+    remove_audit_triggers,
+)
+import models
+import schemas
+
+# unidade autorizadora usada somente pelo benchmark
+COD_UNIDADE_AUTORIZADORA = 99_999
+MATRICULA_SIAPE = "9999999"
+
+
+def build_plano_trabalho(contribuicoes: int) -> schemas.PlanoTrabalhoSchema:
+    """Monta um plano de trabalho com a quantidade de contribuições
+    informada, todas não vinculadas a entregas.
+    """
+    return schemas.PlanoTrabalhoSchema(
+        origem_unidade="SIAPE",
+        cod_unidade_autorizadora=COD_UNIDADE_AUTORIZADORA,
+        id_plano_trabalho="benchmark",
+        status=3,
+        cod_unidade_executora=99,
+        cpf_participante="64635210600",
+        matricula_siape=MATRICULA_SIAPE,
+        cod_unidade_lotacao_participante=99,
+        data_inicio=date(2024, 6, 1),
+        data_termino=date(2024, 6, 15),
+        carga_horaria_disponivel=80,
+        contribuicoes=[
+            schemas.ContribuicaoSchema(
+                id_contribuicao=str(numero),
+                tipo_contribuicao=2,
+                percentual_contribuicao=1,
+            )
+            for numero in range(contribuicoes)
+        ],
+        avaliacoes_registros_execucao=[],
+    )
+
+
+async def count_audit_rows() -> int:
+    """Conta os registros da tabela de auditoria."""
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            text("SELECT count(*) FROM auditoria.auditoria_db;")
+        )
+        return result.scalar_one()
+
+
+async def setup_data(contribuicoes: int):
+    """Cria o participante e o plano de trabalho do benchmark."""
+    await crud.create_participante(
+        DbContextManager(),
+        schemas.ParticipanteSchema(
+            origem_unidade="SIAPE",
+            cod_unidade_autorizadora=COD_UNIDADE_AUTORIZADORA,
+            cod_unidade_lotacao=99,
+            cpf="64635210600",
+            matricula_siape=MATRICULA_SIAPE,
+            cod_unidade_instituidora=1,
+            situacao=1,
+            modalidade_execucao=3,
+            data_assinatura_tcr=date(2024, 6, 1),
+        ),
+    )
+    await crud.create_plano_trabalho(
+        DbContextManager(), build_plano_trabalho(contribuicoes)
+    )
+
+
+async def cleanup_data(primeiro_id_auditoria: int):
+    """Remove os dados do benchmark e os registros de auditoria e de
+    remoção que ele gerou."""
+    async with DbContextManager() as session:
+        async with session.begin():
+            result = await session.execute(
+                select(models.PlanoTrabalho).filter_by(
+                    cod_unidade_autorizadora=COD_UNIDADE_AUTORIZADORA
+                )
+            )
+            for db_plano_trabalho in result.unique().scalars():
+                await session.delete(db_plano_trabalho)
+            await session.flush()
+            await session.execute(
+                delete(models.Participante).filter_by(
+                    cod_unidade_autorizadora=COD_UNIDADE_AUTORIZADORA
+                )
+            )
+            await session.execute(
+                delete(models.RegistroRemovido).filter_by(
+                    cod_unidade_autorizadora=COD_UNIDADE_AUTORIZADORA
+                )
+            )
+            await session.execute(
+                text("DELETE FROM auditoria.auditoria_db WHERE id >= :id;"),
+                {"id": primeiro_id_auditoria},
+            )
+
+
+async def run_mode(mode: str, contribuicoes: int, iterations: int) -> dict:
+    """Executa o benchmark para um modo de auditoria.
+
+    Args:
+        mode (str): modo de auditoria, "row" ou "statement".
+        contribuicoes (int): quantidade de contribuições do plano.
+        iterations (int): quantidade de atualizações medidas.
+
+    Returns:
+        dict: tempos, em milissegundos, e registros de auditoria gravados
+            por atualização.
+    """
+    await create_audit_ddl(mode)
+    async with engine.connect() as conn:
+        primeiro_id = (
+            await conn.execute(
+                text("SELECT coalesce(max(id), 0) + 1 FROM auditoria.auditoria_db;")
+            )
+        ).scalar_one()
+    try:
+        await setup_data(contribuicoes)
+        plano_trabalho = build_plano_trabalho(contribuicoes)
+        registros_antes = await count_audit_rows()
+        tempos = []
+        for _ in range(iterations):
+            inicio = time.perf_counter()
+            await crud.update_plano_trabalho(
+                DbContextManager(), plano_trabalho.model_copy(deep=True)
+            )
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        registros = await count_audit_rows() - registros_antes
+    finally:
+        await cleanup_data(primeiro_id)
+    tempos.sort()
+    return {
+        "mode": mode,
+        "p50": statistics.median(tempos),
+        "p95": tempos[int(0.95 * (len(tempos) - 1))],
+        "mean": statistics.fmean(tempos),
+        "audit_rows": registros / iterations,
+    }
+
+
+async def main(contribuicoes: int, iterations: int):
+    """Executa o benchmark para os dois modos e mostra os resultados."""
+    await create_db_and_tables()
+    resultados = [
+        await run_mode(mode, contribuicoes, iterations)
+        for mode in ("row", "statement")
+    ]
+    print(
+        f"Atualização de plano de trabalho com {contribuicoes} contribuições "
+        f"({iterations} repetições)"
+    )
+    print(f"{'modo':<10} {'p50 (ms)':>10} {'p95 (ms)':>10} {'média (ms)':>11} "
+          f"{'auditoria/atualização':>22}")
+    for resultado in resultados:
+        print(
+            f"{resultado['mode']:<10} {resultado['p50']:>10.2f} "
+            f"{resultado['p95']:>10.2f} {resultado['mean']:>11.2f} "
+            f"{resultado['audit_rows']:>22.0f}"
+        )
+
+    # restaura a configuração de auditoria usada pela API
+    if os.environ.get("DB_AUDIT_LOGS_ENABLED", "False") == "True":
+        await create_audit_ddl(os.environ.get("DB_AUDIT_LOGS_MODE", "row"))
+    else:
+        await remove_audit_triggers()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--contribuicoes", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.contribuicoes, args.iterations))
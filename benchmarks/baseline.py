@@ -0,0 +1,55 @@
+"""
+Gravação e leitura dos resultados de referência (baselines) dos
+benchmarks, em benchmarks/baselines/<nome>.json, junto com os parâmetros
+com que foram medidos.
+"""
+
+import json
+import os
+from typing import Optional
+
+BASELINES_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+
+
+def baseline_path(name: str) -> str:
+    """Caminho do arquivo do baseline."""
+    return os.path.join(BASELINES_DIR, f"{name}.json")
+
+
+def save_baseline(name: str, parametros: dict, resultado: dict):
+    """Grava o resultado como baseline.
+
+    Args:
+        name (str): Nome do baseline, geralmente o do cenário.
+        parametros (dict): Parâmetros com que o resultado foi medido.
+        resultado (dict): Resultado do benchmark.
+    """
+    os.makedirs(BASELINES_DIR, exist_ok=True)
+    with open(baseline_path(name), "w", encoding="utf-8") as file:
+        json.dump({"parametros": parametros, "resultado": resultado}, file, indent=4)
+        file.write("\n")
+    print(f"Baseline gravado em {baseline_path(name)}")
+
+
+def load_baseline(name: str, parametros: dict) -> Optional[dict]:
+    """Lê o resultado do baseline, avisando se ele não existir ou tiver
+    sido medido com outros parâmetros.
+
+    Args:
+        name (str): Nome do baseline.
+        parametros (dict): Parâmetros da medição atual.
+
+    Returns:
+        Optional[dict]: O resultado do baseline, se houver.
+    """
+    if not os.path.exists(baseline_path(name)):
+        print(f"Sem baseline em {baseline_path(name)} para comparação")
+        return None
+    with open(baseline_path(name), "r", encoding="utf-8") as file:
+        baseline = json.load(file)
+    if baseline["parametros"] != parametros:
+        print(
+            "Atenção: baseline medido com outros parâmetros: "
+            f"{baseline['parametros']}"
+        )
+    return baseline["resultado"]
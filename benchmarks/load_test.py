@@ -0,0 +1,413 @@
+"""
+Teste de carga da API com cenários de uso típicos dos sistemas que enviam
+dados ao PGD, sobre a massa de dados de benchmarks/synthetic_data.py.
+
+Cenários:
+
+- reenvio_diario: o reenvio diário, sem alterações, de participantes e
+  planos de trabalho já gravados;
+- fechamento_ciclo: a conclusão e avaliação de planos de trabalho e de
+  planos de entregas. Cada plano é antes reaberto, para que toda conclusão
+  altere de fato os dados;
+- consulta: a leitura de participantes e planos e a consulta periódica
+  das alterações de uma unidade autorizadora.
+
+Para cada operação, mostra a vazão (req/s) e os percentis 50, 95 e 99 da
+latência. Com --salvar-baseline, grava o resultado em
+benchmarks/baselines/<cenário>.json; sem ele, compara o resultado com o
+baseline gravado e termina com erro se a vazão ou o p95 de alguma operação
+piorar além da tolerância.
+
+A massa de dados deve estar carregada com os mesmos parâmetros:
+
+    python benchmarks/synthetic_data.py --carregar
+    python benchmarks/load_test.py reenvio_diario --duracao 60
+
+Os baselines só são comparáveis quando medidos no mesmo equipamento e com
+a mesma configuração da API e do banco de dados.
+"""
+
+import argparse
+import asyncio
+from dataclasses import dataclass, field
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+from baseline import load_baseline, save_baseline
+from synthetic_data import SyntheticData, add_arguments, from_arguments
+
+USER_AGENT = "API PGD load test"
+
+
+@dataclass
+class Resultados:
+    """Latências, em segundos, e erros de cada operação."""
+
+    latencias: dict[str, list[float]] = field(default_factory=dict)
+    erros: dict[str, int] = field(default_factory=dict)
+
+    def registrar(self, operacao: str, segundos: float, sucesso: bool):
+        """Registra uma requisição da operação."""
+        self.latencias.setdefault(operacao, []).append(segundos)
+        if not sucesso:
+            self.erros[operacao] = self.erros.get(operacao, 0) + 1
+
+    def resumo(self, duracao: float) -> dict[str, dict]:
+        """Vazão, percentis em milissegundos e erros de cada operação e do
+        total."""
+        todas = [
+            latencia
+            for latencias in self.latencias.values()
+            for latencia in latencias
+        ]
+        resumo = {}
+        operacoes = [*sorted(self.latencias.items()), ("total", todas)]
+        for operacao, latencias in operacoes:
+            if len(latencias) < 2:
+                continue
+            percentis = statistics.quantiles(latencias, n=100)
+            resumo[operacao] = {
+                "requisicoes": len(latencias),
+                "erros": (
+                    sum(self.erros.values())
+                    if operacao == "total"
+                    else self.erros.get(operacao, 0)
+                ),
+                "req_s": len(latencias) / duracao,
+                "p50_ms": percentis[49] * 1000,
+                "p95_ms": percentis[94] * 1000,
+                "p99_ms": percentis[98] * 1000,
+            }
+        return resumo
+
+
+class Cliente:
+    """Cliente da API autenticado como administrador, que mede cada
+    requisição."""
+
+    def __init__(
+        self,
+        http: httpx.AsyncClient,
+        username: str,
+        password: str,
+        resultados: Resultados,
+    ):
+        self.http = http
+        self.username = username
+        self.password = password
+        self.resultados = resultados
+        self.headers: dict = {}
+
+    async def autenticar(self):
+        """Obtém um novo token de acesso."""
+        response = await self.http.post(
+            "/token",
+            data={"username": self.username, "password": self.password},
+            headers={"User-Agent": USER_AGENT},
+        )
+        response.raise_for_status()
+        self.headers = {
+            "Authorization": f"Bearer {response.json()['access_token']}",
+            "User-Agent": USER_AGENT,
+        }
+
+    async def request(
+        self,
+        operacao: str,
+        method: str,
+        url: str,
+        json_data: Optional[dict] = None,
+        params: Optional[dict] = None,
+    ):
+        """Faz a requisição e registra a sua latência, renovando o token
+        quando expirar."""
+        for tentativa in range(2):
+            inicio = time.perf_counter()
+            response = await self.http.request(
+                method, url, json=json_data, params=params, headers=self.headers
+            )
+            segundos = time.perf_counter() - inicio
+            if response.status_code == 401 and tentativa == 0:
+                await self.autenticar()
+                continue
+            self.resultados.registrar(operacao, segundos, response.is_success)
+            return
+
+
+def url_participante(participante: dict) -> str:
+    """Caminho do participante na API."""
+    return (
+        f"/organizacao/{participante['origem_unidade']}"
+        f"/{participante['cod_unidade_autorizadora']}"
+        f"/{participante['cod_unidade_lotacao']}"
+        f"/participante/{participante['matricula_siape']}"
+    )
+
+
+def url_plano_trabalho(plano_trabalho: dict) -> str:
+    """Caminho do plano de trabalho na API."""
+    return (
+        f"/organizacao/{plano_trabalho['origem_unidade']}"
+        f"/{plano_trabalho['cod_unidade_autorizadora']}"
+        f"/plano_trabalho/{plano_trabalho['id_plano_trabalho']}"
+    )
+
+
+def url_plano_entregas(plano_entregas: dict) -> str:
+    """Caminho do plano de entregas na API."""
+    return (
+        f"/organizacao/{plano_entregas['origem_unidade']}"
+        f"/{plano_entregas['cod_unidade_autorizadora']}"
+        f"/plano_entregas/{plano_entregas['id_plano_entregas']}"
+    )
+
+
+class Cenarios:
+    """Cenários do teste de carga. Cada um executa uma iteração com
+    chaves sorteadas da massa de dados."""
+
+    def __init__(self, data: SyntheticData, rng: random.Random):
+        self.data = data
+        self.rng = rng
+        # somente os planos encerrados podem ser avaliados
+        self.planos_encerrados = sum(
+            1
+            for plano in range(data.planos_trabalho)
+            if data.plano_trabalho(0, 0, plano)["status"] == 4
+        )
+        self.semestres_encerrados = sum(
+            1
+            for semestre in range(data.semestres)
+            if data.plano_entregas(0, 1, semestre)["status"] == 5
+        )
+
+    def sortear_participante(self) -> tuple[int, int]:
+        """Sorteia uma unidade autorizadora e um participante."""
+        return (
+            self.rng.randrange(self.data.unidades),
+            self.rng.randrange(self.data.participantes),
+        )
+
+    async def reenvio_diario(self, cliente: Cliente):
+        """Reenvia, sem alterações, um participante e o seu plano de
+        trabalho mais recente."""
+        unidade, participante = self.sortear_participante()
+        dados_participante = self.data.participante(unidade, participante)
+        plano_trabalho = self.data.plano_trabalho(
+            unidade, participante, self.data.planos_trabalho - 1
+        )
+        await cliente.request(
+            "PUT participante",
+            "PUT",
+            url_participante(dados_participante),
+            dados_participante,
+        )
+        await cliente.request(
+            "PUT plano_trabalho",
+            "PUT",
+            url_plano_trabalho(plano_trabalho),
+            plano_trabalho,
+        )
+
+    async def fechamento_ciclo(self, cliente: Cliente):
+        """Reabre e conclui um plano de trabalho encerrado e, a cada dez
+        iterações em média, um plano de entregas."""
+        if not self.planos_encerrados:
+            raise ValueError("A massa de dados não tem planos encerrados")
+        unidade, participante = self.sortear_participante()
+        plano = self.rng.randrange(self.planos_encerrados)
+        for concluido in (False, True):
+            plano_trabalho = self.data.plano_trabalho(
+                unidade, participante, plano, concluido=concluido
+            )
+            operacao = "concluído" if concluido else "reaberto"
+            await cliente.request(
+                f"PUT plano_trabalho {operacao}",
+                "PUT",
+                url_plano_trabalho(plano_trabalho),
+                plano_trabalho,
+            )
+        if self.semestres_encerrados and self.rng.random() < 0.1:
+            executora = self.rng.randrange(self.data.executoras) + 1
+            semestre = self.rng.randrange(self.semestres_encerrados)
+            for avaliado in (False, True):
+                plano_entregas = self.data.plano_entregas(
+                    unidade, executora, semestre, avaliado=avaliado
+                )
+                operacao = "avaliado" if avaliado else "reaberto"
+                await cliente.request(
+                    f"PUT plano_entregas {operacao}",
+                    "PUT",
+                    url_plano_entregas(plano_entregas),
+                    plano_entregas,
+                )
+
+    async def consulta(self, cliente: Cliente):
+        """Lê um participante, um plano de trabalho e um plano de entregas
+        e consulta as alterações recentes da unidade autorizadora."""
+        unidade, participante = self.sortear_participante()
+        dados_participante = self.data.participante(unidade, participante)
+        plano_trabalho = self.data.plano_trabalho(
+            unidade,
+            participante,
+            self.rng.randrange(self.data.planos_trabalho),
+        )
+        plano_entregas = self.data.plano_entregas(
+            unidade,
+            self.data.cod_unidade_executora(participante),
+            self.rng.randrange(self.data.semestres),
+        )
+        await cliente.request(
+            "GET participante", "GET", url_participante(dados_participante)
+        )
+        await cliente.request(
+            "GET plano_trabalho", "GET", url_plano_trabalho(plano_trabalho)
+        )
+        await cliente.request(
+            "GET plano_entregas", "GET", url_plano_entregas(plano_entregas)
+        )
+        await cliente.request(
+            "GET alteracoes",
+            "GET",
+            f"/organizacao/SIAPE/{self.data.cod_unidade_autorizadora(unidade)}"
+            "/alteracoes",
+            params={"desde": "2024-01-01T00:00:00", "limit": 100},
+        )
+
+
+async def run(
+    cenario: Callable[["Cenarios", Cliente], Awaitable[None]],
+    cenarios: Cenarios,
+    base_url: str,
+    concorrencia: int,
+    duracao: float,
+) -> dict[str, dict]:
+    """Executa o cenário com a concorrência informada durante o tempo
+    informado e resume os resultados."""
+    resultados = Resultados()
+    async with httpx.AsyncClient(
+        base_url=base_url,
+        timeout=60,
+        limits=httpx.Limits(max_connections=concorrencia),
+    ) as http:
+        cliente = Cliente(
+            http,
+            os.environ["API_PGD_ADMIN_USER"],
+            os.environ["API_PGD_ADMIN_PASSWORD"],
+            resultados,
+        )
+        await cliente.autenticar()
+        fim = time.perf_counter() + duracao
+
+        async def worker():
+            while time.perf_counter() < fim:
+                await cenario(cenarios, cliente)
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concorrencia)))
+        return resultados.resumo(time.perf_counter() - inicio)
+
+
+def print_resumo(resumo: dict[str, dict], baseline: Optional[dict]):
+    """Mostra o resumo e, se houver, a variação em relação ao baseline."""
+    print(
+        f"{'operação':<30} {'req':>7} {'erros':>6} {'req/s':>8} "
+        f"{'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9}"
+    )
+    for operacao, valores in resumo.items():
+        linha = (
+            f"{operacao:<30} {valores['requisicoes']:>7} {valores['erros']:>6} "
+            f"{valores['req_s']:>8.1f} {valores['p50_ms']:>9.1f} "
+            f"{valores['p95_ms']:>9.1f} {valores['p99_ms']:>9.1f}"
+        )
+        if baseline and operacao in baseline:
+            anterior = baseline[operacao]
+            linha += (
+                f"   req/s {valores['req_s'] / anterior['req_s'] - 1:+.0%}"
+                f"  p95 {valores['p95_ms'] / anterior['p95_ms'] - 1:+.0%}"
+            )
+        print(linha)
+
+
+def regressoes(
+    resumo: dict[str, dict], baseline: dict[str, dict], tolerancia: float
+) -> list[str]:
+    """Lista as operações cuja vazão ou p95 pioraram além da tolerância."""
+    return [
+        operacao
+        for operacao, valores in resumo.items()
+        if operacao in baseline
+        and (
+            valores["req_s"] < baseline[operacao]["req_s"] * (1 - tolerancia)
+            or valores["p95_ms"] > baseline[operacao]["p95_ms"] * (1 + tolerancia)
+        )
+    ]
+
+
+def main() -> int:
+    """Executa o teste de carga e grava ou compara o baseline.
+
+    Returns:
+        int: Código de saída; 1 se houver regressão em relação ao baseline.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "cenario", choices=["reenvio_diario", "fechamento_ciclo", "consulta"]
+    )
+    parser.add_argument("--base-url", default="http://localhost:5057")
+    parser.add_argument("--concorrencia", type=int, default=20)
+    parser.add_argument("--duracao", type=float, default=60, help="em segundos")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--salvar-baseline", action="store_true")
+    parser.add_argument(
+        "--tolerancia",
+        type=float,
+        default=0.2,
+        help="piora relativa aceita em relação ao baseline",
+    )
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    parametros = {
+        "unidades": args.unidades,
+        "executoras": args.executoras,
+        "participantes": args.participantes,
+        "planos_trabalho": args.planos_trabalho,
+        "concorrencia": args.concorrencia,
+        "duracao": args.duracao,
+    }
+    cenarios = Cenarios(from_arguments(args), random.Random(args.seed))
+    resumo = asyncio.run(
+        run(
+            getattr(Cenarios, args.cenario),
+            cenarios,
+            args.base_url,
+            args.concorrencia,
+            args.duracao,
+        )
+    )
+
+    if args.salvar_baseline:
+        print_resumo(resumo, None)
+        save_baseline(args.cenario, parametros, resumo)
+        return 0
+
+    baseline = load_baseline(args.cenario, parametros)
+    print_resumo(resumo, baseline)
+    if baseline is None:
+        return 0
+    piores = regressoes(resumo, baseline, args.tolerancia)
+    if piores:
+        print(f"Regressão além de {args.tolerancia:.0%}: {', '.join(piores)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,244 @@
+"""
+Mede o custo, por requisição, dos middlewares da API nos endpoints de
+dados, comparando os middlewares ASGI de src/middleware.py com a
+implementação anterior, com @app.middleware("http").
+
+Para cada payload (um plano de trabalho típico e um grande), monta três
+aplicações com um endpoint que devolve o JSON já serializado, sem acesso
+ao banco de dados, e as chama diretamente pela interface ASGI, sem rede:
+
+- sem_middleware: só o endpoint, a referência;
+- app_middleware: com as funções registradas com @app.middleware("http"),
+  como eram antes. Cada uma cria uma tarefa e retransmite o corpo da
+  resposta;
+- asgi: com os middlewares ASGI atuais.
+
+Mostra o tempo de cada requisição, o melhor de várias repetições, e o
+acréscimo em relação à referência, em microssegundos. Como nos demais
+benchmarks, --salvar-baseline grava o resultado em
+benchmarks/baselines/middleware_overhead.json e, sem ele, o resultado é
+comparado com o baseline:
+
+    docker compose exec api-pgd sh -c \\
+        "cd /api-pgd && python benchmarks/middleware_overhead.py"
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from typing import Awaitable, Callable
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive
+
+from baseline import load_baseline, save_baseline
+from schema_validation import plano_trabalho_payload
+
+# pylint: disable=wrong-import-order
+import metrics
+import middleware
+import request_stats
+
+USER_AGENT = b"API PGD middleware benchmark"
+PATH = "/organizacao/SIAPE/1/plano_trabalho/1"
+VARIANTES = ("sem_middleware", "app_middleware", "asgi")
+
+
+def add_app_middlewares(app: FastAPI):
+    """Registra os middlewares como eram antes, com @app.middleware("http")."""
+    # pylint: disable=unused-variable
+
+    @app.middleware("http")
+    async def add_csp_header(
+        request: Request, call_next: Callable[[Request], Awaitable[Response]]
+    ) -> Response:
+        response: Response = await call_next(request)
+        if request.url.path.startswith("/docs") or request.url.path.startswith(
+            "/redoc"
+        ):
+            response.headers[
+                "Content-Security-Policy"
+            ] = middleware.CONTENT_SECURITY_POLICY
+        return response
+
+    @app.middleware("http")
+    async def check_user_agent(
+        request: Request, call_next: Callable[[Request], Awaitable[Response]]
+    ) -> Response:
+        if not request.headers.get("User-Agent", None):
+            return JSONResponse(
+                status_code=400,
+                content={"detail": "User-Agent header is required"},
+            )
+        return await call_next(request)
+
+    @app.middleware("http")
+    async def observe_request_metrics(
+        request: Request, call_next: Callable[[Request], Awaitable[Response]]
+    ) -> Response:
+        start = time.perf_counter()
+        response: Response = await call_next(request)
+        route = request.scope.get("route", None)
+        metrics.observe_request(
+            request.method,
+            getattr(route, "path", "unmatched"),
+            response.status_code,
+            time.perf_counter() - start,
+        )
+        return response
+
+    @app.middleware("http")
+    async def add_request_stats(
+        request: Request, call_next: Callable[[Request], Awaitable[Response]]
+    ) -> Response:
+        with request_stats.track_request() as stats:
+            response: Response = await call_next(request)
+        response.headers["Server-Timing"] = stats.server_timing()
+        if middleware.REQUEST_STATS_LOG_ENABLED:
+            middleware.log_request_stats(request.scope, response.status_code, stats)
+        return response
+
+
+def add_asgi_middlewares(app: FastAPI):
+    """Registra os middlewares ASGI, na mesma ordem da API."""
+    app.add_middleware(middleware.ContentSecurityPolicyMiddleware)
+    app.add_middleware(middleware.UserAgentMiddleware)
+    app.add_middleware(middleware.RequestMetricsMiddleware)
+    app.add_middleware(middleware.RequestStatsMiddleware)
+
+
+def build_app(variante: str, body: bytes) -> FastAPI:
+    """Aplicação com um endpoint de dados que devolve o corpo informado."""
+    app = FastAPI()
+
+    @app.get(PATH)
+    async def get_plano_trabalho() -> Response:
+        return Response(content=body, media_type="application/json")
+
+    if variante == "app_middleware":
+        add_app_middlewares(app)
+    elif variante == "asgi":
+        add_asgi_middlewares(app)
+    return app
+
+
+def make_receive() -> Receive:
+    """Canal de recebimento de uma requisição GET cujo cliente não se
+    desconecta."""
+    messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive() -> Message:
+        if messages:
+            return messages.pop()
+        await asyncio.Event().wait()
+        return {"type": "http.disconnect"}
+
+    return receive
+
+
+async def send(message: Message):
+    """Descarta a resposta."""
+
+
+async def request_time(app: ASGIApp, number: int) -> float:
+    """Tempo médio, em segundos, de number requisições seguidas."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": PATH,
+        "raw_path": PATH.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"api-pgd"), (b"user-agent", USER_AGENT)],
+        "client": ("127.0.0.1", 50000),
+        "server": ("api-pgd", 80),
+    }
+    start = time.perf_counter()
+    for _ in range(number):
+        await app(dict(scope), make_receive(), send)
+    return (time.perf_counter() - start) / number
+
+
+async def best_request_time(app: ASGIApp, number: int, repeat: int) -> float:
+    """Melhor tempo, em microssegundos, de uma requisição."""
+    await request_time(app, number)  # aquecimento
+    return min([await request_time(app, number) for _ in range(repeat)]) * 1e6
+
+
+def run(grande: int, number: int, repeat: int) -> dict[str, float]:
+    """Mede todas as variantes com todos os payloads.
+
+    Args:
+        grande (int): Quantidade de contribuições do payload grande.
+        number (int): Quantidade de requisições de cada medida.
+        repeat (int): Quantidade de repetições de cada medida.
+
+    Returns:
+        dict[str, float]: Tempo de cada requisição, em microssegundos.
+    """
+    payloads = {
+        "plano_trabalho típico": plano_trabalho_payload(10, 4),
+        "plano_trabalho grande": plano_trabalho_payload(grande, min(grande, 365)),
+    }
+    resultado = {}
+    for nome, payload in payloads.items():
+        body = json.dumps(payload).encode()
+        for variante in VARIANTES:
+            resultado[f"{nome} {variante}"] = asyncio.run(
+                best_request_time(build_app(variante, body), number, repeat)
+            )
+    return resultado
+
+
+def main() -> int:
+    """Executa as medidas e grava ou compara o baseline.
+
+    Returns:
+        int: Código de saída; 1 se houver regressão em relação ao baseline.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--grande", type=int, default=1_000)
+    parser.add_argument("--number", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--salvar-baseline", action="store_true")
+    parser.add_argument(
+        "--tolerancia",
+        type=float,
+        default=0.2,
+        help="piora relativa aceita em relação ao baseline",
+    )
+    args = parser.parse_args()
+
+    parametros = {"grande": args.grande}
+    resultado = run(args.grande, args.number, args.repeat)
+    baseline = None if args.salvar_baseline else load_baseline(
+        "middleware_overhead", parametros
+    )
+
+    print(f"{'requisição':<45} {'µs':>10} {'acréscimo µs':>14}")
+    piores = []
+    for medida, tempo in resultado.items():
+        referencia = resultado[medida.rsplit(" ", 1)[0] + " sem_middleware"]
+        linha = f"{medida:<45} {tempo:>10.1f} {tempo - referencia:>14.1f}"
+        if baseline and medida in baseline:
+            linha += f"   {tempo / baseline[medida] - 1:+.0%}"
+            if tempo > baseline[medida] * (1 + args.tolerancia):
+                piores.append(medida)
+        print(linha)
+
+    if args.salvar_baseline:
+        save_baseline("middleware_overhead", parametros, resultado)
+    if piores:
+        print(f"Regressão além de {args.tolerancia:.0%}: {', '.join(piores)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
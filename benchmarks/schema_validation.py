@@ -0,0 +1,178 @@
+"""
+Mede o tempo de validação e de serialização dos schemas dos planos de
+trabalho e de entregas, com payloads pequenos, típicos e grandes.
+
+Essas operações rodam no event loop a cada requisição. Para cada payload,
+mede:
+
+- validacao: PlanoTrabalhoSchema/PlanoEntregasSchema.model_validate, como
+  no corpo de um PUT;
+- validacao_json: o mesmo, a partir do JSON;
+- validacao_sem_regras: o schema de resposta, que não tem os validadores
+  do modelo. A diferença para a validacao é o custo desses validadores;
+- serializacao: model_dump_json, como na resposta.
+
+Mede também cpf_validate, chamada em todo participante e plano de
+trabalho. Os tempos são o melhor de várias repetições, em microssegundos
+por chamada. Como no teste de carga, --salvar-baseline grava o resultado
+em benchmarks/baselines/schema_validation.json e, sem ele, o resultado é
+comparado com o baseline:
+
+    docker compose exec api-pgd sh -c \\
+        "cd /api-pgd && python benchmarks/schema_validation.py"
+"""
+
+import argparse
+from copy import deepcopy
+from datetime import date, timedelta
+import json
+import sys
+import timeit
+from typing import Callable
+
+from baseline import load_baseline, save_baseline
+from synthetic_data import load_template
+
+# pylint: disable=wrong-import-order
+import schemas
+
+
+def plano_trabalho_payload(contribuicoes: int, avaliacoes: int) -> dict:
+    """Plano de trabalho de exemplo com a quantidade informada de
+    contribuições, alternando entre os tipos 1 e 2, e de avaliações de
+    períodos consecutivos de um dia."""
+    data = load_template("plano_trabalho.json")
+    vinculada, nao_vinculada = data["contribuicoes"]
+    data["contribuicoes"] = [
+        {
+            **deepcopy(vinculada if numero % 2 else nao_vinculada),
+            "id_contribuicao": str(numero),
+        }
+        for numero in range(contribuicoes)
+    ]
+    modelo = data["avaliacoes_registros_execucao"][0]
+    data_inicio = date.fromisoformat(data["data_inicio"])
+    data["avaliacoes_registros_execucao"] = []
+    for numero in range(avaliacoes):
+        dia = data_inicio + timedelta(days=numero)
+        data["avaliacoes_registros_execucao"].append(
+            {
+                **modelo,
+                "id_periodo_avaliativo": str(numero),
+                "data_inicio_periodo_avaliativo": dia.isoformat(),
+                "data_fim_periodo_avaliativo": dia.isoformat(),
+                "data_avaliacao_registros_execucao": dia.isoformat(),
+            }
+        )
+    return data
+
+
+def plano_entregas_payload(entregas: int) -> dict:
+    """Plano de entregas de exemplo com a quantidade informada de
+    entregas."""
+    data = load_template("plano_entregas.json")
+    modelo = data["entregas"][0]
+    data["entregas"] = [
+        {**modelo, "id_entrega": str(numero)} for numero in range(entregas)
+    ]
+    return data
+
+
+def payloads(grande: int) -> dict[str, tuple[type, type, dict]]:
+    """Payloads medidos, por nome, com o schema de entrada e o de
+    resposta."""
+    plano_trabalho = (schemas.PlanoTrabalhoSchema, schemas.PlanoTrabalhoResponseSchema)
+    plano_entregas = (schemas.PlanoEntregasSchema, schemas.PlanoEntregasResponseSchema)
+    return {
+        "plano_trabalho pequeno": (*plano_trabalho, plano_trabalho_payload(1, 0)),
+        "plano_trabalho típico": (*plano_trabalho, plano_trabalho_payload(10, 4)),
+        "plano_trabalho grande": (
+            *plano_trabalho,
+            plano_trabalho_payload(grande, min(grande, 365)),
+        ),
+        "plano_entregas pequeno": (*plano_entregas, plano_entregas_payload(1)),
+        "plano_entregas típico": (*plano_entregas, plano_entregas_payload(20)),
+        "plano_entregas grande": (*plano_entregas, plano_entregas_payload(grande)),
+    }
+
+
+def best_time(func: Callable[[], object], repeat: int) -> float:
+    """Melhor tempo, em microssegundos, de uma chamada da função."""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+
+def run(grande: int, repeat: int) -> dict[str, float]:
+    """Mede todas as operações.
+
+    Args:
+        grande (int): Quantidade de contribuições e entregas dos payloads
+            grandes.
+        repeat (int): Quantidade de repetições de cada medida.
+
+    Returns:
+        dict[str, float]: Tempo de cada operação, em microssegundos.
+    """
+    # pylint: disable=cell-var-from-loop
+    resultado = {}
+    for nome, (schema, response_schema, data) in payloads(grande).items():
+        raw = json.dumps(data)
+        instance = schema.model_validate(data)
+        operacoes = {
+            "validacao": lambda: schema.model_validate(data),
+            "validacao_json": lambda: schema.model_validate_json(raw),
+            "validacao_sem_regras": lambda: response_schema.model_validate(data),
+            "serializacao": instance.model_dump_json,
+        }
+        for operacao, func in operacoes.items():
+            resultado[f"{nome} {operacao}"] = best_time(func, repeat)
+    cpf = load_template("participante.json")["cpf"]
+    resultado["cpf_validate"] = best_time(lambda: schemas.cpf_validate(cpf), repeat)
+    return resultado
+
+
+def main() -> int:
+    """Executa as medidas e grava ou compara o baseline.
+
+    Returns:
+        int: Código de saída; 1 se houver regressão em relação ao baseline.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--grande", type=int, default=1_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--salvar-baseline", action="store_true")
+    parser.add_argument(
+        "--tolerancia",
+        type=float,
+        default=0.2,
+        help="piora relativa aceita em relação ao baseline",
+    )
+    args = parser.parse_args()
+
+    parametros = {"grande": args.grande}
+    resultado = run(args.grande, args.repeat)
+    baseline = None if args.salvar_baseline else load_baseline(
+        "schema_validation", parametros
+    )
+
+    print(f"{'operação':<50} {'µs/chamada':>12}")
+    piores = []
+    for operacao, tempo in resultado.items():
+        linha = f"{operacao:<50} {tempo:>12.1f}"
+        if baseline and operacao in baseline:
+            linha += f"   {tempo / baseline[operacao] - 1:+.0%}"
+            if tempo > baseline[operacao] * (1 + args.tolerancia):
+                piores.append(operacao)
+        print(linha)
+
+    if args.salvar_baseline:
+        save_baseline("schema_validation", parametros, resultado)
+    if piores:
+        print(f"Regressão além de {args.tolerancia:.0%}: {', '.join(piores)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,490 @@
+"""
+Gera uma massa de dados sintéticos para os testes de carga e, opcionalmente,
+grava-a no banco de dados.
+
+Os registros são derivados dos exemplos usados nos testes
+(tests/data/participante.json, plano_entregas.json e plano_trabalho.json)
+e passam pelas mesmas validações dos schemas da API: os CPFs têm dígitos
+verificadores válidos, as matrículas SIAPE não repetem um só dígito e os
+planos de um mesmo participante ou unidade executora não se sobrepõem.
+
+A geração é determinística: os mesmos parâmetros produzem sempre os mesmos
+registros, de modo que o teste de carga (benchmarks/load_test.py) sabe
+quais chaves existem no banco sem consultá-lo. As unidades autorizadoras
+sintéticas usam os códigos a partir de 80000, que não aparecem nos testes.
+
+Para gravar 1 milhão de participantes, com 24 planos de trabalho cada,
+no container da API:
+
+    docker compose exec api-pgd sh -c \\
+        "cd /api-pgd && python benchmarks/synthetic_data.py \\
+            --unidades 100 --participantes 10000 --carregar"
+
+Com a auditoria por triggers ativada, cada registro gravado também gera o
+seu registro de auditoria.
+"""
+
+import argparse
+import asyncio
+from copy import deepcopy
+from datetime import date, datetime, timedelta
+from itertools import islice
+import json
+import os
+import sys
+import time
+from typing import Iterable, Iterator, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+# pylint: disable=wrong-import-position
+from sqlalchemy import delete, insert
+
+from db_config import create_db_and_tables, engine
+import models
+import schemas
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "tests", "data")
+
+# códigos das unidades autorizadoras sintéticas: 80000 a 89999
+PRIMEIRA_UNIDADE_AUTORIZADORA = 80_000
+MAX_UNIDADES = 10_000
+INICIO = date(2024, 1, 1)
+DIAS_PLANO_TRABALHO = 15
+BATCH_SIZE = 1_000
+
+
+def load_template(name: str) -> dict:
+    """Lê um dos exemplos de tests/data."""
+    with open(os.path.join(DATA_DIR, name), "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def digitos_variados(digitos: str) -> str:
+    """Acrescenta aos dígitos informados um dígito diferente do primeiro,
+    para que o resultado nunca tenha um só dígito repetido."""
+    return digitos + str((int(digitos[0]) + 1) % 10)
+
+
+def gerar_cpf(numero: int) -> str:
+    """Gera um CPF válido e único para cada número de 0 a 10**8 - 1.
+
+    Args:
+        numero (int): Número sequencial do participante.
+
+    Returns:
+        str: CPF com 11 dígitos, incluindo os verificadores.
+    """
+    cpf = [int(digito) for digito in digitos_variados(f"{numero:08d}")]
+    for i in range(9, 11):
+        value = sum(cpf[num] * ((i + 1) - num) for num in range(0, i))
+        cpf.append(((value * 10) % 11) % 10)
+    return "".join(str(digito) for digito in cpf)
+
+
+def inicio_semestre(semestre: int) -> date:
+    """Data de início do semestre, contado a partir de INICIO."""
+    return date(INICIO.year + semestre // 2, 1 + 6 * (semestre % 2), 1)
+
+
+class SyntheticData:
+    """Massa de dados sintéticos, gerada sob demanda.
+
+    Cada unidade autorizadora tem `executoras` unidades executoras, que
+    também são as unidades de lotação dos seus participantes, e
+    `participantes` participantes distribuídos entre elas. Cada unidade
+    executora tem um plano de entregas por semestre e cada participante
+    tem `planos_trabalho` planos de trabalho consecutivos de 15 dias,
+    todos a partir de INICIO. Os planos já encerrados estão concluídos e
+    avaliados.
+    """
+
+    def __init__(
+        self,
+        unidades: int = 10,
+        executoras: int = 10,
+        participantes: int = 1_000,
+        planos_trabalho: int = 24,
+        hoje: Optional[date] = None,
+    ):
+        if not 1 <= unidades <= MAX_UNIDADES:
+            raise ValueError(f"unidades deve estar entre 1 e {MAX_UNIDADES}")
+        if not 1 <= executoras <= participantes:
+            raise ValueError("executoras deve estar entre 1 e participantes")
+        if participantes > 10**6:
+            raise ValueError("No máximo 1 milhão de participantes por unidade")
+        if unidades * participantes > 10**8:
+            raise ValueError("No máximo 100 milhões de participantes")
+        self.unidades = unidades
+        self.executoras = executoras
+        self.participantes = participantes
+        self.planos_trabalho = planos_trabalho
+        self.hoje = hoje or date.today()
+        self.template_participante = load_template("participante.json")
+        self.template_plano_entregas = load_template("plano_entregas.json")
+        self.template_plano_trabalho = load_template("plano_trabalho.json")
+        ultimo_plano_trabalho = self.periodo_plano_trabalho(planos_trabalho - 1)
+        self.semestres = (
+            (ultimo_plano_trabalho[1].year - INICIO.year) * 2
+            + (ultimo_plano_trabalho[1].month - 1) // 6
+            + 1
+        )
+
+    @staticmethod
+    def cod_unidade_autorizadora(unidade: int) -> int:
+        """Código SIAPE da unidade autorizadora de índice informado."""
+        return PRIMEIRA_UNIDADE_AUTORIZADORA + unidade
+
+    @staticmethod
+    def matricula_siape(participante: int) -> str:
+        """Matrícula SIAPE do participante, única na unidade autorizadora."""
+        return digitos_variados(f"{participante:06d}")
+
+    def cod_unidade_executora(self, participante: int) -> int:
+        """Unidade executora, e de lotação, do participante."""
+        return participante % self.executoras + 1
+
+    @staticmethod
+    def id_plano_entregas(executora: int, semestre: int) -> str:
+        """Identificador do plano de entregas da executora no semestre."""
+        return f"{executora}-{semestre}"
+
+    def id_plano_trabalho(self, participante: int, plano: int) -> str:
+        """Identificador do plano de trabalho, único na unidade
+        autorizadora."""
+        return f"{self.matricula_siape(participante)}-{plano}"
+
+    @staticmethod
+    def periodo_plano_trabalho(plano: int) -> tuple[date, date]:
+        """Datas de início e de término do plano de trabalho de índice
+        informado, consecutivo aos anteriores."""
+        data_inicio = INICIO + timedelta(days=DIAS_PLANO_TRABALHO * plano)
+        return data_inicio, data_inicio + timedelta(days=DIAS_PLANO_TRABALHO - 1)
+
+    def participante(self, unidade: int, participante: int) -> dict:
+        """Participante de índice informado na unidade autorizadora."""
+        data = deepcopy(self.template_participante)
+        executora = self.cod_unidade_executora(participante)
+        data.update(
+            cod_unidade_autorizadora=self.cod_unidade_autorizadora(unidade),
+            cod_unidade_lotacao=executora,
+            cod_unidade_instituidora=executora,
+            cpf=gerar_cpf(unidade * self.participantes + participante),
+            matricula_siape=self.matricula_siape(participante),
+            data_assinatura_tcr=INICIO.isoformat(),
+        )
+        return data
+
+    def plano_entregas(
+        self,
+        unidade: int,
+        executora: int,
+        semestre: int,
+        avaliado: Optional[bool] = None,
+    ) -> dict:
+        """Plano de entregas da unidade executora no semestre.
+
+        Args:
+            unidade (int): Índice da unidade autorizadora.
+            executora (int): Código da unidade executora.
+            semestre (int): Índice do semestre.
+            avaliado (Optional[bool]): Se o plano está avaliado. Por padrão,
+                somente os planos encerrados há cinco dias estão.
+
+        Returns:
+            dict: Plano de entregas no formato da API.
+        """
+        data = deepcopy(self.template_plano_entregas)
+        data_inicio = inicio_semestre(semestre)
+        data_termino = inicio_semestre(semestre + 1) - timedelta(days=1)
+        data_avaliacao = data_termino + timedelta(days=5)
+        if avaliado is None:
+            avaliado = data_avaliacao <= self.hoje
+        data.update(
+            cod_unidade_autorizadora=self.cod_unidade_autorizadora(unidade),
+            cod_unidade_instituidora=executora,
+            cod_unidade_executora=executora,
+            id_plano_entregas=self.id_plano_entregas(executora, semestre),
+            status=5 if avaliado else 3,
+            data_inicio=data_inicio.isoformat(),
+            data_termino=data_termino.isoformat(),
+            avaliacao=data["avaliacao"] if avaliado else None,
+            data_avaliacao=data_avaliacao.isoformat() if avaliado else None,
+        )
+        for entrega in data["entregas"]:
+            entrega["data_entrega"] = data_termino.isoformat()
+        return data
+
+    def plano_trabalho(
+        self,
+        unidade: int,
+        participante: int,
+        plano: int,
+        concluido: Optional[bool] = None,
+    ) -> dict:
+        """Plano de trabalho de índice informado do participante.
+
+        Args:
+            unidade (int): Índice da unidade autorizadora.
+            participante (int): Índice do participante na unidade.
+            plano (int): Índice do plano de trabalho do participante.
+            concluido (Optional[bool]): Se o plano está concluído e
+                avaliado. Por padrão, somente os planos encerrados há
+                cinco dias estão.
+
+        Returns:
+            dict: Plano de trabalho no formato da API.
+        """
+        data = deepcopy(self.template_plano_trabalho)
+        executora = self.cod_unidade_executora(participante)
+        data_inicio, data_termino = self.periodo_plano_trabalho(plano)
+        data_avaliacao = data_termino + timedelta(days=5)
+        if concluido is None:
+            concluido = data_avaliacao <= self.hoje
+        semestre = (data_inicio.year - INICIO.year) * 2 + (data_inicio.month - 1) // 6
+        id_plano_trabalho = self.id_plano_trabalho(participante, plano)
+        cpf = gerar_cpf(unidade * self.participantes + participante)
+        data.update(
+            cod_unidade_autorizadora=self.cod_unidade_autorizadora(unidade),
+            id_plano_trabalho=id_plano_trabalho,
+            status=4 if concluido else 3,
+            cod_unidade_executora=executora,
+            cpf_participante=cpf,
+            matricula_siape=self.matricula_siape(participante),
+            cod_unidade_lotacao_participante=executora,
+            data_inicio=data_inicio.isoformat(),
+            data_termino=data_termino.isoformat(),
+        )
+        for numero, contribuicao in enumerate(data["contribuicoes"]):
+            contribuicao["id_contribuicao"] = f"{id_plano_trabalho}-{numero}"
+            if contribuicao["tipo_contribuicao"] == 1:
+                contribuicao["id_plano_entregas"] = self.id_plano_entregas(
+                    executora, semestre
+                )
+        avaliacao = data["avaliacoes_registros_execucao"][0]
+        avaliacao.update(
+            id_periodo_avaliativo=id_plano_trabalho,
+            data_inicio_periodo_avaliativo=data_inicio.isoformat(),
+            data_fim_periodo_avaliativo=data_termino.isoformat(),
+            data_avaliacao_registros_execucao=data_avaliacao.isoformat(),
+            cpf_participante=cpf,
+        )
+        data["avaliacoes_registros_execucao"] = [avaliacao] if concluido else []
+        return data
+
+    def iter_participantes(self) -> Iterator[dict]:
+        """Todos os participantes, unidade por unidade."""
+        for unidade in range(self.unidades):
+            for participante in range(self.participantes):
+                yield self.participante(unidade, participante)
+
+    def iter_planos_entregas(self) -> Iterator[dict]:
+        """Todos os planos de entregas, unidade por unidade."""
+        for unidade in range(self.unidades):
+            for executora in range(1, self.executoras + 1):
+                for semestre in range(self.semestres):
+                    yield self.plano_entregas(unidade, executora, semestre)
+
+    def iter_planos_trabalho(self) -> Iterator[dict]:
+        """Todos os planos de trabalho, participante por participante."""
+        for unidade in range(self.unidades):
+            for participante in range(self.participantes):
+                for plano in range(self.planos_trabalho):
+                    yield self.plano_trabalho(unidade, participante, plano)
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[list]:
+    """Divide o iterável em listas de até size itens."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def participante_rows(data: dict, agora: datetime) -> dict[str, list[dict]]:
+    """Valida o participante e monta as linhas da sua tabela."""
+    participante = schemas.ParticipanteSchema.model_validate(data)
+    return {"participante": [{**participante.model_dump(), "data_insercao": agora}]}
+
+
+def plano_entregas_rows(data: dict, agora: datetime) -> dict[str, list[dict]]:
+    """Valida o plano de entregas e monta as linhas das suas tabelas."""
+    plano_entregas = schemas.PlanoEntregasSchema.model_validate(data)
+    chave = {
+        "origem_unidade": plano_entregas.origem_unidade,
+        "cod_unidade_autorizadora": plano_entregas.cod_unidade_autorizadora,
+        "id_plano_entregas": plano_entregas.id_plano_entregas,
+    }
+    return {
+        "plano_entregas": [
+            {**plano_entregas.model_dump(exclude={"entregas"}), "data_insercao": agora}
+        ],
+        "entrega": [
+            {**entrega.model_dump(), **chave, "data_insercao": agora}
+            for entrega in plano_entregas.entregas
+        ],
+    }
+
+
+def plano_trabalho_rows(data: dict, agora: datetime) -> dict[str, list[dict]]:
+    """Valida o plano de trabalho e monta as linhas das suas tabelas."""
+    plano_trabalho = schemas.PlanoTrabalhoSchema.model_validate(data)
+    chave = {
+        "origem_unidade_pt": plano_trabalho.origem_unidade,
+        "cod_unidade_autorizadora_pt": plano_trabalho.cod_unidade_autorizadora,
+        "id_plano_trabalho": plano_trabalho.id_plano_trabalho,
+    }
+    return {
+        "plano_trabalho": [
+            {
+                **plano_trabalho.model_dump(
+                    exclude={"contribuicoes", "avaliacoes_registros_execucao"}
+                ),
+                "data_insercao": agora,
+            }
+        ],
+        "contribuicao": [
+            {**contribuicao.model_dump(), **chave, "data_insercao": agora}
+            for contribuicao in plano_trabalho.contribuicoes
+        ],
+        "avaliacao_registros_execucao": [
+            {**avaliacao.model_dump(), **chave, "data_insercao": agora}
+            for avaliacao in plano_trabalho.avaliacoes_registros_execucao
+        ],
+    }
+
+
+TABLES = {
+    "participante": models.Participante,
+    "plano_entregas": models.PlanoEntregas,
+    "entrega": models.Entrega,
+    "plano_trabalho": models.PlanoTrabalho,
+    "contribuicao": models.Contribuicao,
+    "avaliacao_registros_execucao": models.AvaliacaoRegistrosExecucao,
+}
+
+
+async def insert_batches(records: Iterable[dict], build_rows, total: int):
+    """Valida e grava os registros em lotes, uma transação por lote."""
+    gravados = 0
+    inicio = time.perf_counter()
+    for batch in batched(records, BATCH_SIZE):
+        agora = datetime.now()
+        rows: dict[str, list[dict]] = {}
+        for data in batch:
+            for table, table_rows in build_rows(data, agora).items():
+                rows.setdefault(table, []).extend(table_rows)
+        async with engine.begin() as conn:
+            # as tabelas pai vêm antes das filhas no dicionário
+            for table, table_rows in rows.items():
+                if table_rows:
+                    await conn.execute(insert(TABLES[table]), table_rows)
+        gravados += len(batch)
+        por_segundo = gravados / (time.perf_counter() - inicio)
+        print(
+            f"\r  {gravados}/{total} ({por_segundo:.0f}/s)",
+            end="",
+            flush=True,
+        )
+    print()
+
+
+async def remove_synthetic_data():
+    """Remove os dados de todas as unidades autorizadoras sintéticas."""
+    ultima = PRIMEIRA_UNIDADE_AUTORIZADORA + MAX_UNIDADES - 1
+    async with engine.begin() as conn:
+        for model in (models.Contribuicao, models.AvaliacaoRegistrosExecucao):
+            await conn.execute(
+                delete(model).where(
+                    model.cod_unidade_autorizadora_pt.between(
+                        PRIMEIRA_UNIDADE_AUTORIZADORA, ultima
+                    )
+                )
+            )
+        for model in (
+            models.PlanoTrabalho,
+            models.Entrega,
+            models.PlanoEntregas,
+            models.Participante,
+            models.RegistroRemovido,
+        ):
+            await conn.execute(
+                delete(model).where(
+                    model.cod_unidade_autorizadora.between(
+                        PRIMEIRA_UNIDADE_AUTORIZADORA, ultima
+                    )
+                )
+            )
+
+
+async def main(data: SyntheticData, carregar: bool, remover: bool):
+    """Remove e grava no banco de dados os dados sintéticos, conforme
+    solicitado."""
+    await create_db_and_tables()
+    if remover:
+        print("Removendo os dados sintéticos existentes")
+        await remove_synthetic_data()
+    if carregar:
+        total_participantes = data.unidades * data.participantes
+        print("Participantes")
+        await insert_batches(
+            data.iter_participantes(), participante_rows, total_participantes
+        )
+        print("Planos de entregas")
+        await insert_batches(
+            data.iter_planos_entregas(),
+            plano_entregas_rows,
+            data.unidades * data.executoras * data.semestres,
+        )
+        print("Planos de trabalho")
+        await insert_batches(
+            data.iter_planos_trabalho(),
+            plano_trabalho_rows,
+            total_participantes * data.planos_trabalho,
+        )
+    await engine.dispose()
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Acrescenta os parâmetros da massa de dados ao parser, para que o
+    teste de carga use os mesmos."""
+    parser.add_argument("--unidades", type=int, default=10)
+    parser.add_argument(
+        "--executoras", type=int, default=10, help="por unidade autorizadora"
+    )
+    parser.add_argument(
+        "--participantes", type=int, default=1_000, help="por unidade autorizadora"
+    )
+    parser.add_argument(
+        "--planos-trabalho", type=int, default=24, help="por participante"
+    )
+
+
+def from_arguments(args: argparse.Namespace) -> SyntheticData:
+    """Cria a massa de dados com os parâmetros informados."""
+    return SyntheticData(
+        unidades=args.unidades,
+        executoras=args.executoras,
+        participantes=args.participantes,
+        planos_trabalho=args.planos_trabalho,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    add_arguments(parser)
+    parser.add_argument(
+        "--carregar", action="store_true", help="grava os dados no banco de dados"
+    )
+    parser.add_argument(
+        "--remover",
+        action="store_true",
+        help="remove antes os dados sintéticos existentes",
+    )
+    args = parser.parse_args()
+    synthetic_data = from_arguments(args)
+    if not (args.carregar or args.remover):
+        print(json.dumps(synthetic_data.participante(0, 0), indent=4))
+        print(json.dumps(synthetic_data.plano_entregas(0, 1, 0), indent=4))
+        print(json.dumps(synthetic_data.plano_trabalho(0, 0, 0), indent=4))
+    else:
+        asyncio.run(main(synthetic_data, args.carregar, args.remover))
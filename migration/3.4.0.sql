@@ -0,0 +1,306 @@
+-- Migra o esquema do banco de dados da versão 3.3.9 para a versão 3.4.0
+--
+-- Os índices são criados com CONCURRENTLY para não bloquear a escrita nas
+-- tabelas durante a criação e, por isso, não podem rodar dentro de uma
+-- transação.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_plano_trabalho_executora_matricula_periodo
+ON plano_trabalho (
+    origem_unidade,
+    cod_unidade_autorizadora,
+    cod_unidade_executora,
+    matricula_siape,
+    data_inicio,
+    data_termino
+);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_plano_trabalho_matricula
+ON plano_trabalho (origem_unidade, cod_unidade_autorizadora, matricula_siape);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_contribuicao_plano_trabalho
+ON contribuicao (origem_unidade_pt, cod_unidade_autorizadora_pt, id_plano_trabalho);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_avaliacao_registros_execucao_plano_trabalho
+ON avaliacao_registros_execucao (
+    origem_unidade_pt,
+    cod_unidade_autorizadora_pt,
+    id_plano_trabalho
+);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_plano_entregas_executora_periodo
+ON plano_entregas (
+    origem_unidade,
+    cod_unidade_autorizadora,
+    cod_unidade_executora,
+    data_inicio,
+    data_termino
+);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_plano_entregas_data_alteracao
+ON plano_entregas (
+    origem_unidade,
+    cod_unidade_autorizadora,
+    coalesce(data_atualizacao, data_insercao)
+);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_plano_trabalho_data_alteracao
+ON plano_trabalho (
+    origem_unidade,
+    cod_unidade_autorizadora,
+    coalesce(data_atualizacao, data_insercao)
+);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_participante_data_alteracao
+ON participante (
+    origem_unidade,
+    cod_unidade_autorizadora,
+    coalesce(data_atualizacao, data_insercao)
+);
+
+-- Partição legada da auditoria
+--
+-- Os comandos abaixo devem rodar depois da primeira inicialização da API
+-- 3.4.0, que cria a tabela particionada auditoria.auditoria_db e renomeia
+-- a tabela de auditoria existente para auditoria_db_legado, e com o psql,
+-- que executa cada comando gerado por \gexec na sua própria transação.
+--
+-- A tabela legada é anexada como a partição dos registros anteriores à
+-- primeira partição mensal; até lá, esses registros não aparecem nas
+-- consultas da auditoria. Para que a gravação da auditoria não fique
+-- bloqueada enquanto a tabela é lida por inteiro, tudo o que exige essa
+-- leitura é feito antes de anexá-la: o preenchimento das datas nulas, em
+-- lotes, os índices da tabela particionada, com CONCURRENTLY, e uma
+-- restrição CHECK com os limites da partição, validada sem bloquear a
+-- escrita, que dispensa a leitura da tabela em SET NOT NULL e em ATTACH
+-- PARTITION.
+
+SELECT to_regclass('auditoria.auditoria_db_legado') IS NOT NULL
+    AND NOT EXISTS (
+        SELECT FROM pg_inherits
+        WHERE inhrelid = 'auditoria.auditoria_db_legado'::regclass
+    ) AS anexar_legado
+\gset
+
+\if :anexar_legado
+
+-- início da primeira partição mensal, que recebeu os registros gravados
+-- desde a atualização; sem ela, o início do mês corrente
+SELECT coalesce(
+    min(
+        substring(
+            pg_get_expr(p.relpartbound, p.oid) FROM 'FROM \(''([^'']+)''\)'
+        )::timestamptz
+    ),
+    date_trunc('month', now())
+) AS limite_legado
+FROM pg_inherits AS i
+JOIN pg_class AS p ON p.oid = i.inhrelid
+WHERE i.inhparent = 'auditoria.auditoria_db'::regclass
+\gset
+
+SELECT set_config('api_pgd.limite_legado', :'limite_legado', false);
+
+-- registros do mês da atualização gravados antes dela, que pertencem à
+-- partição do mês
+DO $$
+DECLARE
+    limite TIMESTAMPTZ := current_setting('api_pgd.limite_legado');
+    movidos INTEGER;
+BEGIN
+    LOOP
+        WITH lote AS (
+            DELETE FROM auditoria.auditoria_db_legado
+            WHERE id IN (
+                SELECT id FROM auditoria.auditoria_db_legado
+                WHERE data_operacao >= limite
+                LIMIT 10000
+            )
+            RETURNING
+                id, operacao, tabela, registro_antigo, registro_novo,
+                usuario, data_operacao, chave
+        )
+        INSERT INTO auditoria.auditoria_db (
+            id, operacao, tabela, registro_antigo, registro_novo,
+            usuario, data_operacao, chave
+        )
+        SELECT * FROM lote;
+        GET DIAGNOSTICS movidos = ROW_COUNT;
+        COMMIT;
+        EXIT WHEN movidos = 0;
+    END LOOP;
+END;
+$$;
+
+DO $$
+DECLARE
+    atualizados INTEGER;
+BEGIN
+    LOOP
+        UPDATE auditoria.auditoria_db_legado
+        SET data_operacao = 'epoch'
+        WHERE id IN (
+            SELECT id FROM auditoria.auditoria_db_legado
+            WHERE data_operacao IS NULL
+            LIMIT 10000
+        );
+        GET DIAGNOSTICS atualizados = ROW_COUNT;
+        COMMIT;
+        EXIT WHEN atualizados = 0;
+    END LOOP;
+END;
+$$;
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS auditoria_db_legado_id_data_operacao
+ON auditoria.auditoria_db_legado (id, data_operacao);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_auditoria_db_legado_tabela_data_operacao
+ON auditoria.auditoria_db_legado (tabela, data_operacao);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_auditoria_db_legado_chave
+ON auditoria.auditoria_db_legado USING GIN (chave jsonb_path_ops);
+
+ALTER TABLE auditoria.auditoria_db_legado
+DROP CONSTRAINT IF EXISTS ck_auditoria_db_legado_particao;
+
+ALTER TABLE auditoria.auditoria_db_legado
+ADD CONSTRAINT ck_auditoria_db_legado_particao
+CHECK (data_operacao IS NOT NULL AND data_operacao < :'limite_legado')
+NOT VALID;
+
+ALTER TABLE auditoria.auditoria_db_legado
+VALIDATE CONSTRAINT ck_auditoria_db_legado_particao;
+
+-- a partição precisa ser NOT NULL, como a chave primária da tabela
+-- particionada, antes de ser anexada
+ALTER TABLE auditoria.auditoria_db_legado
+ALTER COLUMN data_operacao SET NOT NULL;
+
+ALTER TABLE auditoria.auditoria_db
+ATTACH PARTITION auditoria.auditoria_db_legado
+FOR VALUES FROM (MINVALUE) TO (:'limite_legado');
+
+ALTER TABLE auditoria.auditoria_db_legado
+DROP CONSTRAINT ck_auditoria_db_legado_particao;
+
+\endif
+
+-- Trilhas de auditoria
+--
+-- Como os da partição legada, os comandos abaixo devem rodar com o psql
+-- depois da primeira inicialização da API 3.4.0.
+--
+-- Os registros gravados antes da versão 3.4.0 não têm a chave de negócio
+-- e não aparecem nas trilhas de auditoria enquanto não forem preenchidos,
+-- partição por partição.
+
+CREATE TEMPORARY TABLE chave_auditoria (tabela TEXT PRIMARY KEY, campos TEXT[]);
+
+INSERT INTO chave_auditoria VALUES
+    ('plano_trabalho', '{origem_unidade,cod_unidade_autorizadora,id_plano_trabalho}'),
+    ('plano_entregas', '{origem_unidade,cod_unidade_autorizadora,id_plano_entregas}'),
+    ('participante', '{origem_unidade,cod_unidade_autorizadora,cod_unidade_lotacao,matricula_siape}'),
+    ('users', '{email}'),
+    ('contribuicao', '{origem_unidade=origem_unidade_pt,cod_unidade_autorizadora=cod_unidade_autorizadora_pt,id_plano_trabalho,id_contribuicao}'),
+    ('entrega', '{origem_unidade,cod_unidade_autorizadora,id_plano_entregas,id_entrega}'),
+    ('avaliacao_registros_execucao', '{origem_unidade=origem_unidade_pt,cod_unidade_autorizadora=cod_unidade_autorizadora_pt,id_plano_trabalho,id_periodo_avaliativo}');
+
+SELECT format(
+    'UPDATE %I.%I AS a
+    SET chave = auditoria.fn_chave(coalesce(a.registro_novo, a.registro_antigo), c.campos)
+    FROM chave_auditoria AS c
+    WHERE a.tabela = c.tabela AND a.chave IS NULL',
+    n.nspname,
+    p.relname
+)
+FROM pg_inherits AS i
+JOIN pg_class AS p ON p.oid = i.inhrelid
+JOIN pg_namespace AS n ON n.oid = p.relnamespace
+WHERE i.inhparent = 'auditoria.auditoria_db'::regclass
+\gexec
+
+-- Índices de expressão das trilhas. Como CREATE INDEX CONCURRENTLY não é
+-- aceito em tabelas particionadas, os índices são criados em cada
+-- partição e anexados ao índice da tabela particionada, criado só nela
+-- (ON ONLY). As partições criadas depois recebem os índices
+-- automaticamente.
+
+SELECT format(
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS %I ON %I.%I (
+        (chave ->> ''origem_unidade''),
+        (chave ->> ''cod_unidade_autorizadora''),
+        %s,
+        data_operacao,
+        id
+    )
+    WHERE chave ? %L',
+    format('ix_%s_trilha_%s', p.relname, t.tipo),
+    n.nspname,
+    p.relname,
+    t.expressoes,
+    t.campo
+)
+FROM pg_inherits AS i
+JOIN pg_class AS p ON p.oid = i.inhrelid
+JOIN pg_namespace AS n ON n.oid = p.relnamespace
+CROSS JOIN (
+    VALUES
+        ('plano_trabalho', '(chave ->> ''id_plano_trabalho'')', 'id_plano_trabalho'),
+        ('plano_entregas', '(chave ->> ''id_plano_entregas'')', 'id_plano_entregas'),
+        (
+            'participante',
+            '(chave ->> ''cod_unidade_lotacao''), (chave ->> ''matricula_siape'')',
+            'cod_unidade_lotacao'
+        )
+) AS t (tipo, expressoes, campo)
+WHERE i.inhparent = 'auditoria.auditoria_db'::regclass
+\gexec
+
+CREATE INDEX IF NOT EXISTS ix_auditoria_db_trilha_plano_trabalho
+ON ONLY auditoria.auditoria_db (
+    (chave ->> 'origem_unidade'),
+    (chave ->> 'cod_unidade_autorizadora'),
+    (chave ->> 'id_plano_trabalho'),
+    data_operacao,
+    id
+)
+WHERE chave ? 'id_plano_trabalho';
+
+CREATE INDEX IF NOT EXISTS ix_auditoria_db_trilha_plano_entregas
+ON ONLY auditoria.auditoria_db (
+    (chave ->> 'origem_unidade'),
+    (chave ->> 'cod_unidade_autorizadora'),
+    (chave ->> 'id_plano_entregas'),
+    data_operacao,
+    id
+)
+WHERE chave ? 'id_plano_entregas';
+
+CREATE INDEX IF NOT EXISTS ix_auditoria_db_trilha_participante
+ON ONLY auditoria.auditoria_db (
+    (chave ->> 'origem_unidade'),
+    (chave ->> 'cod_unidade_autorizadora'),
+    (chave ->> 'cod_unidade_lotacao'),
+    (chave ->> 'matricula_siape'),
+    data_operacao,
+    id
+)
+WHERE chave ? 'cod_unidade_lotacao';
+
+SELECT format(
+    'ALTER INDEX auditoria.%I ATTACH PARTITION %I.%I',
+    format('ix_auditoria_db_trilha_%s', t.tipo),
+    n.nspname,
+    format('ix_%s_trilha_%s', p.relname, t.tipo)
+)
+FROM pg_inherits AS i
+JOIN pg_class AS p ON p.oid = i.inhrelid
+JOIN pg_namespace AS n ON n.oid = p.relnamespace
+CROSS JOIN (
+    VALUES ('plano_trabalho'), ('plano_entregas'), ('participante')
+) AS t (tipo)
+WHERE i.inhparent = 'auditoria.auditoria_db'::regclass
+-- partições criadas depois do índice da tabela particionada já têm o seu
+AND to_regclass(
+    format('%I.%I', n.nspname, format('ix_%s_trilha_%s', p.relname, t.tipo))
+) IS NOT NULL
+\gexec
@@ -1,35 +1,69 @@
 """Definição das rotas, endpoints e seu comportamento na API.
 """
 
-from contextlib import asynccontextmanager
-from datetime import date, timedelta
+import asyncio
+from contextlib import asynccontextmanager, suppress
+from datetime import date, datetime, timedelta
 import json
 import logging
 import os
 from textwrap import dedent
-from typing import Annotated, Awaitable, Callable, Union
-
-from fastapi import Depends, FastAPI, HTTPException, status, Header, Request, Response
+import time
+from typing import Annotated, Literal, Optional, Union
+
+from fastapi import (
+    Depends,
+    FastAPI,
+    HTTPException,
+    status,
+    Header,
+    Query,
+    Request,
+    Response,
+)
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi.responses import JSONResponse, RedirectResponse
-from sqlalchemy.exc import IntegrityError, OperationalError
+from fastapi.responses import (
+    FileResponse,
+    JSONResponse,
+    RedirectResponse,
+    StreamingResponse,
+)
+from pydantic import BaseModel
+from sqlalchemy.exc import IntegrityError, OperationalError, SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
+from audit_events import audit_event_buffer
 import crud
 import crud_auth
 from db_config import (
+    apply_schema_changes,
+    check_audit_mode,
     check_db_connection,
-    create_db_and_tables,
-    create_audit_ddl,
-    remove_audit_triggers,
+    maintain_audit_partitions,
     DbContextManager,
+    PrimaryReadDbContextManager,
+    ReadDbContextManager,
+    engine,
     get_db,
+    replica_engine,
 )
 import email_config
+from loop_monitor import EVENT_LOOP_MONITOR_ENABLED, event_loop_monitor
+import metrics
+import middleware
+import profiling
+import request_stats
 import response_schemas
 import schemas
-from util import check_permissions, over_a_year
+import slow_queries
+from util import (
+    NDJSON_MEDIA_TYPE,
+    accepts_ndjson,
+    check_permissions,
+    ndjson_stream,
+    over_a_year,
+)
 
 DEFAULT_TOKEN_EXPIRE_MINS = 30
 ACCESS_TOKEN_EXPIRE_MINUTES = int(
@@ -37,7 +71,20 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(
 )
 TEST_ENVIRONMENT = os.environ.get("TEST_ENVIRONMENT", "False") == "True"
 DB_AUDIT_LOGS_ENABLED = os.environ.get("DB_AUDIT_LOGS_ENABLED", "False") == "True"
+DB_AUDIT_LOGS_MODE = os.environ.get("DB_AUDIT_LOGS_MODE", "row")
+check_audit_mode(DB_AUDIT_LOGS_MODE)
+DB_AUDIT_LOGS_RETENTION_MONTHS = int(
+    os.environ.get("DB_AUDIT_LOGS_RETENTION_MONTHS", 0)
+)
+DB_AUDIT_LOGS_RETENTION_ACTION = os.environ.get(
+    "DB_AUDIT_LOGS_RETENTION_ACTION", "detach"
+)
+AUDIT_PARTITIONS_MONTHS_AHEAD = 3
+AUDIT_PARTITIONS_MAINTENANCE_INTERVAL = timedelta(days=1)
 PT_PE_UPDATE_YEAR_VALIDATION_CUTOFF_DATE = date(2025, 5, 31)
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
 # ## INIT --------------------------------------------------
 
 with open(
@@ -64,20 +111,70 @@ logger = logging.getLogger("uvicorn.error")
 # Inicialização da API
 
 
+async def maintain_audit_partitions_periodically():
+    """Repete diariamente, enquanto a API estiver no ar, a manutenção das
+    partições da tabela de auditoria feita na inicialização."""
+    while True:
+        await asyncio.sleep(AUDIT_PARTITIONS_MAINTENANCE_INTERVAL.total_seconds())
+        try:
+            # todos os workers executam esta tarefa; somente um faz a
+            # manutenção, e os demais a pulam
+            await maintain_audit_partitions(
+                AUDIT_PARTITIONS_MONTHS_AHEAD,
+                DB_AUDIT_LOGS_RETENTION_MONTHS,
+                DB_AUDIT_LOGS_RETENTION_ACTION,
+                skip_if_locked=True,
+            )
+        except SQLAlchemyError as exception:
+            logger.error(
+                "A manutenção das partições de auditoria falhou: %s", exception
+            )
+
+
 @asynccontextmanager
-async def lifespan(application: FastAPI):  # pylint: disable=unused-argument
-    """Executa as rotinas de inicialização da API."""
+async def lifespan(application: FastAPI):
+    """Executa as rotinas de inicialização da API.
+
+    O tempo de inicialização fica registrado no log e em
+    `app.state.startup_seconds`.
+    """
+    startup_start = time.perf_counter()
+    audit_partitions_task = None
     try:
-        await create_db_and_tables()
+        applied = await apply_schema_changes(
+            DB_AUDIT_LOGS_MODE if DB_AUDIT_LOGS_ENABLED else None
+        )
+        logger.info(
+            "DDL de inicialização aplicado: %s", ", ".join(applied) or "nenhum"
+        )
         if DB_AUDIT_LOGS_ENABLED:
-            await create_audit_ddl()
-        else:
-            await remove_audit_triggers()
+            if DB_AUDIT_LOGS_MODE == "aggregate":
+                audit_event_buffer.start()
+            await maintain_audit_partitions(
+                AUDIT_PARTITIONS_MONTHS_AHEAD,
+                DB_AUDIT_LOGS_RETENTION_MONTHS,
+                DB_AUDIT_LOGS_RETENTION_ACTION,
+            )
+            audit_partitions_task = asyncio.create_task(
+                maintain_audit_partitions_periodically()
+            )
         await crud_auth.init_user_admin()
+        if EVENT_LOOP_MONITOR_ENABLED:
+            event_loop_monitor.start()
     except OperationalError as exception:
         logger.error("A inicialização do banco de dados falhou: %s", exception)
         raise exception
+    application.state.startup_seconds = time.perf_counter() - startup_start
+    logger.info(
+        "Inicialização concluída em %.3f s", application.state.startup_seconds
+    )
     yield
+    await event_loop_monitor.stop()
+    await audit_event_buffer.stop()
+    if audit_partitions_task is not None:
+        audit_partitions_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await audit_partitions_task
 
 
 app = FastAPI(
@@ -88,58 +185,29 @@ app = FastAPI(
 )
 
 
-# Middleware
-
-
-@app.middleware("http")
-async def add_csp_header(
-    request: Request, call_next: Callable[[Request], Awaitable[Response]]
-) -> Response:
-    """Adiciona cabeçalho Content-Security-Policy (CSP), definindo de
-    onde os recursos podem ser carregados pelo navegador, às páginas
-    de documentação (/docs na Swagger UI e /redoc na ReDoc).
-
-    As demais rotas não são feitas para ser acessadas por navegadores e por
-    isso não faz diferença existir CSP.
-    """
-    response: Response = await call_next(request)
-    if request.url.path.startswith("/docs") or request.url.path.startswith("/redoc"):
-        response.headers["Content-Security-Policy"] = "; ".join(
-            [
-                "default-src 'self'",
-                "font-src 'self' fonts.gstatic.com",
-                "media-src 'self' data:",
-                "img-src 'self' data: fastapi.tiangolo.com raw.githubusercontent.com cdn.redoc.ly",
-                "script-src 'self' 'unsafe-inline' cdn.jsdelivr.net",
-                "style-src 'self' 'unsafe-inline' cdn.jsdelivr.net fonts.googleapis.com",
-                "worker-src 'self' blob:",
-            ]
-        )
-    return response
+class ApiRoute(profiling.ProfiledRoute, request_stats.TimedRoute):
+    """Rota que delimita as fases de cada requisição para o cabeçalho
+    Server-Timing e encerra o profiling pedido pelo administrador."""
 
 
-@app.middleware("http")
-async def check_user_agent(
-    request: Request, call_next: Callable[[Request], Awaitable[Response]]
-) -> Response:
-    """Verifica se o cabeçalho User-Agent está presente na requisição.
+app.router.route_class = ApiRoute
+for instrumented_engine in (engine, replica_engine):
+    if instrumented_engine is not None:
+        request_stats.instrument_engine(instrumented_engine)
+        slow_queries.instrument_engine(instrumented_engine)
 
-    Args:
-        request (Request): Requisição HTTP.
-        call_next (Callable[[Request], Awaitable[Response]]): próximo
-            callable do middelware.
 
-    Returns:
-        Response: Resposta HTTP.
-    """
-    user_agent = request.headers.get("User-Agent", None)
+# Middleware
 
-    if not user_agent:
-        return JSONResponse(
-            status_code=400,
-            content={"detail": "User-Agent header is required"},
-        )
-    return await call_next(request)
+# ordem inversa à de execução: o último adicionado recebe a requisição
+# primeiro
+app.add_middleware(middleware.ContentSecurityPolicyMiddleware)
+app.add_middleware(middleware.ReplicaConsistencyMiddleware)
+app.add_middleware(middleware.RequestDecompressionMiddleware)
+app.add_middleware(middleware.CompressionMiddleware)
+app.add_middleware(middleware.UserAgentMiddleware)
+app.add_middleware(middleware.RequestMetricsMiddleware)
+app.add_middleware(middleware.RequestStatsMiddleware)
 
 
 # Tratadores de exceções
@@ -202,6 +270,64 @@ async def health_check(db: AsyncSession = Depends(get_db)):
     return {"status": "ok"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics(
+    authorization: Annotated[Optional[str], Header()] = None,
+) -> Response:
+    """Retorna as métricas operacionais da API no formato de texto do
+    Prometheus.
+
+    A rota só existe com a variável de ambiente METRICS_TOKEN definida e
+    exige esse token no cabeçalho Authorization, pois as métricas revelam
+    a carga e o uso da API.
+    """
+    if not metrics.METRICS_TOKEN:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not metrics.is_authorized(authorization):
+        raise HTTPException(
+            status.HTTP_401_UNAUTHORIZED,
+            detail="Token de métricas inválido",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    content, media_type = metrics.latest_metrics()
+    return Response(content, media_type=media_type)
+
+
+@app.get("/profiling/{nome}", include_in_schema=False)
+async def get_profiling(
+    user_logged: Annotated[  # pylint: disable=unused-argument
+        schemas.UsersSchema, Depends(crud_auth.get_current_admin_user)
+    ],
+    nome: str,
+) -> FileResponse:
+    """Retorna o resultado do profiling de uma requisição, cujo nome foi
+    informado no cabeçalho X-Profile da resposta."""
+    try:
+        path = profiling.profile_path(nome)
+    except ValueError as exception:
+        raise HTTPException(
+            status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exception)
+        ) from exception
+    if not os.path.isfile(path):
+        raise HTTPException(
+            status.HTTP_404_NOT_FOUND, detail="Profiling não encontrado"
+        )
+    return FileResponse(
+        path, media_type="text/html" if nome.endswith(".html") else "application/json"
+    )
+
+
+@app.get("/consultas_lentas", include_in_schema=False)
+async def get_consultas_lentas(
+    user_logged: Annotated[  # pylint: disable=unused-argument
+        schemas.UsersSchema, Depends(crud_auth.get_current_admin_user)
+    ],
+) -> list[dict]:
+    """Retorna as consultas lentas registradas por este processo da API,
+    agrupadas por fingerprint, com o último plano de execução de cada uma."""
+    return slow_queries.slow_query_log.summary()
+
+
 @app.get("/robots.txt", include_in_schema=False)
 async def robots_txt() -> Response:
     """Retorna um arquivo robots.txt para orientar crawlers e permitir
@@ -220,6 +346,23 @@ async def robots_txt() -> Response:
     )
 
 
+def record_audit_event(  # pylint: disable=too-many-arguments
+    operacao: Literal["INSERT", "UPDATE"],
+    tipo: str,
+    chave: dict,
+    antes: Optional[BaseModel],
+    depois: BaseModel,
+    user: schemas.UsersSchema,
+):
+    """Registra o evento de auditoria de um agregado, se a auditoria
+    estiver no modo "aggregate".
+    """
+    if audit_event_buffer.started:
+        audit_event_buffer.record(
+            operacao, tipo, chave, antes, depois, usuario=user.email
+        )
+
+
 # ## AUTH --------------------------------------------------
 
 
@@ -235,7 +378,7 @@ async def robots_txt() -> Response:
 )
 async def login_for_access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
-    db: DbContextManager = Depends(DbContextManager),
+    db: DbContextManager = Depends(PrimaryReadDbContextManager),
 ) -> dict:
     """Realiza o login na API usando as credenciais de acesso, obtendo um
     token de acesso."""
@@ -282,10 +425,51 @@ async def get_users(
         schemas.UsersSchema,
         Depends(crud_auth.get_current_admin_user),
     ],
-    db: DbContextManager = Depends(DbContextManager),
+    response: Response,
+    origem_unidade: Optional[schemas.OrigemUnidadeEnum] = None,
+    cod_unidade_autorizadora: Optional[int] = None,
+    disabled: Optional[bool] = None,
+    after_id: Optional[int] = Query(
+        default=None,
+        description="Cursor de paginação: valor do cabeçalho "
+        f"`{NEXT_CURSOR_HEADER}` retornado pela página anterior.",
+    ),
+    limit: Optional[int] = Query(
+        default=None,
+        ge=1,
+        le=MAX_PAGE_SIZE,
+        description="Quantidade máxima de usuários na página. Se omitido, "
+        "retorna todos os usuários.",
+    ),
+    accept: Union[str, None] = Header(default="application/json"),
+    db: DbContextManager = Depends(ReadDbContextManager),
 ) -> list[schemas.UsersGetSchema]:
-    """Obtém a lista de usuários da API."""
-    return await crud_auth.get_all_users(db)
+    """Obtém a lista de usuários da API.
+
+    A lista pode ser filtrada e paginada. Quando houver mais páginas, o
+    cursor para a próxima é informado no cabeçalho `X-Next-Cursor`, que
+    deve ser enviado no parâmetro `after_id`.
+
+    Se o cabeçalho `Accept` for `application/x-ndjson`, todos os usuários
+    que atendem aos filtros são transmitidos, um por linha, à medida em
+    que são lidos do banco de dados.
+    """
+    filters = {
+        "origem_unidade": origem_unidade.value if origem_unidade else None,
+        "cod_unidade_autorizadora": cod_unidade_autorizadora,
+        "disabled": disabled,
+        "after_id": after_id,
+    }
+    if accepts_ndjson(accept):
+        return StreamingResponse(
+            ndjson_stream(crud_auth.stream_users(db, **filters)),
+            media_type=NDJSON_MEDIA_TYPE,
+        )
+
+    users, next_cursor = await crud_auth.get_all_users(db, limit=limit, **filters)
+    if next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = str(next_cursor)
+    return users
 
 
 @app.put(
@@ -336,7 +520,7 @@ async def create_or_update_user(
     response_status = status.HTTP_200_OK
     try:
         # update
-        if await crud_auth.get_user(db, user.email):
+        if db_user := await crud_auth.get_user(db, user.email):
             await crud_auth.update_user(db, user)
         # create
         else:
@@ -348,6 +532,19 @@ async def create_or_update_user(
             detail=f"IntegrityError: {str(exception)}",
         ) from exception
 
+    record_audit_event(
+        "UPDATE" if db_user else "INSERT",
+        "users",
+        {"email": user.email},
+        (
+            schemas.UsersGetSchema.model_validate(db_user.model_dump())
+            if db_user
+            else None
+        ),
+        schemas.UsersGetSchema.model_validate(user.model_dump()),
+        user_logged,
+    )
+
     return JSONResponse(
         content=user.model_dump(exclude=["password"]), status_code=response_status
     )
@@ -373,7 +570,7 @@ async def get_user(
         Depends(crud_auth.get_current_active_user),
     ],
     email: str,
-    db: DbContextManager = Depends(DbContextManager),
+    db: DbContextManager = Depends(ReadDbContextManager),
 ) -> schemas.UsersGetSchema:
     """Retorna os dados cadastrais do usuário da API especificado pelo
     e-mail informado.
@@ -422,7 +619,7 @@ async def get_user(
 )
 async def forgot_password(
     email: str,
-    db: DbContextManager = Depends(DbContextManager),
+    db: DbContextManager = Depends(PrimaryReadDbContextManager),
 ) -> schemas.UsersInputSchema:
     """Dispara o processo de recuperação de senha, enviando um token de
     redefinição de senha ao e-mail informado no cadastro do usuário."""
@@ -498,7 +695,7 @@ async def get_plano_entrega(
     origem_unidade: str,
     cod_unidade_autorizadora: int,
     id_plano_entregas: str,
-    db: DbContextManager = Depends(DbContextManager),
+    db: DbContextManager = Depends(ReadDbContextManager),
 ):
     "Consulta o plano de entregas com o código especificado."
 
@@ -519,6 +716,70 @@ async def get_plano_entrega(
     return db_plano_entrega.__dict__
 
 
+@app.get(
+    "/organizacao/{origem_unidade}/{cod_unidade_autorizadora}/planos_entregas",
+    summary="Lista planos de entregas",
+    tags=["plano de entregas"],
+    response_model=list[schemas.PlanoEntregasListItemSchema],
+    responses=response_schemas.outra_unidade_error,
+)
+async def list_planos_entregas(
+    user: Annotated[schemas.UsersSchema, Depends(crud_auth.get_current_active_user)],
+    origem_unidade: str,
+    cod_unidade_autorizadora: int,
+    response: Response,
+    cod_unidade_executora: Optional[int] = None,
+    status_plano: Optional[schemas.StatusPlanoEntregasEnum] = Query(
+        default=None, alias="status"
+    ),
+    data_inicio: Optional[date] = Query(
+        default=None,
+        description="Traz somente planos cujo período termina nesta data ou depois.",
+    ),
+    data_termino: Optional[date] = Query(
+        default=None,
+        description="Traz somente planos cujo período começa nesta data ou antes.",
+    ),
+    after: Optional[str] = Query(
+        default=None,
+        description="Cursor de paginação: valor do cabeçalho "
+        f"`{NEXT_CURSOR_HEADER}` retornado pela página anterior.",
+    ),
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    include: list[Literal["entregas"]] = Query(
+        default=[],
+        description="Listas de filhos a incluir na resposta. As listas não "
+        "incluídas retornam nulas.",
+    ),
+    db: DbContextManager = Depends(ReadDbContextManager),
+) -> list[schemas.PlanoEntregasListItemSchema]:
+    """Lista os planos de entregas da unidade autorizadora, em ordem de
+    id_plano_entregas.
+
+    Quando houver mais páginas, o cursor para a próxima é informado no
+    cabeçalho `X-Next-Cursor`, que deve ser enviado no parâmetro `after`.
+    """
+
+    # Validações de permissão
+    check_permissions(origem_unidade, cod_unidade_autorizadora, user)
+
+    planos_entregas, next_cursor = await crud.list_planos_entregas(
+        db_session=db,
+        origem_unidade=origem_unidade,
+        cod_unidade_autorizadora=cod_unidade_autorizadora,
+        limit=limit,
+        after=after,
+        cod_unidade_executora=cod_unidade_executora,
+        status=status_plano,
+        data_inicio=data_inicio,
+        data_termino=data_termino,
+        include_entregas="entregas" in include,
+    )
+    if next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return planos_entregas
+
+
 @app.put(
     "/organizacao/{origem_unidade}/{cod_unidade_autorizadora}"
     "/plano_entregas/{id_plano_entregas}",
@@ -612,6 +873,18 @@ async def create_or_update_plano_entregas(
                 db_session=db,
                 plano_entregas=novo_plano_entregas,
             )
+        record_audit_event(
+            "UPDATE" if db_plano_entregas else "INSERT",
+            "plano_entregas",
+            {
+                "origem_unidade": origem_unidade,
+                "cod_unidade_autorizadora": cod_unidade_autorizadora,
+                "id_plano_entregas": id_plano_entregas,
+            },
+            db_plano_entregas,
+            novo_plano_entregas,
+            user,
+        )
         return novo_plano_entregas
     except IntegrityError as exception:
         raise HTTPException(
@@ -641,7 +914,7 @@ async def get_plano_trabalho(
     origem_unidade: str,
     cod_unidade_autorizadora: int,
     id_plano_trabalho: str,
-    db: DbContextManager = Depends(DbContextManager),
+    db: DbContextManager = Depends(ReadDbContextManager),
 ):
     "Consulta o plano de trabalho com o código especificado."
 
@@ -662,6 +935,72 @@ async def get_plano_trabalho(
     return db_plano_trabalho.__dict__
 
 
+@app.get(
+    "/organizacao/{origem_unidade}/{cod_unidade_autorizadora}/planos_trabalho",
+    summary="Lista planos de trabalho",
+    tags=["plano de trabalho"],
+    response_model=list[schemas.PlanoTrabalhoListItemSchema],
+    responses=response_schemas.outra_unidade_error,
+)
+async def list_planos_trabalho(
+    user: Annotated[schemas.UsersSchema, Depends(crud_auth.get_current_active_user)],
+    origem_unidade: str,
+    cod_unidade_autorizadora: int,
+    response: Response,
+    cod_unidade_executora: Optional[int] = None,
+    matricula_siape: Optional[str] = None,
+    status_plano: Optional[schemas.StatusPlanoTrabalhoEnum] = Query(
+        default=None, alias="status"
+    ),
+    data_inicio: Optional[date] = Query(
+        default=None,
+        description="Traz somente planos cujo período termina nesta data ou depois.",
+    ),
+    data_termino: Optional[date] = Query(
+        default=None,
+        description="Traz somente planos cujo período começa nesta data ou antes.",
+    ),
+    after: Optional[str] = Query(
+        default=None,
+        description="Cursor de paginação: valor do cabeçalho "
+        f"`{NEXT_CURSOR_HEADER}` retornado pela página anterior.",
+    ),
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    include: list[Literal["contribuicoes", "avaliacoes_registros_execucao"]] = Query(
+        default=[],
+        description="Listas de filhos a incluir na resposta. As listas não "
+        "incluídas retornam nulas.",
+    ),
+    db: DbContextManager = Depends(ReadDbContextManager),
+) -> list[schemas.PlanoTrabalhoListItemSchema]:
+    """Lista os planos de trabalho da unidade autorizadora, em ordem de
+    id_plano_trabalho.
+
+    Quando houver mais páginas, o cursor para a próxima é informado no
+    cabeçalho `X-Next-Cursor`, que deve ser enviado no parâmetro `after`.
+    """
+
+    # Validações de permissão
+    check_permissions(origem_unidade, cod_unidade_autorizadora, user)
+
+    planos_trabalho, next_cursor = await crud.list_planos_trabalho(
+        db_session=db,
+        origem_unidade=origem_unidade,
+        cod_unidade_autorizadora=cod_unidade_autorizadora,
+        limit=limit,
+        after=after,
+        cod_unidade_executora=cod_unidade_executora,
+        matricula_siape=matricula_siape,
+        status=status_plano,
+        data_inicio=data_inicio,
+        data_termino=data_termino,
+        include=include,
+    )
+    if next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return planos_trabalho
+
+
 @app.put(
     "/organizacao/{origem_unidade}/{cod_unidade_autorizadora}"
     "/plano_trabalho/{id_plano_trabalho}",
@@ -770,6 +1109,18 @@ async def create_or_update_plano_trabalho(
             detail=str(exception),
         ) from exception
 
+    record_audit_event(
+        "UPDATE" if db_plano_trabalho else "INSERT",
+        "plano_trabalho",
+        {
+            "origem_unidade": origem_unidade,
+            "cod_unidade_autorizadora": cod_unidade_autorizadora,
+            "id_plano_trabalho": id_plano_trabalho,
+        },
+        db_plano_trabalho,
+        novo_plano_trabalho,
+        user,
+    )
     return novo_plano_trabalho
 
 
@@ -795,7 +1146,7 @@ async def get_participante(
     cod_unidade_autorizadora: int,
     cod_unidade_lotacao: int,
     matricula_siape: str,
-    db: DbContextManager = Depends(DbContextManager),
+    db: DbContextManager = Depends(ReadDbContextManager),
 ) -> schemas.ParticipanteSchema:
     "Consulta o participante a partir da matricula SIAPE."
 
@@ -895,4 +1246,352 @@ async def create_or_update_participante(
     # retornar os dados gravados como Pydantic
     participante_gravado = schemas.ParticipanteSchema.model_validate(novo_participante)
 
+    record_audit_event(
+        "UPDATE" if db_participante else "INSERT",
+        "participante",
+        {
+            "origem_unidade": origem_unidade,
+            "cod_unidade_autorizadora": cod_unidade_autorizadora,
+            "cod_unidade_lotacao": cod_unidade_lotacao,
+            "matricula_siape": matricula_siape,
+        },
+        db_participante,
+        participante_gravado,
+        user,
+    )
+
     return participante_gravado
+
+
+# ### Exportação ---------------------------------------
+@app.get(
+    "/organizacao/{origem_unidade}/{cod_unidade_autorizadora}/exportacao",
+    summary="Exporta todos os dados da unidade autorizadora",
+    tags=["exportação"],
+    response_class=StreamingResponse,
+    responses={
+        **response_schemas.outra_unidade_error,
+        200: {
+            "description": "Um registro por linha (NDJSON), conforme o "
+            "esquema RegistroExportacaoSchema.",
+            "content": {NDJSON_MEDIA_TYPE: {}},
+        },
+        422: response_schemas.ValidationErrorResponse.docs(
+            examples=response_schemas.value_response_example("Cursor inválido")
+        ),
+    },
+)
+async def export_unidade_autorizadora(
+    user: Annotated[schemas.UsersSchema, Depends(crud_auth.get_current_active_user)],
+    origem_unidade: str,
+    cod_unidade_autorizadora: int,
+    cursor: Optional[str] = Query(
+        default=None,
+        description="Cursor do último registro recebido, para retomar uma "
+        "exportação interrompida a partir do registro seguinte.",
+    ),
+    db: DbContextManager = Depends(ReadDbContextManager),
+) -> StreamingResponse:
+    """Exporta os participantes, os planos de entregas, com suas entregas,
+    e os planos de trabalho, com suas contribuições e avaliações, da
+    unidade autorizadora, nesta ordem.
+
+    A resposta é transmitida em NDJSON à medida em que os dados são lidos,
+    um registro por linha, cada um com o seu `cursor`. Caso a conexão seja
+    interrompida, a exportação pode ser retomada informando no parâmetro
+    `cursor` o valor do último registro recebido.
+    """
+
+    # Validações de permissão
+    check_permissions(origem_unidade, cod_unidade_autorizadora, user)
+
+    after = None
+    if cursor is not None:
+        try:
+            after = crud.parse_export_cursor(cursor)
+        except ValueError as exception:
+            raise HTTPException(
+                status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exception)
+            ) from exception
+
+    return StreamingResponse(
+        ndjson_stream(
+            crud.export_unidade_autorizadora(
+                db_session=db,
+                origem_unidade=origem_unidade,
+                cod_unidade_autorizadora=cod_unidade_autorizadora,
+                after=after,
+            )
+        ),
+        media_type=NDJSON_MEDIA_TYPE,
+    )
+
+
+# ### Feed de alterações ---------------------------------------
+@app.get(
+    "/organizacao/{origem_unidade}/{cod_unidade_autorizadora}/alteracoes",
+    summary="Lista as alterações de dados da unidade autorizadora",
+    tags=["exportação"],
+    response_model=list[schemas.AlteracaoSchema],
+    responses={
+        **response_schemas.outra_unidade_error,
+        422: response_schemas.ValidationErrorResponse.docs(
+            examples=response_schemas.value_response_example("Cursor inválido")
+        ),
+    },
+)
+async def list_alteracoes(
+    user: Annotated[schemas.UsersSchema, Depends(crud_auth.get_current_active_user)],
+    origem_unidade: str,
+    cod_unidade_autorizadora: int,
+    response: Response,
+    desde: Optional[datetime] = Query(
+        default=None,
+        description="Traz somente as alterações posteriores a esta data e "
+        "hora. Ignorado se for informado o `cursor`.",
+    ),
+    cursor: Optional[str] = Query(
+        default=None,
+        description="Cursor da última alteração recebida.",
+    ),
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    # sempre no banco principal: numa réplica atrasada, o cursor passaria
+    # por alterações ainda não replicadas, que nunca seriam mostradas
+    db: DbContextManager = Depends(PrimaryReadDbContextManager),
+) -> list[schemas.AlteracaoSchema]:
+    """Lista, em ordem de alteração, os participantes, planos de entregas e
+    planos de trabalho da unidade autorizadora que foram incluídos,
+    atualizados ou removidos após a data ou o cursor informados.
+
+    Para sincronizar uma cópia dos dados, guarde o `cursor` da última
+    alteração recebida e informe-o na próxima consulta. Registros
+    removidos são informados com `removido` verdadeiro e sem `dados`.
+    Quando houver mais páginas, o cursor para a próxima também é
+    informado no cabeçalho `X-Next-Cursor`.
+    """
+
+    # Validações de permissão
+    check_permissions(origem_unidade, cod_unidade_autorizadora, user)
+
+    after = None
+    if cursor is not None:
+        try:
+            after = crud.parse_change_feed_cursor(cursor)
+        except ValueError as exception:
+            raise HTTPException(
+                status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exception)
+            ) from exception
+    alteracoes, next_cursor = await crud.list_alteracoes(
+        db_session=db,
+        origem_unidade=origem_unidade,
+        cod_unidade_autorizadora=cod_unidade_autorizadora,
+        limit=limit,
+        desde=desde,
+        after=after,
+    )
+    if next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return alteracoes
+
+
+# ### Auditoria ---------------------------------------
+AUDITORIA_RESPONSES = {
+    **response_schemas.not_admin_error,
+    422: response_schemas.ValidationErrorResponse.docs(
+        examples=response_schemas.value_response_example("Cursor inválido")
+    ),
+}
+AUDITORIA_CURSOR_QUERY = Query(
+    default=None,
+    description="Cursor do último registro de auditoria recebido.",
+)
+AUDITORIA_LIMIT_QUERY = Query(
+    default=DEFAULT_PAGE_SIZE,
+    ge=1,
+    le=MAX_PAGE_SIZE,
+    description="Quantidade máxima de registros na página. Ignorado se a "
+    "resposta for transmitida em NDJSON.",
+)
+
+
+async def _auditoria_response(  # pylint: disable=too-many-arguments
+    tipo: str,
+    chave: dict,
+    cursor: Optional[str],
+    limit: int,
+    accept: Optional[str],
+    response: Response,
+    db: DbContextManager,
+) -> Union[list[schemas.RegistroAuditoriaSchema], StreamingResponse]:
+    """Lista ou transmite a trilha de auditoria de um registro, a partir
+    do cursor informado.
+
+    Args:
+        tipo (str): Tipo do registro: uma das chaves de AUDIT_TRAILS.
+        chave (dict): Campos da chave de negócio do registro.
+        cursor (Optional[str]): Cursor do último registro recebido.
+        limit (int): Quantidade máxima de registros na página.
+        accept (Optional[str]): Cabeçalho Accept da requisição.
+        response (Response): Resposta, para o cabeçalho da próxima página.
+        db (DbContextManager): Context manager para a sessão do banco.
+
+    Returns:
+        Union[list[schemas.RegistroAuditoriaSchema], StreamingResponse]:
+            Uma página da trilha ou toda ela transmitida em NDJSON.
+    """
+    after = None
+    if cursor is not None:
+        try:
+            after = crud.parse_auditoria_cursor(cursor)
+        except ValueError as exception:
+            raise HTTPException(
+                status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exception)
+            ) from exception
+
+    if accepts_ndjson(accept):
+        return StreamingResponse(
+            ndjson_stream(crud.stream_auditoria(db, tipo, chave, after)),
+            media_type=NDJSON_MEDIA_TYPE,
+        )
+
+    registros, next_cursor = await crud.list_auditoria(
+        db, tipo, chave, limit, after
+    )
+    if next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return registros
+
+
+@app.get(
+    "/organizacao/{origem_unidade}/{cod_unidade_autorizadora}"
+    "/plano_trabalho/{id_plano_trabalho}/auditoria",
+    summary="Consulta a trilha de auditoria de um plano de trabalho",
+    tags=["auditoria"],
+    response_model=list[schemas.RegistroAuditoriaSchema],
+    responses=AUDITORIA_RESPONSES,
+)
+async def get_auditoria_plano_trabalho(
+    user_logged: Annotated[  # pylint: disable=unused-argument
+        schemas.UsersSchema, Depends(crud_auth.get_current_admin_user)
+    ],
+    origem_unidade: str,
+    cod_unidade_autorizadora: int,
+    id_plano_trabalho: str,
+    response: Response,
+    cursor: Optional[str] = AUDITORIA_CURSOR_QUERY,
+    limit: int = AUDITORIA_LIMIT_QUERY,
+    accept: Union[str, None] = Header(default="application/json"),
+    db: DbContextManager = Depends(ReadDbContextManager),
+) -> list[schemas.RegistroAuditoriaSchema]:
+    """Lista, em ordem de operação, os registros de auditoria do plano de
+    trabalho e das suas contribuições e avaliações de registros de
+    execução.
+
+    Quando houver mais páginas, o cursor para a próxima é informado no
+    cabeçalho `X-Next-Cursor`. Se o cabeçalho `Accept` for
+    `application/x-ndjson`, toda a trilha a partir do cursor é
+    transmitida, um registro por linha.
+    """
+    return await _auditoria_response(
+        "plano_trabalho",
+        {
+            "origem_unidade": origem_unidade,
+            "cod_unidade_autorizadora": cod_unidade_autorizadora,
+            "id_plano_trabalho": id_plano_trabalho,
+        },
+        cursor,
+        limit,
+        accept,
+        response,
+        db,
+    )
+
+
+@app.get(
+    "/organizacao/{origem_unidade}/{cod_unidade_autorizadora}"
+    "/plano_entregas/{id_plano_entregas}/auditoria",
+    summary="Consulta a trilha de auditoria de um plano de entregas",
+    tags=["auditoria"],
+    response_model=list[schemas.RegistroAuditoriaSchema],
+    responses=AUDITORIA_RESPONSES,
+)
+async def get_auditoria_plano_entregas(
+    user_logged: Annotated[  # pylint: disable=unused-argument
+        schemas.UsersSchema, Depends(crud_auth.get_current_admin_user)
+    ],
+    origem_unidade: str,
+    cod_unidade_autorizadora: int,
+    id_plano_entregas: str,
+    response: Response,
+    cursor: Optional[str] = AUDITORIA_CURSOR_QUERY,
+    limit: int = AUDITORIA_LIMIT_QUERY,
+    accept: Union[str, None] = Header(default="application/json"),
+    db: DbContextManager = Depends(ReadDbContextManager),
+) -> list[schemas.RegistroAuditoriaSchema]:
+    """Lista, em ordem de operação, os registros de auditoria do plano de
+    entregas e das suas entregas.
+
+    Quando houver mais páginas, o cursor para a próxima é informado no
+    cabeçalho `X-Next-Cursor`. Se o cabeçalho `Accept` for
+    `application/x-ndjson`, toda a trilha a partir do cursor é
+    transmitida, um registro por linha.
+    """
+    return await _auditoria_response(
+        "plano_entregas",
+        {
+            "origem_unidade": origem_unidade,
+            "cod_unidade_autorizadora": cod_unidade_autorizadora,
+            "id_plano_entregas": id_plano_entregas,
+        },
+        cursor,
+        limit,
+        accept,
+        response,
+        db,
+    )
+
+
+@app.get(
+    "/organizacao/{origem_unidade}/{cod_unidade_autorizadora}"
+    "/{cod_unidade_lotacao}/participante/{matricula_siape}/auditoria",
+    summary="Consulta a trilha de auditoria de um participante",
+    tags=["auditoria"],
+    response_model=list[schemas.RegistroAuditoriaSchema],
+    responses=AUDITORIA_RESPONSES,
+)
+async def get_auditoria_participante(
+    user_logged: Annotated[  # pylint: disable=unused-argument
+        schemas.UsersSchema, Depends(crud_auth.get_current_admin_user)
+    ],
+    origem_unidade: str,
+    cod_unidade_autorizadora: int,
+    cod_unidade_lotacao: int,
+    matricula_siape: str,
+    response: Response,
+    cursor: Optional[str] = AUDITORIA_CURSOR_QUERY,
+    limit: int = AUDITORIA_LIMIT_QUERY,
+    accept: Union[str, None] = Header(default="application/json"),
+    db: DbContextManager = Depends(ReadDbContextManager),
+) -> list[schemas.RegistroAuditoriaSchema]:
+    """Lista, em ordem de operação, os registros de auditoria do
+    participante.
+
+    Quando houver mais páginas, o cursor para a próxima é informado no
+    cabeçalho `X-Next-Cursor`. Se o cabeçalho `Accept` for
+    `application/x-ndjson`, toda a trilha a partir do cursor é
+    transmitida, um registro por linha.
+    """
+    return await _auditoria_response(
+        "participante",
+        {
+            "origem_unidade": origem_unidade,
+            "cod_unidade_autorizadora": cod_unidade_autorizadora,
+            "cod_unidade_lotacao": cod_unidade_lotacao,
+            "matricula_siape": matricula_siape,
+        },
+        cursor,
+        limit,
+        accept,
+        response,
+        db,
+    )
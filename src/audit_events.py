@@ -0,0 +1,203 @@
+"""Eventos de auditoria por agregado, gravados pela aplicação.
+
+No modo de auditoria "aggregate", em vez dos triggers que registram cada
+linha incluída ou apagada, a API registra um único evento por operação
+num participante, plano de entregas, plano de trabalho ou usuário, com o
+documento anterior, o novo e o usuário da API que fez a operação.
+
+Os eventos são acumulados numa fila em memória e gravados em lotes por
+uma tarefa em segundo plano, fora do caminho das requisições.
+"""
+
+import asyncio
+from contextlib import suppress
+from datetime import datetime, timezone
+import logging
+import os
+from typing import Literal, Optional
+
+from pydantic import BaseModel
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from db_audit import auditoria_db
+from db_config import engine
+from metrics import AUDIT_EVENTS_DROPPED
+
+AUDIT_EVENTS_BATCH_SIZE = int(os.environ.get("DB_AUDIT_EVENTS_BATCH_SIZE", 500))
+AUDIT_EVENTS_FLUSH_INTERVAL = float(
+    os.environ.get("DB_AUDIT_EVENTS_FLUSH_INTERVAL_SECONDS", 1)
+)
+AUDIT_EVENTS_QUEUE_SIZE = 10_000
+# espera antes de repetir a gravação de um lote que falhou, dobrada a cada
+# nova falha até o máximo, em segundos
+AUDIT_EVENTS_RETRY_DELAY = 1.0
+AUDIT_EVENTS_MAX_RETRY_DELAY = 30.0
+# no encerramento, tentativas de gravar um lote antes de descartá-lo
+AUDIT_EVENTS_STOP_ATTEMPTS = 3
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class AuditEventBuffer:
+    """Fila de eventos de auditoria gravados em lotes.
+
+    Um lote é gravado quando atinge batch_size eventos ou quando se
+    passam flush_interval segundos desde o seu primeiro evento. Um lote
+    cuja gravação falha é mantido e gravado de novo, com esperas
+    crescentes. Quem registra um evento nunca espera: se a fila estiver
+    cheia, o evento é descartado, com um erro no log e na métrica
+    api_pgd_audit_events_dropped_total.
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float, max_size: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+        self.stopping = False
+
+    @property
+    def started(self) -> bool:
+        """Se a tarefa de gravação dos eventos está em execução."""
+        return self.task is not None
+
+    def start(self):
+        """Inicia a tarefa que grava os eventos em segundo plano."""
+        self.queue = asyncio.Queue(maxsize=self.max_size)
+        self.stopping = False
+        self._start_task()
+
+    def _start_task(self):
+        self.task = asyncio.create_task(self._run())
+        self.task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task):
+        """Reinicia a tarefa de gravação se ela terminar antes do
+        encerramento, para que a fila não deixe de ser consumida."""
+        if self.stopping or task.cancelled():
+            return
+        logger.error(
+            "A tarefa de gravação dos eventos de auditoria terminou "
+            "inesperadamente e será reiniciada",
+            exc_info=task.exception(),
+        )
+        self._start_task()
+
+    async def stop(self):
+        """Grava os eventos pendentes e encerra a tarefa de gravação."""
+        if self.task is None:
+            return
+        self.stopping = True
+        # com a fila cheia, a tarefa não está esperando por eventos e
+        # encerra ao esvaziá-la
+        with suppress(asyncio.QueueFull):
+            self.queue.put_nowait(None)
+        await self.task
+        self.queue = None
+        self.task = None
+
+    def record(
+        self,
+        operacao: Literal["INSERT", "UPDATE"],
+        tipo: str,
+        chave: dict,
+        antes: Optional[BaseModel],
+        depois: BaseModel,
+        usuario: str,
+    ):
+        """Registra um evento de auditoria de um agregado.
+
+        Args:
+            operacao (str): "INSERT" na criação e "UPDATE" na substituição.
+            tipo (str): Tipo do agregado, gravado como a tabela do evento.
+            chave (dict): Chave de negócio do agregado.
+            antes (Optional[BaseModel]): Documento anterior, se houver.
+            depois (BaseModel): Documento gravado.
+            usuario (str): Usuário da API que fez a operação.
+        """
+        try:
+            self.queue.put_nowait(
+                {
+                    "operacao": operacao,
+                    "tabela": tipo,
+                    "chave": chave,
+                    "registro_antigo": (
+                        antes.model_dump(mode="json") if antes is not None else None
+                    ),
+                    "registro_novo": depois.model_dump(mode="json"),
+                    "usuario": usuario,
+                    "data_operacao": datetime.now(timezone.utc),
+                }
+            )
+        except asyncio.QueueFull:
+            AUDIT_EVENTS_DROPPED.labels("queue_full").inc()
+            logger.error(
+                "Fila de eventos de auditoria cheia: evento %s de %s %s descartado",
+                operacao,
+                tipo,
+                chave,
+            )
+
+    async def _run(self):
+        """Lê os eventos da fila e grava-os em lotes, até o encerramento."""
+        loop = asyncio.get_running_loop()
+        while not (self.stopping and self.queue.empty()):
+            event = await self.queue.get()
+            if event is None:
+                continue
+            batch = [event]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    event = await asyncio.wait_for(
+                        self.queue.get(), deadline - loop.time()
+                    )
+                except asyncio.TimeoutError:
+                    break
+                if event is None:
+                    break
+                batch.append(event)
+            await self._flush(batch)
+
+    async def _flush(self, batch: list[dict]):
+        """Grava um lote de eventos numa única transação, repetindo a
+        gravação enquanto ela falhar. No encerramento, o lote é descartado
+        depois de AUDIT_EVENTS_STOP_ATTEMPTS tentativas."""
+        attempt = 0
+        while True:
+            try:
+                async with engine.begin() as conn:
+                    await conn.execute(insert(auditoria_db), batch)
+                return
+            except SQLAlchemyError as exception:
+                attempt += 1
+                if self.stopping and attempt >= AUDIT_EVENTS_STOP_ATTEMPTS:
+                    AUDIT_EVENTS_DROPPED.labels("flush").inc(len(batch))
+                    logger.error(
+                        "A gravação de %d eventos de auditoria falhou %d vezes "
+                        "no encerramento e eles foram descartados: %s",
+                        len(batch),
+                        attempt,
+                        exception,
+                    )
+                    return
+                delay = min(
+                    AUDIT_EVENTS_RETRY_DELAY * 2 ** (attempt - 1),
+                    AUDIT_EVENTS_MAX_RETRY_DELAY,
+                )
+                logger.error(
+                    "A gravação de %d eventos de auditoria falhou (tentativa %d) "
+                    "e será repetida em %.1f s: %s",
+                    len(batch),
+                    attempt,
+                    delay,
+                    exception,
+                )
+                await asyncio.sleep(delay)
+
+
+audit_event_buffer = AuditEventBuffer(
+    AUDIT_EVENTS_BATCH_SIZE, AUDIT_EVENTS_FLUSH_INTERVAL, AUDIT_EVENTS_QUEUE_SIZE
+)
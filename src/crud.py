@@ -1,15 +1,38 @@
 """Funções para ler, gravar, atualizar ou apagar dados no banco de dados."""
 
-from datetime import datetime, date
-from typing import Optional
+from datetime import datetime, date, timedelta
+from itertools import chain
+import json
+import os
+from typing import AsyncIterator, Iterable, Optional
 
 from sqlalchemy import select, and_, func
+from sqlalchemy import Boolean, DateTime, String, cast, literal, tuple_, union_all
+from sqlalchemy import Integer, literal_column
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import noload, selectinload
 from sqlalchemy.sql import text
 from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 import models, schemas
-from db_config import DbContextManager, sync_engine
+from db_audit import AUDIT_TRAILS, auditoria_db
+from db_config import DbContextManager, get_sync_engine
+from metrics import observe_query
+from util import decode_cursor, encode_cursor
+
+EXPORT_BATCH_SIZE = 500
+AUDIT_BATCH_SIZE = 1000
+# Alterações mais recentes que esta margem ainda não são mostradas no feed,
+# para que transações em andamento, com data de alteração anterior, não
+# sejam puladas pelo cursor de quem consulta o feed. As datas das
+# alterações (padrão das colunas data_insercao e valor de data_atualizacao),
+# das remoções e o limite do feed vêm todos do relógio do banco de dados
+# (LOCALTIMESTAMP, o início da transação); supõe-se que nenhuma
+# transação de escrita demore mais que a margem entre o início e o commit.
+CHANGE_FEED_SAFETY_MARGIN = timedelta(
+    seconds=float(os.environ.get("CHANGE_FEED_SAFETY_MARGIN_SECONDS", 5))
+)
 
 
 async def get_plano_trabalho(
@@ -44,6 +67,107 @@ async def get_plano_trabalho(
     return None
 
 
+PLANO_TRABALHO_CHILDREN = {
+    "contribuicoes": (
+        models.PlanoTrabalho.contribuicoes,
+        models.Contribuicao.plano_trabalho,
+    ),
+    "avaliacoes_registros_execucao": (
+        models.PlanoTrabalho.avaliacoes_registros_execucao,
+        models.AvaliacaoRegistrosExecucao.plano_trabalho,
+    ),
+}
+
+
+async def list_planos_trabalho(
+    db_session: DbContextManager,
+    origem_unidade: str,
+    cod_unidade_autorizadora: int,
+    limit: int,
+    after: Optional[str] = None,
+    cod_unidade_executora: Optional[int] = None,
+    matricula_siape: Optional[str] = None,
+    status: Optional[int] = None,
+    data_inicio: Optional[date] = None,
+    data_termino: Optional[date] = None,
+    include: Iterable[str] = (),
+) -> tuple[list[schemas.PlanoTrabalhoListItemSchema], Optional[str]]:
+    """Lista uma página de planos de trabalho de uma unidade autorizadora,
+    usando paginação por chave (keyset) sobre o id_plano_trabalho.
+
+    Args:
+        db_session (DbContextManager): Context manager para a sessão async
+            do SQL Alchemy.
+        origem_unidade (str): Código do sistema da unidade: “SIAPE” ou “SIORG”
+        cod_unidade_autorizadora (int): Código da unidade autorizadora.
+        limit (int): Quantidade máxima de planos na página.
+        after (Optional[str]): Cursor da página anterior: traz somente
+            planos com id_plano_trabalho maior que o informado.
+        cod_unidade_executora (Optional[int]): Filtra pela unidade executora.
+        matricula_siape (Optional[str]): Filtra pela matrícula do participante.
+        status (Optional[int]): Filtra pelo status do plano.
+        data_inicio (Optional[date]): Traz somente planos que terminam
+            nesta data ou depois.
+        data_termino (Optional[date]): Traz somente planos que começam
+            nesta data ou antes.
+        include (Iterable[str]): Listas de filhos a carregar, dentre as
+            chaves de PLANO_TRABALHO_CHILDREN. As demais não são lidas
+            do banco e retornam nulas.
+
+    Returns:
+        tuple[list[schemas.PlanoTrabalhoListItemSchema], Optional[str]]:
+            Planos de trabalho da página e o cursor para a próxima página,
+            ou None se esta for a última.
+    """
+    query = (
+        select(models.PlanoTrabalho)
+        .filter_by(origem_unidade=origem_unidade)
+        .filter_by(cod_unidade_autorizadora=cod_unidade_autorizadora)
+        .options(noload(models.PlanoTrabalho.participante))
+        .order_by(models.PlanoTrabalho.id_plano_trabalho)
+        # traz um registro a mais para saber se há próxima página
+        .limit(limit + 1)
+    )
+    if after is not None:
+        query = query.filter(models.PlanoTrabalho.id_plano_trabalho > after)
+    if cod_unidade_executora is not None:
+        query = query.filter_by(cod_unidade_executora=cod_unidade_executora)
+    if matricula_siape is not None:
+        query = query.filter_by(matricula_siape=matricula_siape)
+    if status is not None:
+        query = query.filter_by(status=status)
+    if data_inicio is not None:
+        query = query.filter(models.PlanoTrabalho.data_termino >= data_inicio)
+    if data_termino is not None:
+        query = query.filter(models.PlanoTrabalho.data_inicio <= data_termino)
+    for child, (relationship, back_reference) in PLANO_TRABALHO_CHILDREN.items():
+        if child in include:
+            query = query.options(selectinload(relationship).lazyload(back_reference))
+        else:
+            query = query.options(noload(relationship))
+
+    async with db_session as session:
+        result = await session.execute(query)
+        db_planos_trabalho = result.unique().scalars().all()
+
+    next_cursor = None
+    if len(db_planos_trabalho) > limit:
+        db_planos_trabalho = db_planos_trabalho[:limit]
+        next_cursor = db_planos_trabalho[-1].id_plano_trabalho
+
+    planos_trabalho = []
+    for db_plano_trabalho in db_planos_trabalho:
+        plano_trabalho = schemas.PlanoTrabalhoListItemSchema.model_validate(
+            db_plano_trabalho
+        )
+        for child in PLANO_TRABALHO_CHILDREN:
+            if child not in include:
+                setattr(plano_trabalho, child, None)
+        planos_trabalho.append(plano_trabalho)
+    return planos_trabalho, next_cursor
+
+
+@observe_query
 async def check_planos_trabalho_per_period(
     db_session: DbContextManager,
     origem_unidade: str,
@@ -104,7 +228,6 @@ async def check_planos_trabalho_per_period(
 async def _build_plano_trabalho_model(
     session: AsyncSession,
     plano_trabalho: schemas.PlanoTrabalhoSchema,
-    creation_timestamp: datetime,
 ) -> models.PlanoTrabalho:
     """Cria uma instância do modelo PlanoTrabalho com todas as relações preenchidas,
     como participante, contribuições e avaliações, associando-as corretamente.
@@ -113,13 +236,10 @@ async def _build_plano_trabalho_model(
         session (AsyncSession): sessão async ativa do DbContext.
         plano_trabalho (schemas.PlanoTrabalhoSchema): Objeto Pydantic contendo os
         dados do plano de trabalho a serem persistidos.
-        creation_timestamp (datetime): Timestamp a ser usado como data de criação.
 
     Returns:
         Uma instância do modelo PlanoTrabalho pronta para ser adicionada à sessão."""
 
-    creation_timestamp = datetime.now()
-
     contribuicoes = [
         models.Contribuicao(
             origem_unidade_pt=plano_trabalho.origem_unidade,
@@ -138,7 +258,6 @@ async def _build_plano_trabalho_model(
     plano_trabalho.contribuicoes = []
     plano_trabalho.avaliacoes_registros_execucao = []
     db_plano = models.PlanoTrabalho(**plano_trabalho.model_dump())
-    db_plano.data_insercao = creation_timestamp
 
     # Relacionamento com Participante
     result = await session.execute(
@@ -160,45 +279,63 @@ async def _build_plano_trabalho_model(
     session.add(db_participante)
     db_participante.planos_trabalho.append(db_plano)
 
-    # Relacionamento com Contribuicao
+    # Relacionamento com Contribuicao: as entregas referenciadas pelas
+    # contribuições são buscadas numa única consulta
     for contribuicao in contribuicoes:
-        contribuicao.data_insercao = creation_timestamp
         contribuicao.entrega = None
-        if (
-            contribuicao.tipo_contribuicao == 1
-            and contribuicao.id_plano_entregas
-            and contribuicao.id_entrega
-        ):
-            result = await session.execute(
-                select(models.Entrega)
-                .filter_by(origem_unidade=plano_trabalho.origem_unidade)
-                .filter_by(
-                    cod_unidade_autorizadora=plano_trabalho.cod_unidade_autorizadora
-                )
-                .filter_by(id_plano_entregas=contribuicao.id_plano_entregas)
-                .filter_by(id_entrega=contribuicao.id_entrega)
+    contribuicoes_entregas = [
+        contribuicao
+        for contribuicao in contribuicoes
+        if contribuicao.tipo_contribuicao == 1
+        and contribuicao.id_plano_entregas
+        and contribuicao.id_entrega
+    ]
+    db_entregas = {}
+    if contribuicoes_entregas:
+        chaves_entregas = sorted(
+            {
+                (contribuicao.id_plano_entregas, contribuicao.id_entrega)
+                for contribuicao in contribuicoes_entregas
+            }
+        )
+        result = await session.execute(
+            select(models.Entrega)
+            .filter_by(origem_unidade=plano_trabalho.origem_unidade)
+            .filter_by(
+                cod_unidade_autorizadora=plano_trabalho.cod_unidade_autorizadora
             )
-            db_entrega = result.scalars().unique().one_or_none()
-            if not db_entrega:
-                raise ValueError(
-                    "Contribuição do Plano de Trabalho faz referência a entrega inexistente. "
-                    f"origem_unidade: {plano_trabalho.origem_unidade} "
-                    f"cod_unidade_autorizadora: {plano_trabalho.cod_unidade_autorizadora} "
-                    f"id_plano_entregas: {contribuicao.id_plano_entregas} "
-                    f"id_entrega: {contribuicao.id_entrega}"
-                )
-            contribuicao.entrega = db_entrega
+            .filter(
+                tuple_(
+                    models.Entrega.id_plano_entregas, models.Entrega.id_entrega
+                ).in_(chaves_entregas)
+            )
+        )
+        db_entregas = {
+            (db_entrega.id_plano_entregas, db_entrega.id_entrega): db_entrega
+            for db_entrega in result.scalars().unique()
+        }
+    for contribuicao in contribuicoes_entregas:
+        db_entrega = db_entregas.get(
+            (contribuicao.id_plano_entregas, contribuicao.id_entrega)
+        )
+        if not db_entrega:
+            raise ValueError(
+                "Contribuição do Plano de Trabalho faz referência a entrega inexistente. "
+                f"origem_unidade: {plano_trabalho.origem_unidade} "
+                f"cod_unidade_autorizadora: {plano_trabalho.cod_unidade_autorizadora} "
+                f"id_plano_entregas: {contribuicao.id_plano_entregas} "
+                f"id_entrega: {contribuicao.id_entrega}"
+            )
+        contribuicao.entrega = db_entrega
 
     db_plano.contribuicoes = contribuicoes
 
-    for avaliacao in avaliacoes_registros_execucao:
-        avaliacao.data_insercao = creation_timestamp
-
     db_plano.avaliacoes_registros_execucao = avaliacoes_registros_execucao
 
     return db_plano
 
 
+@observe_query
 async def create_plano_trabalho(
     db_session: DbContextManager,
     plano_trabalho: schemas.PlanoTrabalhoSchema,
@@ -216,10 +353,9 @@ async def create_plano_trabalho(
         schemas.PlanoTrabalhoSchema: Esquema Pydantic do Plano de Trabalho
             com os dados que foram gravados no banco.
     """
-    creation_timestamp = datetime.now()
     async with db_session as session:
         db_plano_trabalho = await _build_plano_trabalho_model(
-            session, plano_trabalho, creation_timestamp
+            session, plano_trabalho
         )
         session.add(db_plano_trabalho)
         try:
@@ -233,6 +369,7 @@ async def create_plano_trabalho(
     return schemas.PlanoTrabalhoSchema.model_validate(db_plano_trabalho)
 
 
+@observe_query
 async def update_plano_trabalho(
     db_session: DbContextManager,
     plano_trabalho: schemas.PlanoTrabalhoSchema,
@@ -253,7 +390,6 @@ async def update_plano_trabalho(
         schemas.PlanoTrabalhoSchema: Esquema Pydantic do Plano de Trabalho
             com o retorno de create_plano_trabalho.
     """
-    creation_timestamp = datetime.now()
     async with db_session as session:
         async with session.begin():
             result = await session.execute(
@@ -269,7 +405,7 @@ async def update_plano_trabalho(
             await session.flush()
 
             db_plano_atualizado = await _build_plano_trabalho_model(
-                session, plano_trabalho, creation_timestamp
+                session, plano_trabalho
             )
             session.add(db_plano_atualizado)
             try:
@@ -316,6 +452,91 @@ async def get_plano_entregas(
     return None
 
 
+async def list_planos_entregas(
+    db_session: DbContextManager,
+    origem_unidade: str,
+    cod_unidade_autorizadora: int,
+    limit: int,
+    after: Optional[str] = None,
+    cod_unidade_executora: Optional[int] = None,
+    status: Optional[int] = None,
+    data_inicio: Optional[date] = None,
+    data_termino: Optional[date] = None,
+    include_entregas: bool = False,
+) -> tuple[list[schemas.PlanoEntregasListItemSchema], Optional[str]]:
+    """Lista uma página de planos de entregas de uma unidade autorizadora,
+    usando paginação por chave (keyset) sobre o id_plano_entregas.
+
+    Args:
+        db_session (DbContextManager): Context manager para a sessão async
+            do SQL Alchemy.
+        origem_unidade (str): origem do código da unidade (SIAPE ou SIORG).
+        cod_unidade_autorizadora (int): Código da unidade autorizadora.
+        limit (int): Quantidade máxima de planos na página.
+        after (Optional[str]): Cursor da página anterior: traz somente
+            planos com id_plano_entregas maior que o informado.
+        cod_unidade_executora (Optional[int]): Filtra pela unidade executora.
+        status (Optional[int]): Filtra pelo status do plano.
+        data_inicio (Optional[date]): Traz somente planos que terminam
+            nesta data ou depois.
+        data_termino (Optional[date]): Traz somente planos que começam
+            nesta data ou antes.
+        include_entregas (bool): Se as entregas devem ser lidas do banco.
+            Caso contrário, retornam nulas.
+
+    Returns:
+        tuple[list[schemas.PlanoEntregasListItemSchema], Optional[str]]:
+            Planos de entregas da página e o cursor para a próxima página,
+            ou None se esta for a última.
+    """
+    query = (
+        select(models.PlanoEntregas)
+        .filter_by(origem_unidade=origem_unidade)
+        .filter_by(cod_unidade_autorizadora=cod_unidade_autorizadora)
+        .order_by(models.PlanoEntregas.id_plano_entregas)
+        # traz um registro a mais para saber se há próxima página
+        .limit(limit + 1)
+    )
+    if after is not None:
+        query = query.filter(models.PlanoEntregas.id_plano_entregas > after)
+    if cod_unidade_executora is not None:
+        query = query.filter_by(cod_unidade_executora=cod_unidade_executora)
+    if status is not None:
+        query = query.filter_by(status=status)
+    if data_inicio is not None:
+        query = query.filter(models.PlanoEntregas.data_termino >= data_inicio)
+    if data_termino is not None:
+        query = query.filter(models.PlanoEntregas.data_inicio <= data_termino)
+    if include_entregas:
+        query = query.options(
+            selectinload(models.PlanoEntregas.entregas).lazyload(
+                models.Entrega.plano_entregas
+            )
+        )
+    else:
+        query = query.options(noload(models.PlanoEntregas.entregas))
+
+    async with db_session as session:
+        result = await session.execute(query)
+        db_planos_entregas = result.unique().scalars().all()
+
+    next_cursor = None
+    if len(db_planos_entregas) > limit:
+        db_planos_entregas = db_planos_entregas[:limit]
+        next_cursor = db_planos_entregas[-1].id_plano_entregas
+
+    planos_entregas = []
+    for db_plano_entregas in db_planos_entregas:
+        plano_entregas = schemas.PlanoEntregasListItemSchema.model_validate(
+            db_plano_entregas
+        )
+        if not include_entregas:
+            plano_entregas.entregas = None
+        planos_entregas.append(plano_entregas)
+    return planos_entregas, next_cursor
+
+
+@observe_query
 async def check_planos_entregas_unidade_per_period(
     db_session: DbContextManager,
     origem_unidade: str,
@@ -372,34 +593,29 @@ async def check_planos_entregas_unidade_per_period(
 
 def _build_plano_entregas_model(
     plano_entregas: schemas.PlanoEntregasSchema,
-    creation_timestamp: datetime,
 ) -> models.PlanoEntregas:
     """Constrói uma instância do modelo PlanoEntregas com suas entregas associadas.
 
     Args:
         plano_entregas (schemas.PlanoEntregasSchema): Objeto Pydantic contendo os dados
         do plano de entregas e suas entregas.
-        creation_timestamp: Timestamp a ser aplicado como data de criação.
 
     Returns:
         Uma instância do modelo PlanoEntregas com as entregas preenchidas e prontas
         para persistência
     """
-    creation_timestamp = datetime.now()
     entregas = [
         models.Entrega(**entrega.model_dump()) for entrega in plano_entregas.entregas
     ]
-    for entrega in entregas:
-        entrega.data_insercao = creation_timestamp
 
     plano_entregas.entregas = []
     db_plano_entregas = models.PlanoEntregas(**plano_entregas.model_dump())
-    db_plano_entregas.data_insercao = creation_timestamp
     db_plano_entregas.entregas = entregas
 
     return db_plano_entregas
 
 
+@observe_query
 async def create_plano_entregas(
     db_session: DbContextManager,
     plano_entregas: schemas.PlanoEntregasSchema,
@@ -417,9 +633,8 @@ async def create_plano_entregas(
         schemas.PlanoEntregasSchema: Esquema Pydantic do Plano de Entregas
             com os dados que foram gravados no banco.
     """
-    creation_timestamp = datetime.now()
-    db_plano_entregas = _build_plano_entregas_model(plano_entregas, creation_timestamp)
     async with db_session as session:
+        db_plano_entregas = _build_plano_entregas_model(plano_entregas)
         for entrega in db_plano_entregas.entregas:
             session.add(entrega)
         session.add(db_plano_entregas)
@@ -428,6 +643,7 @@ async def create_plano_entregas(
     return schemas.PlanoEntregasSchema.model_validate(db_plano_entregas)
 
 
+@observe_query
 async def update_plano_entregas(
     db_session: DbContextManager,
     plano_entregas: schemas.PlanoEntregasSchema,
@@ -448,13 +664,11 @@ async def update_plano_entregas(
         schemas.PlanoEntregasSchema: Esquema Pydantic do Plano de Entregas
             com o retorno de create_plano_entregas.
     """
-    creation_timestamp = datetime.now()
-    db_plano_entregas_atualizado = _build_plano_entregas_model(
-        plano_entregas, creation_timestamp
-    )
-
     async with db_session as session:
         async with session.begin():
+            db_plano_entregas_atualizado = _build_plano_entregas_model(
+                plano_entregas
+            )
             result = await session.execute(
                 select(models.PlanoEntregas)
                 .filter_by(origem_unidade=plano_entregas.origem_unidade)
@@ -518,6 +732,7 @@ async def get_participante(
     return None
 
 
+@observe_query
 async def create_participante(
     db_session: DbContextManager,
     participante: schemas.ParticipanteSchema,
@@ -538,13 +753,13 @@ async def create_participante(
 
     async with db_session as session:
         db_participante = models.Participante(**participante.model_dump())
-        db_participante.data_insercao = datetime.now()
         session.add(db_participante)
         await session.commit()
         await session.refresh(db_participante)
     return schemas.ParticipanteSchema.model_validate(db_participante)
 
 
+@observe_query
 async def update_participante(
     db_session: DbContextManager,
     participante: schemas.ParticipanteSchema,
@@ -577,12 +792,528 @@ async def update_participante(
         db_participante = result.unique().scalar_one()
         for field, value in participante.model_dump().items():
             setattr(db_participante, field, value)
-        db_participante.data_atualizacao = datetime.now()
+        db_participante.data_atualizacao = func.localtimestamp()
         await session.commit()
         await session.refresh(db_participante)
     return schemas.ParticipanteSchema.model_validate(db_participante)
 
 
+# colunas da chave de cada tipo de registro, que formam os cursores
+EXPORT_KEYS = {
+    "participante": (
+        models.Participante.cod_unidade_lotacao,
+        models.Participante.matricula_siape,
+    ),
+    "plano_entregas": (models.PlanoEntregas.id_plano_entregas,),
+    "plano_trabalho": (models.PlanoTrabalho.id_plano_trabalho,),
+}
+
+
+def _valid_key(values: Iterable, columns: Iterable) -> bool:
+    """Verifica se cada valor da chave de um cursor tem o tipo da coluna
+    correspondente, para que valores adulterados resultem em erro de
+    validação e não num erro do banco de dados durante a resposta."""
+    return all(
+        isinstance(value, column.type.python_type) and not isinstance(value, bool)
+        for value, column in zip(values, columns)
+    )
+
+
+def _export_queries(origem_unidade: str, cod_unidade_autorizadora: int) -> dict:
+    """Monta, para cada tipo de registro exportado, a consulta de todos
+    os registros da unidade autorizadora, as colunas da chave usada como
+    cursor e o esquema Pydantic do registro.
+
+    As relações carregadas por padrão com `joined` são substituídas por
+    `selectin`, que é compatível com a leitura em lotes (`yield_per`).
+
+    Args:
+        origem_unidade (str): Código do sistema da unidade: “SIAPE” ou “SIORG”
+        cod_unidade_autorizadora (int): Código da unidade autorizadora.
+
+    Returns:
+        dict: tipo do registro -> (consulta, colunas da chave, esquema).
+    """
+    participante_key = EXPORT_KEYS["participante"]
+    plano_entregas_key = EXPORT_KEYS["plano_entregas"]
+    plano_trabalho_key = EXPORT_KEYS["plano_trabalho"]
+    return {
+        "participante": (
+            select(models.Participante)
+            .filter_by(origem_unidade=origem_unidade)
+            .filter_by(cod_unidade_autorizadora=cod_unidade_autorizadora)
+            .options(noload(models.Participante.planos_trabalho))
+            .order_by(*participante_key),
+            participante_key,
+            schemas.ParticipanteSchema,
+        ),
+        "plano_entregas": (
+            select(models.PlanoEntregas)
+            .filter_by(origem_unidade=origem_unidade)
+            .filter_by(cod_unidade_autorizadora=cod_unidade_autorizadora)
+            .options(
+                selectinload(models.PlanoEntregas.entregas).lazyload(
+                    models.Entrega.plano_entregas
+                )
+            )
+            .order_by(*plano_entregas_key),
+            plano_entregas_key,
+            schemas.PlanoEntregasResponseSchema,
+        ),
+        "plano_trabalho": (
+            select(models.PlanoTrabalho)
+            .filter_by(origem_unidade=origem_unidade)
+            .filter_by(cod_unidade_autorizadora=cod_unidade_autorizadora)
+            .options(
+                noload(models.PlanoTrabalho.participante),
+                *(
+                    selectinload(relationship).lazyload(back_reference)
+                    for relationship, back_reference in (
+                        PLANO_TRABALHO_CHILDREN.values()
+                    )
+                ),
+            )
+            .order_by(*plano_trabalho_key),
+            plano_trabalho_key,
+            schemas.PlanoTrabalhoResponseSchema,
+        ),
+    }
+
+
+EXPORT_TIPOS = tuple(EXPORT_KEYS)
+
+
+def parse_export_cursor(cursor: str) -> list:
+    """Decodifica e valida o cursor de retomada da exportação.
+
+    Args:
+        cursor (str): cursor de um registro exportado.
+
+    Raises:
+        ValueError: Cursor inválido.
+
+    Returns:
+        list: o tipo do registro seguido dos valores da sua chave.
+    """
+    values = decode_cursor(cursor)
+    tipo, *key = values
+    if (
+        not isinstance(tipo, str)
+        or tipo not in EXPORT_KEYS
+        or len(key) != len(EXPORT_KEYS[tipo])
+        or not _valid_key(key, EXPORT_KEYS[tipo])
+    ):
+        raise ValueError("Cursor inválido")
+    return values
+
+
+async def export_unidade_autorizadora(
+    db_session: DbContextManager,
+    origem_unidade: str,
+    cod_unidade_autorizadora: int,
+    after: Optional[list] = None,
+) -> AsyncIterator[schemas.RegistroExportacaoSchema]:
+    """Exporta todos os participantes, planos de entregas e planos de
+    trabalho de uma unidade autorizadora, nesta ordem.
+
+    Os registros são lidos em lotes por meio de cursores do lado do
+    servidor, de modo que o consumo de memória não depende da quantidade
+    de dados. A leitura é feita numa única transação com isolamento
+    REPEATABLE READ, para que a exportação seja um retrato consistente.
+
+    Args:
+        db_session (DbContextManager): Context manager para a sessão async
+            do SQL Alchemy.
+        origem_unidade (str): Código do sistema da unidade: “SIAPE” ou “SIORG”
+        cod_unidade_autorizadora (int): Código da unidade autorizadora.
+        after (Optional[list]): Cursor do último registro recebido,
+            decodificado por `parse_export_cursor`, para retomar a
+            exportação a partir do registro seguinte.
+
+    Yields:
+        schemas.RegistroExportacaoSchema: Um registro exportado.
+    """
+    start_tipo, *after_key = after or (EXPORT_TIPOS[0],)
+    queries = _export_queries(origem_unidade, cod_unidade_autorizadora)
+
+    async with db_session as session:
+        await session.connection(
+            execution_options={"isolation_level": "REPEATABLE READ"}
+        )
+        for tipo in EXPORT_TIPOS[EXPORT_TIPOS.index(start_tipo) :]:
+            query, key_columns, schema = queries[tipo]
+            if tipo == start_tipo and after_key:
+                query = query.filter(tuple_(*key_columns) > tuple(after_key))
+            result = await session.stream_scalars(
+                query.execution_options(yield_per=EXPORT_BATCH_SIZE)
+            )
+            async for db_registro in result:
+                key = (getattr(db_registro, column.key) for column in key_columns)
+                yield schemas.RegistroExportacaoSchema(
+                    tipo=tipo,
+                    cursor=encode_cursor(tipo, *key),
+                    dados=schema.model_validate(db_registro),
+                )
+
+
+CHANGE_FEED_KEYS = {
+    "participante": (
+        models.Participante,
+        ("cod_unidade_lotacao", "matricula_siape"),
+    ),
+    "plano_entregas": (models.PlanoEntregas, ("id_plano_entregas",)),
+    "plano_trabalho": (models.PlanoTrabalho, ("id_plano_trabalho",)),
+}
+
+
+def parse_change_feed_cursor(cursor: str) -> list:
+    """Decodifica e valida o cursor do feed de alterações.
+
+    Args:
+        cursor (str): cursor de uma alteração.
+
+    Raises:
+        ValueError: Cursor inválido.
+
+    Returns:
+        list: data da alteração, tipo e chave do registro.
+    """
+    values = decode_cursor(cursor)
+    if (
+        len(values) != 3
+        or not isinstance(values[1], str)
+        or values[1] not in CHANGE_FEED_KEYS
+    ):
+        raise ValueError("Cursor inválido")
+    data_alteracao, tipo, chave = values
+    try:
+        data_alteracao = datetime.fromisoformat(data_alteracao)
+    except (TypeError, ValueError) as exception:
+        raise ValueError("Cursor inválido") from exception
+    model, key_fields = CHANGE_FEED_KEYS[tipo]
+    if (
+        not isinstance(chave, dict)
+        or set(chave) != set(key_fields)
+        or not _valid_key(
+            (chave[field] for field in key_fields),
+            (getattr(model, field) for field in key_fields),
+        )
+    ):
+        raise ValueError("Cursor inválido")
+    return [data_alteracao, tipo, chave]
+
+
+def _change_feed_query(
+    origem_unidade: str,
+    cod_unidade_autorizadora: int,
+    limit: int,
+    desde: Optional[datetime],
+    after: Optional[list],
+):
+    """Monta a consulta que une as alterações dos três tipos de registro
+    e as remoções, ordenadas pela data da alteração, tipo e chave.
+
+    Cada parte da união é limitada pela data, o que permite o uso dos
+    índices sobre coalesce(data_atualizacao, data_insercao).
+    """
+    if desde is not None and desde.tzinfo is not None:
+        # convertida pelo banco de dados para o fuso horário da sessão, o
+        # mesmo do LOCALTIMESTAMP das datas de alteração
+        desde = func.timezone(
+            func.current_setting("TimeZone"),
+            literal(desde, DateTime(timezone=True)),
+        )
+    if after:
+        after_data_alteracao = after[0]
+    else:
+        after_data_alteracao = desde
+    # no relógio do banco de dados, como as datas das alterações
+    until = func.localtimestamp() - CHANGE_FEED_SAFETY_MARGIN
+
+    branches = []
+    for tipo, (model, key_fields) in CHANGE_FEED_KEYS.items():
+        data_alteracao = func.coalesce(model.data_atualizacao, model.data_insercao)
+        branch = select(
+            cast(literal(tipo), String).label("tipo"),
+            data_alteracao.label("data_alteracao"),
+            func.jsonb_build_object(
+                *chain.from_iterable(
+                    (cast(literal(field), String), getattr(model, field))
+                    for field in key_fields
+                )
+            ).label("chave"),
+            cast(literal(False), Boolean).label("removido"),
+        ).where(
+            model.origem_unidade == origem_unidade,
+            model.cod_unidade_autorizadora == cod_unidade_autorizadora,
+            data_alteracao <= until,
+        )
+        if after_data_alteracao is not None:
+            branch = branch.where(data_alteracao >= after_data_alteracao)
+        branches.append(branch)
+
+    removidos = select(
+        models.RegistroRemovido.tipo,
+        models.RegistroRemovido.data_remocao.label("data_alteracao"),
+        models.RegistroRemovido.chave,
+        cast(literal(True), Boolean).label("removido"),
+    ).where(
+        models.RegistroRemovido.origem_unidade == origem_unidade,
+        models.RegistroRemovido.cod_unidade_autorizadora == cod_unidade_autorizadora,
+        models.RegistroRemovido.data_remocao <= until,
+    )
+    if after_data_alteracao is not None:
+        removidos = removidos.where(
+            models.RegistroRemovido.data_remocao >= after_data_alteracao
+        )
+    branches.append(removidos)
+
+    feed = union_all(*branches).subquery()
+    feed_key = tuple_(feed.c.data_alteracao, feed.c.tipo, feed.c.chave)
+    query = (
+        select(feed)
+        .order_by(feed.c.data_alteracao, feed.c.tipo, feed.c.chave)
+        # traz um registro a mais para saber se há próxima página
+        .limit(limit + 1)
+    )
+    if after:
+        query = query.where(
+            feed_key
+            > tuple_(
+                literal(after[0], DateTime),
+                cast(literal(after[1]), String),
+                cast(literal(json.dumps(after[2])), JSONB),
+            )
+        )
+    elif desde is not None:
+        query = query.where(feed.c.data_alteracao > desde)
+    return query
+
+
+async def list_alteracoes(
+    db_session: DbContextManager,
+    origem_unidade: str,
+    cod_unidade_autorizadora: int,
+    limit: int,
+    desde: Optional[datetime] = None,
+    after: Optional[list] = None,
+) -> tuple[list[schemas.AlteracaoSchema], Optional[str]]:
+    """Lista os participantes, planos de entregas e planos de trabalho da
+    unidade autorizadora incluídos, atualizados ou removidos após a data
+    ou o cursor informados, em ordem de alteração.
+
+    Como as funções update_* apagam e reinserem os planos, a data de
+    inclusão dos planos é a data da sua última alteração. As remoções são
+    lidas da tabela registro_removido, mantida por triggers.
+
+    Args:
+        db_session (DbContextManager): Context manager para a sessão async
+            do SQL Alchemy.
+        origem_unidade (str): Código do sistema da unidade: “SIAPE” ou “SIORG”
+        cod_unidade_autorizadora (int): Código da unidade autorizadora.
+        limit (int): Quantidade máxima de alterações na página.
+        desde (Optional[datetime]): Traz somente alterações posteriores a
+            esta data, no horário do banco de dados se não tiver fuso
+            horário. Ignorado se houver cursor.
+        after (Optional[list]): Cursor da última alteração recebida,
+            decodificado por `parse_change_feed_cursor`.
+
+    Returns:
+        tuple[list[schemas.AlteracaoSchema], Optional[str]]: Alterações da
+            página e o cursor para a próxima página, ou None se esta for a
+            última.
+    """
+    queries = _export_queries(origem_unidade, cod_unidade_autorizadora)
+
+    async with db_session as session:
+        await session.connection(
+            execution_options={"isolation_level": "REPEATABLE READ"}
+        )
+        result = await session.execute(
+            _change_feed_query(
+                origem_unidade, cod_unidade_autorizadora, limit, desde, after
+            )
+        )
+        feed = result.all()
+        has_next_page = len(feed) > limit
+        feed = feed[:limit]
+
+        # lê a versão atual dos registros alterados, um tipo por vez
+        documentos = {}
+        for tipo in CHANGE_FEED_KEYS:
+            query, key_columns, schema = queries[tipo]
+            keys = [
+                tuple(alteracao.chave[column.key] for column in key_columns)
+                for alteracao in feed
+                if alteracao.tipo == tipo and not alteracao.removido
+            ]
+            if not keys:
+                continue
+            result = await session.scalars(
+                query.filter(tuple_(*key_columns).in_(keys))
+            )
+            for db_registro in result:
+                key = tuple(getattr(db_registro, column.key) for column in key_columns)
+                documentos[(tipo, key)] = schema.model_validate(db_registro)
+
+    alteracoes = []
+    for alteracao in feed:
+        key_columns = queries[alteracao.tipo][1]
+        key = tuple(alteracao.chave[column.key] for column in key_columns)
+        alteracoes.append(
+            schemas.AlteracaoSchema(
+                tipo=alteracao.tipo,
+                cursor=encode_cursor(
+                    alteracao.data_alteracao.isoformat(),
+                    alteracao.tipo,
+                    alteracao.chave,
+                ),
+                data_alteracao=alteracao.data_alteracao,
+                removido=alteracao.removido,
+                chave=alteracao.chave,
+                dados=documentos.get((alteracao.tipo, key)),
+            )
+        )
+    next_cursor = alteracoes[-1].cursor if has_next_page else None
+    return alteracoes, next_cursor
+
+
+def parse_auditoria_cursor(cursor: str) -> list:
+    """Decodifica e valida o cursor da trilha de auditoria.
+
+    Args:
+        cursor (str): cursor de um registro de auditoria.
+
+    Raises:
+        ValueError: Cursor inválido.
+
+    Returns:
+        list: data da operação e id do registro de auditoria.
+    """
+    values = decode_cursor(cursor)
+    if (
+        len(values) != 2
+        or not isinstance(values[1], int)
+        or isinstance(values[1], bool)
+    ):
+        raise ValueError("Cursor inválido")
+    try:
+        data_operacao = datetime.fromisoformat(values[0])
+    except (TypeError, ValueError) as exception:
+        raise ValueError("Cursor inválido") from exception
+    return [data_operacao, values[1]]
+
+
+def _auditoria_query(tipo: str, chave: dict, after: Optional[list]):
+    """Monta a consulta da trilha de auditoria de um registro, em ordem
+    de operação.
+
+    Os campos da chave são comparados com as mesmas expressões, com os
+    nomes dos campos como constantes, do índice da trilha, para que ele
+    seja usado também na ordenação.
+    """
+
+    def campo(nome: str):
+        return auditoria_db.c.chave.op("->>")(literal_column(f"'{nome}'"))
+
+    campos = ("origem_unidade", "cod_unidade_autorizadora", *AUDIT_TRAILS[tipo])
+    query = (
+        select(auditoria_db)
+        .where(
+            auditoria_db.c.chave.op("?")(
+                literal_column(f"'{AUDIT_TRAILS[tipo][0]}'")
+            ),
+            *(campo(nome) == str(chave[nome]) for nome in campos),
+        )
+        .order_by(auditoria_db.c.data_operacao, auditoria_db.c.id)
+    )
+    if after:
+        query = query.where(
+            tuple_(auditoria_db.c.data_operacao, auditoria_db.c.id)
+            > tuple_(
+                literal(after[0], DateTime(timezone=True)),
+                literal(after[1], Integer),
+            )
+        )
+    return query
+
+
+def _registro_auditoria(row) -> schemas.RegistroAuditoriaSchema:
+    """Converte uma linha da tabela de auditoria no seu esquema Pydantic."""
+    return schemas.RegistroAuditoriaSchema(
+        cursor=encode_cursor(row.data_operacao.isoformat(), row.id),
+        **row._asdict(),
+    )
+
+
+async def list_auditoria(
+    db_session: DbContextManager,
+    tipo: str,
+    chave: dict,
+    limit: int,
+    after: Optional[list] = None,
+) -> tuple[list[schemas.RegistroAuditoriaSchema], Optional[str]]:
+    """Lista uma página da trilha de auditoria de um participante, plano
+    de entregas ou plano de trabalho, incluindo a dos seus registros
+    filhos.
+
+    Args:
+        db_session (DbContextManager): Context manager para a sessão async
+            do SQL Alchemy.
+        tipo (str): Tipo do registro: uma das chaves de AUDIT_TRAILS.
+        chave (dict): origem_unidade, cod_unidade_autorizadora e os demais
+            campos da chave de negócio do registro.
+        limit (int): Quantidade máxima de registros de auditoria na página.
+        after (Optional[list]): Cursor do último registro recebido,
+            decodificado por `parse_auditoria_cursor`.
+
+    Returns:
+        tuple[list[schemas.RegistroAuditoriaSchema], Optional[str]]:
+            Registros de auditoria da página e o cursor para a próxima
+            página, ou None se esta for a última.
+    """
+    # traz um registro a mais para saber se há próxima página
+    query = _auditoria_query(tipo, chave, after).limit(limit + 1)
+    async with db_session as session:
+        result = await session.execute(query)
+        rows = result.all()
+
+    registros = [_registro_auditoria(row) for row in rows[:limit]]
+    next_cursor = registros[-1].cursor if len(rows) > limit else None
+    return registros, next_cursor
+
+
+async def stream_auditoria(
+    db_session: DbContextManager,
+    tipo: str,
+    chave: dict,
+    after: Optional[list] = None,
+) -> AsyncIterator[schemas.RegistroAuditoriaSchema]:
+    """Transmite toda a trilha de auditoria de um registro a partir do
+    cursor informado, lendo-a em lotes por meio de um cursor do lado do
+    servidor.
+
+    Args:
+        db_session (DbContextManager): Context manager para a sessão async
+            do SQL Alchemy.
+        tipo (str): Tipo do registro: uma das chaves de AUDIT_TRAILS.
+        chave (dict): origem_unidade, cod_unidade_autorizadora e os demais
+            campos da chave de negócio do registro.
+        after (Optional[list]): Cursor do último registro recebido,
+            decodificado por `parse_auditoria_cursor`.
+
+    Yields:
+        schemas.RegistroAuditoriaSchema: Um registro de auditoria.
+    """
+    query = _auditoria_query(tipo, chave, after).execution_options(
+        yield_per=AUDIT_BATCH_SIZE
+    )
+    async with db_session as session:
+        result = await session.stream(query)
+        async for row in result:
+            yield _registro_auditoria(row)
+
+
 # The following methods are only for test in CI/CD environment
 
 
@@ -590,7 +1321,7 @@ def truncate_plano_entregas():
     """Apaga a tabela plano_entregas.
     Usado no ambiente de testes de integração contínua.
     """
-    with sync_engine.connect() as conn:
+    with get_sync_engine().connect() as conn:
         result = conn.execute(text("TRUNCATE plano_entregas, entrega CASCADE;"))
         conn.commit()
     return result
@@ -600,7 +1331,7 @@ def truncate_plano_trabalho():
     """Apaga a tabela plano_trabalho.
     Usado no ambiente de testes de integração contínua.
     """
-    with sync_engine.connect() as conn:
+    with get_sync_engine().connect() as conn:
         result = conn.execute(
             text(
                 "TRUNCATE avaliacao_registros_execucao, contribuicao, "
@@ -615,7 +1346,7 @@ def truncate_participante():
     """Apaga a tabela status_participante.
     Usado no ambiente de testes de integração contínua.
     """
-    with sync_engine.connect() as conn:
+    with get_sync_engine().connect() as conn:
         result = conn.execute(text("TRUNCATE participante CASCADE;"))
         result2 = conn.execute(text("SELECT 1;"))
         result2.one_or_none()
@@ -627,7 +1358,7 @@ def truncate_user():
     """Apaga a tabela users.
     Usado no ambiente de testes de integração contínua.
     """
-    with sync_engine.connect() as conn:
+    with get_sync_engine().connect() as conn:
         result = conn.execute(text("TRUNCATE users CASCADE;"))
         conn.commit()
     return result
@@ -1,21 +1,32 @@
 from datetime import datetime, timedelta
-from typing import Optional, Annotated
+from typing import AsyncIterator, Optional, Annotated
 import os
 
-from sqlalchemy import select, update
-from fastapi import HTTPException, Depends, status
+from sqlalchemy import Select, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.sql import text
+from fastapi import HTTPException, Depends, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
 import models, schemas
-from db_config import DbContextManager, async_session_maker
+from metrics import run_bcrypt
+from profiling import start_profiling
+from request_stats import auth_phase
+from db_config import (
+    STARTUP_LOCK_ID,
+    DbContextManager,
+    PrimaryReadDbContextManager,
+    async_session_maker,
+)
 
 
 SECRET_KEY = str(os.environ.get("SECRET_KEY"))
 ALGORITHM = str(os.environ.get("ALGORITHM"))
 API_PGD_ADMIN_USER = os.environ.get("API_PGD_ADMIN_USER")
 API_PGD_ADMIN_PASSWORD = os.environ.get("API_PGD_ADMIN_PASSWORD")
+STREAM_BATCH_SIZE = 1000
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -46,28 +57,112 @@ def get_password_hash(password):
     return pwd_context.hash(password)
 
 
+def _users_query(
+    origem_unidade: Optional[str] = None,
+    cod_unidade_autorizadora: Optional[int] = None,
+    disabled: Optional[bool] = None,
+    after_id: Optional[int] = None,
+) -> Select:
+    """Monta a consulta de usuários com os filtros informados, ordenada
+    pelo id para permitir a paginação por chave (keyset).
+
+    Args:
+        origem_unidade (Optional[str]): Filtra pela origem da unidade.
+        cod_unidade_autorizadora (Optional[int]): Filtra pela unidade
+            autorizadora.
+        disabled (Optional[bool]): Filtra por usuários ativos ou inativos.
+        after_id (Optional[int]): Traz somente usuários com id maior que
+            o informado (cursor da página anterior).
+
+    Returns:
+        Select: consulta SQL Alchemy.
+    """
+    query = select(models.Users).order_by(models.Users.id)
+    if origem_unidade is not None:
+        query = query.filter_by(origem_unidade=origem_unidade)
+    if cod_unidade_autorizadora is not None:
+        query = query.filter_by(cod_unidade_autorizadora=cod_unidade_autorizadora)
+    if disabled is not None:
+        query = query.filter_by(disabled=disabled)
+    if after_id is not None:
+        query = query.filter(models.Users.id > after_id)
+    return query
+
+
 async def get_all_users(
     db_session: DbContextManager,
-) -> list[schemas.UsersGetSchema]:
-    """Get all users from api database.
+    origem_unidade: Optional[str] = None,
+    cod_unidade_autorizadora: Optional[int] = None,
+    disabled: Optional[bool] = None,
+    after_id: Optional[int] = None,
+    limit: Optional[int] = None,
+) -> tuple[list[schemas.UsersGetSchema], Optional[int]]:
+    """Get users from api database, one page at a time.
 
     Args:
         db_session (DbContextManager): Session with api database
+        origem_unidade (Optional[str]): filter by origem_unidade
+        cod_unidade_autorizadora (Optional[int]): filter by
+            cod_unidade_autorizadora
+        disabled (Optional[bool]): filter by disabled
+        after_id (Optional[int]): cursor returned by the previous page
+        limit (Optional[int]): maximum number of users in the page. If
+            omitted, all users matching the filters are returned.
 
     Returns:
-        list[schemas.UsersGetSchema]: list of users without password
+        tuple[list[schemas.UsersGetSchema], Optional[int]]: list of users
+            without password and the cursor for the next page, or None
+            if this is the last page.
     """
+    query = _users_query(origem_unidade, cod_unidade_autorizadora, disabled, after_id)
+    if limit is not None:
+        # traz um registro a mais para saber se há próxima página
+        query = query.limit(limit + 1)
 
     async with db_session as session:
-        result = await session.execute(select(models.Users))
+        result = await session.execute(query)
         users = result.scalars().all()
 
-    return [
-        schemas.UsersGetSchema(
-            **schemas.UsersSchema.model_validate(user).model_dump(exclude=["password"])
-        )
-        for user in users
-    ]
+    next_cursor = None
+    if limit is not None and len(users) > limit:
+        users = users[:limit]
+        next_cursor = users[-1].id
+
+    return (
+        [schemas.UsersGetSchema.model_validate(user) for user in users],
+        next_cursor,
+    )
+
+
+async def stream_users(
+    db_session: DbContextManager,
+    origem_unidade: Optional[str] = None,
+    cod_unidade_autorizadora: Optional[int] = None,
+    disabled: Optional[bool] = None,
+    after_id: Optional[int] = None,
+) -> AsyncIterator[schemas.UsersGetSchema]:
+    """Stream users from api database using a server-side cursor, so
+    that the whole table is never held in memory.
+
+    Args:
+        db_session (DbContextManager): Session with api database
+        origem_unidade (Optional[str]): filter by origem_unidade
+        cod_unidade_autorizadora (Optional[int]): filter by
+            cod_unidade_autorizadora
+        disabled (Optional[bool]): filter by disabled
+        after_id (Optional[int]): only users with id greater than this
+
+    Yields:
+        schemas.UsersGetSchema: user without password
+    """
+    query = _users_query(
+        origem_unidade, cod_unidade_autorizadora, disabled, after_id
+    ).execution_options(yield_per=STREAM_BATCH_SIZE)
+
+    async with db_session as session:
+        users = await session.stream_scalars(query)
+        async for user in users:
+            yield schemas.UsersGetSchema.model_validate(user)
 
 
 async def get_user(
@@ -108,7 +203,7 @@ async def authenticate_user(
     """
     user = await get_user(db_session=db, email=username)
 
-    if not user or not verify_password(password, user.password):
+    if not user or not await run_bcrypt(verify_password, password, user.password):
         raise InvalidCredentialsError("Username ou password incorretos")
 
     if user.disabled:
@@ -156,15 +251,21 @@ async def verify_token(token: str, db: DbContextManager):
 
 
 async def get_current_user(
+    request: Request,
     token: Annotated[str, Depends(oauth2_scheme)],
-    db: DbContextManager = Depends(DbContextManager),
+    # sempre no banco principal, mesmo com réplica: um usuário desativado
+    # ou removido perde o acesso imediatamente, sem esperar a replicação
+    db: DbContextManager = Depends(PrimaryReadDbContextManager),
 ):
-    return await verify_token(token, db)
+    with auth_phase():
+        user = await verify_token(token, db)
+    start_profiling(request, user)
+    return user
 
 
 async def get_user_by_token(
     token: str,
-    db: DbContextManager = Depends(DbContextManager),
+    db: DbContextManager = Depends(PrimaryReadDbContextManager),
 ):
     return await verify_token(token, db)
 
@@ -185,22 +286,45 @@ async def get_current_active_user(
 
 
 async def init_user_admin():
-    db_session = async_session_maker()
-
-    if not await get_user(db_session=db_session, email=API_PGD_ADMIN_USER):
-        new_user = models.Users(
-            email=API_PGD_ADMIN_USER,
-            # b-crypt
-            password=get_password_hash(API_PGD_ADMIN_PASSWORD),
-            is_admin=True,
-            origem_unidade="SIAPE",
-            cod_unidade_autorizadora=1,
-            sistema_gerador=f"API PGD {os.getenv('TAG_NAME', 'dev-build') or 'dev-build'}",
-        )
+    """Cria o usuário administrador, se ainda não existir.
 
-        async with db_session as session:
-            session.add(new_user)
-            await session.commit()
+    Vários processos da API podem iniciar ao mesmo tempo: a verificação e
+    a inclusão são feitas sob o advisory lock de inicialização, e a
+    inclusão ignora um usuário já existente. O hash bcrypt da senha, que
+    é lento, só é calculado quando o usuário não existe, numa thread à
+    parte para não bloquear o event loop.
+    """
+    async with async_session_maker() as session:
+        async with session.begin():
+            await session.execute(
+                text("SELECT pg_advisory_xact_lock(:lock_id);"),
+                {"lock_id": STARTUP_LOCK_ID},
+            )
+            if await session.scalar(
+                select(models.Users.id).filter_by(email=API_PGD_ADMIN_USER)
+            ):
+                created = False
+            else:
+                # b-crypt
+                password = await run_bcrypt(get_password_hash, API_PGD_ADMIN_PASSWORD)
+                result = await session.execute(
+                    insert(models.Users)
+                    .values(
+                        email=API_PGD_ADMIN_USER,
+                        password=password,
+                        is_admin=True,
+                        origem_unidade="SIAPE",
+                        cod_unidade_autorizadora=1,
+                        sistema_gerador=(
+                            f"API PGD {os.getenv('TAG_NAME', 'dev-build') or 'dev-build'}"
+                        ),
+                    )
+                    .on_conflict_do_nothing(index_elements=[models.Users.email])
+                    .returning(models.Users.id)
+                )
+                created = result.scalar_one_or_none() is not None
+
+    if created:
         print(f"API_PGD_ADMIN:  Usuário administrador `{API_PGD_ADMIN_USER}` criado")
     else:
         print(f"API_PGD_ADMIN:  Usuário administrador `{API_PGD_ADMIN_USER}` já existe")
@@ -243,7 +367,7 @@ async def create_user(
 
     new_user = models.Users(**user.model_dump())
     # b-crypt
-    new_user.password = get_password_hash(new_user.password)
+    new_user.password = await run_bcrypt(get_password_hash, new_user.password)
     async with db_session as session:
         session.add(new_user)
         await session.commit()
@@ -267,7 +391,7 @@ async def update_user(
     """
 
     # b-crypt
-    user.password = get_password_hash(user.password)
+    user.password = await run_bcrypt(get_password_hash, user.password)
     async with db_session as session:
         await session.execute(
             update(models.Users).filter_by(email=user.email).values(**user.model_dump())
@@ -293,7 +417,7 @@ async def user_reset_password(
 
     user = await get_user_by_token(token, db_session)
 
-    user.password = get_password_hash(new_password)
+    user.password = await run_bcrypt(get_password_hash, new_password)
 
     async with db_session as session:
         await session.execute(
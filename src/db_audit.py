@@ -1,79 +1,410 @@
-AUDIT_DDL = """
+"""Estrutura de auditoria das operações no banco de dados: tabela,
+funções e triggers que registram as inclusões, atualizações e remoções.
+"""
+
+from sqlalchemy import DateTime, Integer, String, column, table
+from sqlalchemy.dialects.postgresql import JSONB
+
+AUDITED_TABLES = {
+    # sufixo do trigger: (tabela, campos da chave de negócio do registro)
+    # Um campo "nome=coluna" grava a coluna na chave com outro nome, para
+    # que os registros filhos usem os mesmos nomes do plano a que
+    # pertencem.
+    "pt": (
+        "plano_trabalho",
+        ("origem_unidade", "cod_unidade_autorizadora", "id_plano_trabalho"),
+    ),
+    "pe": (
+        "plano_entregas",
+        ("origem_unidade", "cod_unidade_autorizadora", "id_plano_entregas"),
+    ),
+    "part": (
+        "participante",
+        (
+            "origem_unidade",
+            "cod_unidade_autorizadora",
+            "cod_unidade_lotacao",
+            "matricula_siape",
+        ),
+    ),
+    "us": ("users", ("email",)),
+    "co": (
+        "contribuicao",
+        (
+            "origem_unidade=origem_unidade_pt",
+            "cod_unidade_autorizadora=cod_unidade_autorizadora_pt",
+            "id_plano_trabalho",
+            "id_contribuicao",
+        ),
+    ),
+    "en": (
+        "entrega",
+        (
+            "origem_unidade",
+            "cod_unidade_autorizadora",
+            "id_plano_entregas",
+            "id_entrega",
+        ),
+    ),
+    "are": (
+        "avaliacao_registros_execucao",
+        (
+            "origem_unidade=origem_unidade_pt",
+            "cod_unidade_autorizadora=cod_unidade_autorizadora_pt",
+            "id_plano_trabalho",
+            "id_periodo_avaliativo",
+        ),
+    ),
+}
+
+# Trilhas de auditoria consultadas pela API: campos da chave de negócio,
+# além de origem_unidade e cod_unidade_autorizadora, que identificam o
+# registro principal. Como os registros filhos usam na chave os mesmos
+# nomes do plano, a trilha de um plano inclui a dos seus filhos.
+AUDIT_TRAILS = {
+    "plano_trabalho": ("id_plano_trabalho",),
+    "plano_entregas": ("id_plano_entregas",),
+    "participante": ("cod_unidade_lotacao", "matricula_siape"),
+}
+
+auditoria_db = table(
+    "auditoria_db",
+    column("id", Integer),
+    column("operacao", String),
+    column("tabela", String),
+    column("chave", JSONB),
+    column("registro_antigo", JSONB),
+    column("registro_novo", JSONB),
+    column("usuario", String),
+    column("data_operacao", DateTime(timezone=True)),
+    schema="auditoria",
+)
+
+# Nas operações UPDATE, registro_antigo e registro_novo guardam somente os
+# campos alterados, com os valores anterior e posterior. Atualizações que
+# não alteram nada além de data_atualizacao não são registradas. INSERT e
+# DELETE guardam o registro completo. Em todas as operações, a chave de
+# negócio do registro fica em chave.
+AUDIT_SCHEMA_DDL = """
     CREATE SCHEMA IF NOT EXISTS auditoria;
 
+    -- Instalações anteriores têm uma tabela de auditoria sem partições,
+    -- que é só renomeada para auditoria_db_legado. A sua conversão na
+    -- partição dos registros anteriores, que lê a tabela inteira, é feita
+    -- por migration/3.4.0.sql.
+    ALTER TABLE IF EXISTS auditoria.auditoria_db
+        ADD COLUMN IF NOT EXISTS chave JSONB;
+
+    DO $$
+    BEGIN
+        IF (
+            SELECT relkind FROM pg_class
+            WHERE oid = to_regclass('auditoria.auditoria_db')
+        ) = 'r' THEN
+            ALTER TABLE auditoria.auditoria_db RENAME TO auditoria_db_legado;
+            ALTER INDEX auditoria.auditoria_db_pkey
+                RENAME TO auditoria_db_legado_pkey;
+            ALTER SEQUENCE auditoria.auditoria_db_id_seq OWNED BY NONE;
+        END IF;
+    END;
+    $$;
+
+    CREATE SEQUENCE IF NOT EXISTS auditoria.auditoria_db_id_seq AS INTEGER;
+
     CREATE TABLE IF NOT EXISTS auditoria.auditoria_db (
-        id SERIAL PRIMARY KEY,
+        id INTEGER NOT NULL DEFAULT nextval('auditoria.auditoria_db_id_seq'),
         operacao TEXT,
         tabela TEXT,
         registro_antigo JSONB,
         registro_novo JSONB,
         usuario TEXT,
-        data_operacao TIMESTAMPTZ DEFAULT now()
-    );
+        data_operacao TIMESTAMPTZ NOT NULL DEFAULT now(),
+        chave JSONB,
+        PRIMARY KEY (id, data_operacao)
+    ) PARTITION BY RANGE (data_operacao);
+
+    ALTER SEQUENCE auditoria.auditoria_db_id_seq OWNED BY auditoria.auditoria_db.id;
+
+    -- recebe os registros de meses sem partição própria, para que a
+    -- falta de uma partição nunca impeça a gravação dos dados
+    CREATE TABLE IF NOT EXISTS auditoria.auditoria_db_padrao
+        PARTITION OF auditoria.auditoria_db DEFAULT;
+
+    CREATE INDEX IF NOT EXISTS ix_auditoria_db_tabela_data_operacao
+        ON auditoria.auditoria_db (tabela, data_operacao);
+
+    CREATE INDEX IF NOT EXISTS ix_auditoria_db_chave
+        ON auditoria.auditoria_db USING GIN (chave jsonb_path_ops);
+
+    DROP FUNCTION IF EXISTS auditoria.fn_manter_particoes(INTEGER, INTEGER, TEXT);
+
+    -- Cria as partições mensais do mês corrente e dos meses_futuros
+    -- seguintes.
+    CREATE OR REPLACE FUNCTION auditoria.fn_manter_particoes(
+        meses_futuros INTEGER
+    ) RETURNS VOID AS $$
+    DECLARE
+        mes TIMESTAMPTZ;
+        nome TEXT;
+    BEGIN
+        FOR i IN 0..meses_futuros LOOP
+            mes := date_trunc('month', now()) + make_interval(months => i);
+            nome := 'auditoria_db_' || to_char(mes, 'YYYY_MM');
+            CONTINUE WHEN to_regclass('auditoria.' || nome) IS NOT NULL;
+            BEGIN
+                EXECUTE format(
+                    'CREATE TABLE auditoria.%I PARTITION OF auditoria.auditoria_db
+                    FOR VALUES FROM (%L) TO (%L)',
+                    nome, mes, mes + interval '1 month'
+                );
+            EXCEPTION
+                -- o mês já está coberto pela partição legada
+                WHEN invalid_object_definition THEN NULL;
+                -- criada ao mesmo tempo por outra sessão
+                WHEN duplicate_table THEN NULL;
+                -- a partição padrão já tem registros do mês
+                WHEN check_violation THEN
+                    RAISE WARNING 'Partição % não criada: %', nome, SQLERRM;
+            END;
+        END LOOP;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    -- Partições cujos registros são todos anteriores a retencao_meses
+    -- meses completos.
+    CREATE OR REPLACE FUNCTION auditoria.fn_particoes_expiradas(
+        retencao_meses INTEGER
+    ) RETURNS SETOF TEXT AS $$
+        SELECT filha.oid::regclass::text
+        FROM pg_inherits
+        JOIN pg_class AS filha ON filha.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = 'auditoria.auditoria_db'::regclass
+            AND substring(
+                pg_get_expr(filha.relpartbound, filha.oid)
+                FROM 'TO \(''([^'']+)''\)'
+            )::timestamptz <= date_trunc('month', now())
+                - make_interval(months => retencao_meses)
+        ORDER BY 1;
+    $$ LANGUAGE sql STABLE;
+
+    -- Desanexa da tabela de auditoria uma partição expirada, mantendo-a
+    -- como tabela avulsa para arquivamento (acao_retencao 'detach'), ou a
+    -- apaga ('drop'). Nada faz se ela já não for uma partição.
+    CREATE OR REPLACE FUNCTION auditoria.fn_retirar_particao(
+        tabela TEXT,
+        acao_retencao TEXT DEFAULT 'detach'
+    ) RETURNS VOID AS $$
+    BEGIN
+        IF NOT EXISTS (
+            SELECT FROM pg_inherits
+            WHERE inhparent = 'auditoria.auditoria_db'::regclass
+                AND inhrelid = to_regclass(tabela)
+        ) THEN
+            RETURN;
+        END IF;
+        EXECUTE format(
+            'ALTER TABLE auditoria.auditoria_db DETACH PARTITION %s', tabela
+        );
+        IF acao_retencao = 'drop' THEN
+            EXECUTE format('DROP TABLE %s', tabela);
+        END IF;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    CREATE OR REPLACE FUNCTION auditoria.fn_chave(registro JSONB, campos TEXT[])
+    RETURNS JSONB AS $$
+        SELECT jsonb_object_agg(
+            split_part(campo, '=', 1), registro -> split_part(campo, '=', -1)
+        )
+        FROM unnest(campos) AS campo;
+    $$ LANGUAGE sql IMMUTABLE;
+
+    -- campos de novo cujo valor é diferente em antigo
+    CREATE OR REPLACE FUNCTION auditoria.fn_diferenca(antigo JSONB, novo JSONB)
+    RETURNS JSONB AS $$
+        SELECT coalesce(jsonb_object_agg(campo.key, campo.value), '{}'::jsonb)
+        FROM jsonb_each(novo) AS campo
+        WHERE antigo -> campo.key IS DISTINCT FROM campo.value;
+    $$ LANGUAGE sql IMMUTABLE;
 
     CREATE OR REPLACE FUNCTION auditoria.fn_auditoria() RETURNS TRIGGER AS $$
+    DECLARE
+        alterados JSONB;
     BEGIN
         IF TG_OP = 'INSERT' THEN
-            INSERT INTO auditoria.auditoria_db (operacao, tabela, registro_novo, usuario)
-            VALUES ('INSERT', TG_TABLE_NAME, to_jsonb(NEW), current_user);
+            INSERT INTO auditoria.auditoria_db (operacao, tabela, chave, registro_novo, usuario)
+            VALUES (
+                'INSERT', TG_TABLE_NAME, auditoria.fn_chave(to_jsonb(NEW), TG_ARGV),
+                to_jsonb(NEW), current_user
+            );
 
         ELSIF TG_OP = 'UPDATE' THEN
-            INSERT INTO auditoria.auditoria_db (operacao, tabela, registro_antigo, registro_novo, usuario)
-            VALUES ('UPDATE', TG_TABLE_NAME, to_jsonb(OLD), to_jsonb(NEW), current_user);
+            alterados := auditoria.fn_diferenca(to_jsonb(OLD), to_jsonb(NEW));
+            IF alterados - 'data_atualizacao' = '{}'::jsonb THEN
+                RETURN NULL;
+            END IF;
+            INSERT INTO auditoria.auditoria_db (operacao, tabela, chave, registro_antigo, registro_novo, usuario)
+            VALUES (
+                'UPDATE', TG_TABLE_NAME, auditoria.fn_chave(to_jsonb(NEW), TG_ARGV),
+                auditoria.fn_diferenca(to_jsonb(NEW), to_jsonb(OLD)), alterados,
+                current_user
+            );
 
         ELSIF TG_OP = 'DELETE' THEN
-            INSERT INTO auditoria.auditoria_db (operacao, tabela, registro_antigo, usuario)
-            VALUES ('DELETE', TG_TABLE_NAME, to_jsonb(OLD), current_user);
+            INSERT INTO auditoria.auditoria_db (operacao, tabela, chave, registro_antigo, usuario)
+            VALUES (
+                'DELETE', TG_TABLE_NAME, auditoria.fn_chave(to_jsonb(OLD), TG_ARGV),
+                to_jsonb(OLD), current_user
+            );
         END IF;
 
         RETURN NULL;
     END;
     $$ LANGUAGE plpgsql;
 
-    DROP TRIGGER IF EXISTS tr_auditoria_pt ON plano_trabalho;
-    DROP TRIGGER IF EXISTS tr_auditoria_pe ON plano_entregas;
-    DROP TRIGGER IF EXISTS tr_auditoria_part ON participante;
-    DROP TRIGGER IF EXISTS tr_auditoria_us ON users;
-    DROP TRIGGER IF EXISTS tr_auditoria_co ON contribuicao;
-    DROP TRIGGER IF EXISTS tr_auditoria_en ON entrega;
-    DROP TRIGGER IF EXISTS tr_auditoria_are ON avaliacao_registros_execucao;
+    -- Versão por comando (FOR EACH STATEMENT) da auditoria: grava de uma
+    -- só vez os registros de auditoria de todas as linhas afetadas, lidas
+    -- das tabelas de transição. As versões antiga e nova das linhas
+    -- atualizadas são pareadas pela chave de negócio.
+    CREATE OR REPLACE FUNCTION auditoria.fn_auditoria_comando() RETURNS TRIGGER AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO auditoria.auditoria_db (operacao, tabela, chave, registro_novo, usuario)
+            SELECT 'INSERT', TG_TABLE_NAME, auditoria.fn_chave(novo.registro, TG_ARGV),
+                novo.registro, current_user
+            FROM (SELECT to_jsonb(linha) AS registro FROM novos AS linha) AS novo;
 
+        ELSIF TG_OP = 'UPDATE' THEN
+            INSERT INTO auditoria.auditoria_db (operacao, tabela, chave, registro_antigo, registro_novo, usuario)
+            SELECT 'UPDATE', TG_TABLE_NAME, coalesce(novo.chave, antigo.chave),
+                auditoria.fn_diferenca(novo.registro, antigo.registro),
+                auditoria.fn_diferenca(antigo.registro, novo.registro),
+                current_user
+            FROM (
+                SELECT to_jsonb(linha) AS registro,
+                    auditoria.fn_chave(to_jsonb(linha), TG_ARGV) AS chave
+                FROM antigos AS linha
+            ) AS antigo
+            FULL JOIN (
+                SELECT to_jsonb(linha) AS registro,
+                    auditoria.fn_chave(to_jsonb(linha), TG_ARGV) AS chave
+                FROM novos AS linha
+            ) AS novo
+            ON antigo.chave = novo.chave
+            WHERE antigo.registro IS NULL
+                OR novo.registro IS NULL
+                OR auditoria.fn_diferenca(antigo.registro, novo.registro)
+                    - 'data_atualizacao' <> '{}'::jsonb;
 
-    CREATE TRIGGER tr_auditoria_pt
-    AFTER INSERT OR UPDATE OR DELETE ON plano_trabalho
-    FOR EACH ROW EXECUTE FUNCTION auditoria.fn_auditoria();
+        ELSIF TG_OP = 'DELETE' THEN
+            INSERT INTO auditoria.auditoria_db (operacao, tabela, chave, registro_antigo, usuario)
+            SELECT 'DELETE', TG_TABLE_NAME, auditoria.fn_chave(antigo.registro, TG_ARGV),
+                antigo.registro, current_user
+            FROM (SELECT to_jsonb(linha) AS registro FROM antigos AS linha) AS antigo;
+        END IF;
 
-    CREATE TRIGGER tr_auditoria_pe
-    AFTER INSERT OR UPDATE OR DELETE ON plano_entregas
-    FOR EACH ROW EXECUTE FUNCTION auditoria.fn_auditoria();
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+# Índices de expressão das trilhas de auditoria, com a chave de negócio
+# seguida da ordem de paginação, restritos aos registros de cada trilha.
+# Só são criados aqui numa tabela ainda vazia e sem tabela legada a
+# anexar, sem custo; numa tabela com registros, como a de uma instalação
+# anterior, são criados sem bloquear a gravação pela migração
+# migration/3.4.0.sql, que também preenche a chave dos registros antigos.
+AUDIT_TRAIL_INDEXES = (
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT FROM auditoria.auditoria_db)
+        AND to_regclass('auditoria.auditoria_db_legado') IS NULL THEN"""
+    + "".join(
+        f"""
+            CREATE INDEX IF NOT EXISTS ix_auditoria_db_trilha_{tipo}
+                ON auditoria.auditoria_db (
+                    (chave ->> 'origem_unidade'),
+                    (chave ->> 'cod_unidade_autorizadora'),
+                    {", ".join(f"(chave ->> '{campo}')" for campo in campos)},
+                    data_operacao,
+                    id
+                )
+                WHERE chave ? '{campos[0]}';"""
+        for tipo, campos in AUDIT_TRAILS.items()
+    )
+    + """
+        END IF;
+    END;
+    $$;
+"""
+)
 
-    CREATE TRIGGER tr_auditoria_part
-    AFTER INSERT OR UPDATE OR DELETE ON participante
-    FOR EACH ROW EXECUTE FUNCTION auditoria.fn_auditoria();
+REMOVE_AUDIT_TRIGGERS = "".join(
+    f"""
+    DROP TRIGGER IF EXISTS tr_auditoria_{sufixo} ON {tabela};
+    DROP TRIGGER IF EXISTS tr_auditoria_{sufixo}_ins ON {tabela};
+    DROP TRIGGER IF EXISTS tr_auditoria_{sufixo}_upd ON {tabela};
+    DROP TRIGGER IF EXISTS tr_auditoria_{sufixo}_del ON {tabela};
+"""
+    for sufixo, (tabela, _) in AUDITED_TABLES.items()
+)
 
-    CREATE TRIGGER tr_auditoria_us
-    AFTER INSERT OR UPDATE OR DELETE ON users
-    FOR EACH ROW EXECUTE FUNCTION auditoria.fn_auditoria();
+# Um trigger por linha afetada (FOR EACH ROW)
+AUDIT_ROW_TRIGGERS = "".join(
+    f"""
+    CREATE TRIGGER tr_auditoria_{sufixo}
+    AFTER INSERT OR UPDATE OR DELETE ON {tabela}
+    FOR EACH ROW EXECUTE FUNCTION auditoria.fn_auditoria({chave});
+"""
+    for sufixo, (tabela, campos) in AUDITED_TABLES.items()
+    for chave in [", ".join(f"'{campo}'" for campo in campos)]
+)
 
-    CREATE TRIGGER tr_auditoria_co
-    AFTER INSERT OR UPDATE OR DELETE ON contribuicao
-    FOR EACH ROW EXECUTE FUNCTION auditoria.fn_auditoria();
+# Um trigger por comando (FOR EACH STATEMENT), com tabelas de transição.
+# O PostgreSQL não permite tabelas de transição em triggers de mais de um
+# evento, por isso há um trigger para cada operação.
+AUDIT_STATEMENT_TRIGGERS = "".join(
+    f"""
+    CREATE TRIGGER tr_auditoria_{sufixo}_ins
+    AFTER INSERT ON {tabela}
+    REFERENCING NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION auditoria.fn_auditoria_comando({chave});
 
-    CREATE TRIGGER tr_auditoria_en
-    AFTER INSERT OR UPDATE OR DELETE ON entrega
-    FOR EACH ROW EXECUTE FUNCTION auditoria.fn_auditoria();
+    CREATE TRIGGER tr_auditoria_{sufixo}_upd
+    AFTER UPDATE ON {tabela}
+    REFERENCING OLD TABLE AS antigos NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION auditoria.fn_auditoria_comando({chave});
 
-    CREATE TRIGGER tr_auditoria_are
-    AFTER INSERT OR UPDATE OR DELETE ON avaliacao_registros_execucao
-    FOR EACH ROW EXECUTE FUNCTION auditoria.fn_auditoria();
+    CREATE TRIGGER tr_auditoria_{sufixo}_del
+    AFTER DELETE ON {tabela}
+    REFERENCING OLD TABLE AS antigos
+    FOR EACH STATEMENT EXECUTE FUNCTION auditoria.fn_auditoria_comando({chave});
 """
+    for sufixo, (tabela, campos) in AUDITED_TABLES.items()
+    for chave in [", ".join(f"'{campo}'" for campo in campos)]
+)
+
+AUDIT_DDL = (
+    AUDIT_SCHEMA_DDL
+    + AUDIT_TRAIL_INDEXES
+    + REMOVE_AUDIT_TRIGGERS
+    + AUDIT_ROW_TRIGGERS
+)
+
+AUDIT_STATEMENT_DDL = (
+    AUDIT_SCHEMA_DDL
+    + AUDIT_TRAIL_INDEXES
+    + REMOVE_AUDIT_TRIGGERS
+    + AUDIT_STATEMENT_TRIGGERS
+)
+
+# No modo "aggregate", a API registra os eventos de auditoria (ver
+# audit_events.py) e os triggers são removidos.
+AUDIT_AGGREGATE_DDL = AUDIT_SCHEMA_DDL + AUDIT_TRAIL_INDEXES + REMOVE_AUDIT_TRIGGERS
 
-REMOVE_AUDIT_TRIGGERS = """
-    DROP TRIGGER IF EXISTS tr_auditoria_pt ON plano_trabalho;
-    DROP TRIGGER IF EXISTS tr_auditoria_pe ON plano_entregas;
-    DROP TRIGGER IF EXISTS tr_auditoria_part ON participante;
-    DROP TRIGGER IF EXISTS tr_auditoria_us ON users;
-    DROP TRIGGER IF EXISTS tr_auditoria_co ON contribuicao;
-    DROP TRIGGER IF EXISTS tr_auditoria_en ON entrega;
-    DROP TRIGGER IF EXISTS tr_auditoria_are ON avaliacao_registros_execucao;
-"""
\ No newline at end of file
+AUDIT_DDL_BY_MODE = {
+    "row": AUDIT_DDL,
+    "statement": AUDIT_STATEMENT_DDL,
+    "aggregate": AUDIT_AGGREGATE_DDL,
+}
@@ -0,0 +1,56 @@
+CHANGE_FEED_DDL = """
+    CREATE OR REPLACE FUNCTION fn_registro_removido() RETURNS TRIGGER AS $$
+    DECLARE
+        registro JSONB;
+        chave_registro JSONB;
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            registro := to_jsonb(OLD);
+        ELSE
+            registro := to_jsonb(NEW);
+        END IF;
+
+        -- os argumentos do trigger são os demais campos da chave
+        SELECT jsonb_object_agg(campo, registro -> campo)
+        INTO chave_registro
+        FROM unnest(TG_ARGV) AS campo;
+
+        IF TG_OP = 'DELETE' THEN
+            INSERT INTO registro_removido
+                (tipo, origem_unidade, cod_unidade_autorizadora, chave, data_remocao)
+            VALUES (
+                TG_TABLE_NAME,
+                registro ->> 'origem_unidade',
+                (registro ->> 'cod_unidade_autorizadora')::bigint,
+                chave_registro,
+                LOCALTIMESTAMP
+            )
+            ON CONFLICT (tipo, origem_unidade, cod_unidade_autorizadora, chave)
+            DO UPDATE SET data_remocao = EXCLUDED.data_remocao;
+
+        -- as funções update_* apagam e reinserem o registro na mesma
+        -- transação: a reinserção desfaz a marca de remoção
+        ELSIF TG_OP = 'INSERT' THEN
+            DELETE FROM registro_removido
+            WHERE tipo = TG_TABLE_NAME
+                AND origem_unidade = registro ->> 'origem_unidade'
+                AND cod_unidade_autorizadora = (registro ->> 'cod_unidade_autorizadora')::bigint
+                AND chave = chave_registro;
+        END IF;
+
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    CREATE OR REPLACE TRIGGER tr_registro_removido_pt
+    AFTER INSERT OR DELETE ON plano_trabalho
+    FOR EACH ROW EXECUTE FUNCTION fn_registro_removido('id_plano_trabalho');
+
+    CREATE OR REPLACE TRIGGER tr_registro_removido_pe
+    AFTER INSERT OR DELETE ON plano_entregas
+    FOR EACH ROW EXECUTE FUNCTION fn_registro_removido('id_plano_entregas');
+
+    CREATE OR REPLACE TRIGGER tr_registro_removido_part
+    AFTER INSERT OR DELETE ON participante
+    FOR EACH ROW EXECUTE FUNCTION fn_registro_removido('cod_unidade_lotacao', 'matricula_siape');
+"""
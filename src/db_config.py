@@ -1,27 +1,216 @@
 """Funções para estabelecer conexões com o banco de dados e sessões.
 """
 
+import asyncio
+from functools import cache
+import hashlib
 import os
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Callable, Optional
 
-from sqlalchemy import create_engine
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.schema import CreateIndex, CreateTable
 from sqlalchemy.orm import DeclarativeBase
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import (
+    AsyncConnection,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.sql import text
-from db_audit import AUDIT_DDL, REMOVE_AUDIT_TRIGGERS
+from db_audit import AUDIT_DDL_BY_MODE, REMOVE_AUDIT_TRIGGERS
+from db_change_feed import CHANGE_FEED_DDL
+from metrics import InstrumentedQueuePool
+from replica_consistency import current_replica_consistency
 
 SQLALCHEMY_DATABASE_URL = os.environ["SQLALCHEMY_DATABASE_URL"]
 
+# Os limites do pool de conexões valem para a API inteira e são divididos
+# entre os processos (workers) do uvicorn, de modo que a soma das conexões
+# abertas por todos eles não ultrapasse DB_POOL_SIZE + DB_MAX_OVERFLOW.
+API_WORKERS = max(1, int(os.environ.get("API_WORKERS", 1)))
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 30))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 60))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", -1))
+# Com um pooler em modo transação (como o PgBouncer com pool_mode =
+# transaction) entre a API e o Postgres, cada transação pode usar uma
+# conexão diferente do servidor.
+DB_TRANSACTION_POOLER = os.environ.get("DB_TRANSACTION_POOLER", "False") == "True"
+
+
+def check_pool_size(workers: int, pool_size: int):
+    """Verifica se o pool de conexões da API comporta os seus workers.
+
+    Args:
+        workers (int): Quantidade de workers do uvicorn.
+        pool_size (int): Conexões do pool da API inteira. Com 0, não há
+            pool (NullPool) e não há o que dividir.
+
+    Raises:
+        ValueError: Se houver mais workers que conexões no pool, o que
+            deixaria algum worker sem conexão ou, arredondando para cima,
+            ultrapassaria o total de conexões.
+    """
+    if 0 < pool_size < workers:
+        raise ValueError(
+            f"API_WORKERS ({workers}) é maior que DB_POOL_SIZE ({pool_size}): "
+            "reduza a quantidade de workers ou aumente o pool"
+        )
+
+
+check_pool_size(API_WORKERS, DB_POOL_SIZE)
+
+
+def check_audit_mode(mode: str):
+    """Verifica se o modo de auditoria é um dos conhecidos.
+
+    Args:
+        mode (str): Valor de DB_AUDIT_LOGS_MODE.
+
+    Raises:
+        ValueError: Se o modo não existir, o que só seria percebido ao
+            aplicar o DDL da auditoria.
+    """
+    if mode not in AUDIT_DDL_BY_MODE:
+        raise ValueError(
+            f"DB_AUDIT_LOGS_MODE inválido ({mode!r}): use um dos modos "
+            + ", ".join(f'"{modo}"' for modo in AUDIT_DDL_BY_MODE)
+        )
+
+
+def per_worker(total: int) -> int:
+    """Divide um limite de conexões da API entre os seus workers.
+
+    Args:
+        total (int): Limite de conexões da API inteira.
+
+    Returns:
+        int: Parte do limite que cabe a cada worker, arredondada para
+            baixo, para que a soma nunca ultrapasse o total.
+    """
+    return max(0, total // API_WORKERS)
+
+
+def engine_options(
+    transaction_pooler: bool,
+    pool_size: int,
+    max_overflow: int,
+    name: Optional[str] = None,
+) -> dict:
+    """Monta os argumentos de criação de um engine.
+
+    Args:
+        transaction_pooler (bool): Se as conexões passam por um pooler em
+            modo transação. Nesse caso, os prepared statements que o
+            psycopg cria no servidor após algumas execuções de uma mesma
+            consulta são desativados, pois o servidor que os recebeu pode
+            não ser o da transação seguinte.
+        pool_size (int): Conexões mantidas no pool. Com 0, a API não
+            mantém pool algum (NullPool) e abre uma conexão por sessão,
+            deixando o pooling a cargo do pooler externo.
+        max_overflow (int): Conexões extras permitidas acima do pool.
+        name (Optional[str]): Nome do pool nas métricas. Informado somente
+            para os engines assíncronos da API, cujo pool é instrumentado.
+
+    Returns:
+        dict: Argumentos para create_engine ou create_async_engine.
+    """
+    options = {}
+    if transaction_pooler:
+        options["connect_args"] = {"prepare_threshold": None}
+    if pool_size <= 0:
+        options["poolclass"] = NullPool
+    else:
+        if name is not None:
+            options.update(poolclass=InstrumentedQueuePool, pool_logging_name=name)
+        options.update(
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+    return options
+
+
 engine = create_async_engine(
     SQLALCHEMY_DATABASE_URL,
-    pool_size=30,
-    max_overflow=20,
-    pool_timeout=60,
+    **engine_options(
+        DB_TRANSACTION_POOLER,
+        per_worker(DB_POOL_SIZE),
+        per_worker(DB_MAX_OVERFLOW),
+        name="primary",
+    ),
+)
+
+
+@cache
+def get_sync_engine() -> Engine:
+    """Retorna o engine síncrono, criado somente no primeiro uso.
+
+    A API usa apenas o engine assíncrono; o síncrono serve às rotinas de
+    teste e de manutenção, e por isso não abre um pool em cada worker.
+
+    Returns:
+        Engine: O engine síncrono do banco de dados.
+    """
+    return create_engine(
+        SQLALCHEMY_DATABASE_URL, **engine_options(DB_TRANSACTION_POOLER, 1, 1)
     )
-sync_engine = create_engine(SQLALCHEMY_DATABASE_URL)
 
 async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
 
+# Réplica de leitura opcional, usada pelas consultas (ReadDbContextManager).
+# Sem ela, as consultas também vão para o banco de dados principal. Para
+# que o cliente leia as próprias gravações mesmo com a réplica atrasada,
+# ver replica_consistency.py.
+SQLALCHEMY_REPLICA_DATABASE_URL = os.environ.get(
+    "SQLALCHEMY_REPLICA_DATABASE_URL", None
+)
+
+replica_engine = (
+    create_async_engine(
+        SQLALCHEMY_REPLICA_DATABASE_URL,
+        **engine_options(
+            DB_TRANSACTION_POOLER,
+            per_worker(DB_POOL_SIZE),
+            per_worker(DB_MAX_OVERFLOW),
+            name="replica",
+        ),
+    )
+    if SQLALCHEMY_REPLICA_DATABASE_URL
+    else None
+)
+replica_session_maker = (
+    async_sessionmaker(replica_engine, expire_on_commit=False)
+    if replica_engine is not None
+    else async_session_maker
+)
+
+
+async def replica_has_replayed(session: AsyncSession, lsn: str) -> bool:
+    """Verifica se a réplica já reproduziu o WAL do banco principal até a
+    posição informada.
+
+    Args:
+        session (AsyncSession): Sessão da réplica.
+        lsn (str): Posição do WAL do banco principal.
+
+    Returns:
+        bool: Se a réplica está em dia com a posição. Fora de uma réplica,
+            pg_last_wal_replay_lsn() é nulo e o resultado é False.
+    """
+    replayed = await session.scalar(
+        text("SELECT pg_last_wal_replay_lsn() >= CAST(:lsn AS pg_lsn);"),
+        {"lsn": lsn},
+    )
+    # encerra a transação aberta pela verificação, para que a sessão
+    # chegue ao endpoint como uma sessão nova
+    await session.rollback()
+    return bool(replayed)
+
+
 # database models (SQLAlchemy)
 class Base(DeclarativeBase):  # pylint: disable=too-few-public-methods
     """Classe base para modelos SQL Alchemy.
@@ -34,10 +223,218 @@ async def create_db_and_tables():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
 
-async def create_audit_ddl():
+async def create_audit_ddl(mode: str = "row"):
+    """Cria a estrutura de auditoria e os seus triggers.
 
+    Args:
+        mode (str): "row" para um trigger por linha alterada,
+            "statement" para um trigger por comando, que grava de uma
+            vez os registros de todas as linhas afetadas, ou "aggregate"
+            para eventos por agregado gravados pela própria API, sem
+            triggers.
+    """
     async with engine.begin() as conn:
-        await conn.execute(text(AUDIT_DDL))
+        await conn.execute(text(AUDIT_DDL_BY_MODE[mode]))
+
+# Chave do advisory lock que serializa as rotinas de inicialização, como a
+# aplicação do DDL, entre os processos da API que iniciam ao mesmo tempo.
+STARTUP_LOCK_ID = 5057_0001
+
+SCHEMA_VERSION_DDL = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        componente TEXT PRIMARY KEY,
+        versao TEXT NOT NULL,
+        data_aplicacao TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+"""
+
+
+def _tables_ddl() -> str:
+    """DDL das tabelas e índices dos modelos, usado para versioná-los."""
+    return "".join(
+        str(CreateTable(table).compile(dialect=engine.dialect))
+        + "".join(
+            str(CreateIndex(index).compile(dialect=engine.dialect))
+            for index in sorted(table.indexes, key=lambda index: index.name)
+        )
+        for table in Base.metadata.sorted_tables
+    )
+
+
+def _execute_ddl(ddl: str) -> Callable:
+    """Retorna uma função que executa o DDL informado numa conexão."""
+
+    async def execute(conn: AsyncConnection):
+        await conn.execute(text(ddl))
+
+    return execute
+
+
+async def _create_tables(conn: AsyncConnection):
+    """Cria as tabelas e índices dos modelos que não existirem."""
+    await conn.run_sync(Base.metadata.create_all)
+
+
+async def apply_schema_changes(audit_mode: Optional[str]) -> list[str]:
+    """Aplica o DDL de inicialização do banco de dados somente para os
+    componentes cuja versão mudou desde a última aplicação.
+
+    A versão de cada componente — tabelas, triggers do feed de alterações
+    e auditoria — é o hash do seu DDL, registrado na tabela
+    schema_version. Assim, um novo início da API com o mesmo código não
+    executa nenhum DDL, nem recria triggers, que bloqueiam as tabelas de
+    dados. Um advisory lock garante que, entre vários processos iniciando
+    ao mesmo tempo, somente o primeiro aplique as mudanças.
+
+    Args:
+        audit_mode (Optional[str]): Modo da auditoria, como em
+            create_audit_ddl, ou None se a auditoria estiver desativada.
+
+    Returns:
+        list[str]: Componentes cujo DDL foi aplicado.
+    """
+    audit_ddl = AUDIT_DDL_BY_MODE[audit_mode] if audit_mode else REMOVE_AUDIT_TRIGGERS
+    components = {
+        "tabelas": (_tables_ddl(), _create_tables),
+        "feed_alteracoes": (CHANGE_FEED_DDL, _execute_ddl(CHANGE_FEED_DDL)),
+        "auditoria": (audit_ddl, _execute_ddl(audit_ddl)),
+    }
+    applied = []
+    async with engine.begin() as conn:
+        await conn.execute(
+            text("SELECT pg_advisory_xact_lock(:lock_id);"),
+            {"lock_id": STARTUP_LOCK_ID},
+        )
+        await conn.execute(text(SCHEMA_VERSION_DDL))
+        result = await conn.execute(
+            text("SELECT componente, versao FROM schema_version;")
+        )
+        versions = dict(result.tuples().all())
+        for component, (ddl, apply) in components.items():
+            version = hashlib.sha256(ddl.encode("utf-8")).hexdigest()
+            if versions.get(component) == version:
+                continue
+            await apply(conn)
+            await conn.execute(
+                text(
+                    "INSERT INTO schema_version (componente, versao) "
+                    "VALUES (:componente, :versao) "
+                    "ON CONFLICT (componente) DO UPDATE "
+                    "SET versao = EXCLUDED.versao, data_aplicacao = now();"
+                ),
+                {"componente": component, "versao": version},
+            )
+            applied.append(component)
+    return applied
+
+# A manutenção das partições altera a tabela de auditoria com locks que
+# bloqueiam as gravações auditadas enquanto esperam; cada passo desiste
+# depois de AUDIT_PARTITIONS_LOCK_TIMEOUT e é repetido mais tarde, com
+# espera crescente, até AUDIT_PARTITIONS_LOCK_ATTEMPTS vezes.
+AUDIT_PARTITIONS_LOCK_TIMEOUT = "1s"
+AUDIT_PARTITIONS_LOCK_ATTEMPTS = 5
+LOCK_NOT_AVAILABLE = "55P03"
+
+
+async def _audit_partitions_step(
+    statement: str, params: dict, skip_if_locked: bool
+) -> Optional[list]:
+    """Executa um passo da manutenção das partições numa transação própria,
+    com lock_timeout, repetindo-o se o lock da tabela não for obtido.
+
+    Args:
+        statement (str): comando SQL do passo.
+        params (dict): parâmetros do comando.
+        skip_if_locked (bool): se outro processo estiver com o advisory
+            lock das rotinas de manutenção, desiste do passo em vez de
+            esperar por ele. Em ambos os casos, o passo só é executado
+            com o lock obtido, na mesma transação.
+
+    Returns:
+        Optional[list]: as linhas retornadas pelo comando, ou None se o
+        passo foi pulado.
+    """
+    for attempt in range(AUDIT_PARTITIONS_LOCK_ATTEMPTS):
+        try:
+            async with engine.begin() as conn:
+                # serializa a manutenção entre os workers, que a fazem ao
+                # mesmo tempo na inicialização e na manutenção diária
+                if skip_if_locked:
+                    acquired = await conn.scalar(
+                        text("SELECT pg_try_advisory_xact_lock(:lock_id);"),
+                        {"lock_id": STARTUP_LOCK_ID},
+                    )
+                    if not acquired:
+                        return None
+                else:
+                    await conn.execute(
+                        text("SELECT pg_advisory_xact_lock(:lock_id);"),
+                        {"lock_id": STARTUP_LOCK_ID},
+                    )
+                await conn.execute(
+                    text(
+                        "SELECT set_config('lock_timeout', "
+                        ":lock_timeout, true);"
+                    ),
+                    {"lock_timeout": AUDIT_PARTITIONS_LOCK_TIMEOUT},
+                )
+                result = await conn.execute(text(statement), params)
+                return list(result.scalars()) if result.returns_rows else []
+        except OperationalError as exception:
+            sqlstate = getattr(exception.orig, "sqlstate", None)
+            if (
+                sqlstate != LOCK_NOT_AVAILABLE
+                or attempt == AUDIT_PARTITIONS_LOCK_ATTEMPTS - 1
+            ):
+                raise
+            await asyncio.sleep(2**attempt)
+    return None
+
+
+async def maintain_audit_partitions(
+    months_ahead: int,
+    retention_months: int = 0,
+    retention_action: str = "detach",
+    skip_if_locked: bool = False,
+):
+    """Cria as partições mensais da tabela de auditoria e aplica a
+    retenção dos registros antigos.
+
+    A criação e a retirada de cada partição expirada são feitas em
+    transações separadas e curtas, para que as gravações auditadas fiquem
+    bloqueadas o menor tempo possível.
+
+    Args:
+        months_ahead (int): quantidade de meses, além do corrente, com
+            partições criadas antecipadamente.
+        retention_months (int): quantidade de meses completos mantidos
+            na tabela de auditoria. Zero mantém todos os registros.
+        retention_action (str): "drop" apaga as partições antigas e
+            "detach" as desanexa, mantendo-as como tabelas avulsas para
+            arquivamento.
+        skip_if_locked (bool): desiste da manutenção se outro processo da
+            API a estiver fazendo, como na manutenção diária, executada
+            por todos os workers.
+    """
+    created = await _audit_partitions_step(
+        "SELECT auditoria.fn_manter_particoes(:months_ahead);",
+        {"months_ahead": months_ahead},
+        skip_if_locked,
+    )
+    if created is None or retention_months <= 0:
+        return
+    expired = await _audit_partitions_step(
+        "SELECT auditoria.fn_particoes_expiradas(:retention_months);",
+        {"retention_months": retention_months},
+        skip_if_locked,
+    )
+    for partition in expired or []:
+        await _audit_partitions_step(
+            "SELECT auditoria.fn_retirar_particao(:partition, :retention_action);",
+            {"partition": partition, "retention_action": retention_action},
+            skip_if_locked,
+        )
+
 
 async def remove_audit_triggers():
 
@@ -85,7 +482,14 @@ async def check_db_connection(db: AsyncSession):
 
 class DbContextManager:
     """Context manager para manipulação de sessões do banco de dados.
+
+    As sessões usam o banco de dados principal. Havendo réplica de
+    leitura, a posição do WAL do principal após uma sessão sem erros é
+    guardada na requisição e devolvida ao cliente, para que as suas
+    consultas seguintes leiam as gravações feitas.
     """
+    read_only = False
+
     def __init__(self):
         self.async_session_maker = async_session_maker
         self.db = None
@@ -100,5 +504,47 @@ class DbContextManager:
                 await self.db.commit()
             elif not self.db.in_transaction():
                 await self.db.rollback()
+            consistency = current_replica_consistency()
+            if (
+                not self.read_only
+                and exc_type is None
+                and replica_engine is not None
+                and consistency is not None
+            ):
+                consistency.written_lsn = await self.db.scalar(
+                    text("SELECT pg_current_wal_lsn()::text;")
+                )
         finally:
             await self.db.close()
+
+
+class PrimaryReadDbContextManager(DbContextManager):
+    """Context manager para consultas que precisam do banco principal,
+    como a autenticação, que não pode aceitar um usuário já desativado,
+    e o feed de alterações."""
+    read_only = True
+
+
+class ReadDbContextManager(DbContextManager):
+    """Context manager para sessões somente de consulta.
+
+    Usa a réplica de leitura, se configurada, exceto quando ela ainda não
+    reproduziu as gravações recentes do cliente, informadas no cookie
+    WAL_LSN_COOKIE, ou da própria requisição.
+    """
+    read_only = True
+
+    async def __aenter__(self):
+        self.async_session_maker = replica_session_maker
+        session = await super().__aenter__()
+        consistency = current_replica_consistency()
+        lsn = consistency.min_replica_lsn if consistency is not None else None
+        if (
+            replica_engine is None
+            or lsn is None
+            or await replica_has_replayed(session, lsn)
+        ):
+            return session
+        await session.close()
+        self.async_session_maker = async_session_maker
+        return await super().__aenter__()
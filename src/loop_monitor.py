@@ -0,0 +1,119 @@
+"""Monitoramento do atraso do event loop e detecção de bloqueios.
+
+Uma tarefa acorda a cada EVENT_LOOP_MONITOR_INTERVAL_SECONDS e registra
+quanto acordou depois do previsto: é o tempo que outras tarefas e
+callbacks ocuparam o event loop sem ceder a vez. Uma thread de vigilância
+acompanha as batidas dessa tarefa; se ela ficar mais de
+EVENT_LOOP_BLOCK_THRESHOLD_SECONDS sem bater, o event loop está
+bloqueado, e a pilha de execução da thread do event loop nesse momento,
+que mostra a chamada bloqueante, é registrada no log. O atraso, os
+bloqueios e a sua duração ficam nas métricas de /metrics.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from metrics import (
+    EVENT_LOOP_BLOCKED,
+    EVENT_LOOP_BLOCKED_SECONDS,
+    EVENT_LOOP_LAG_SECONDS,
+)
+
+EVENT_LOOP_MONITOR_ENABLED = (
+    os.environ.get("EVENT_LOOP_MONITOR_ENABLED", "True") == "True"
+)
+EVENT_LOOP_MONITOR_INTERVAL = float(
+    os.environ.get("EVENT_LOOP_MONITOR_INTERVAL_SECONDS", 0.05)
+)
+EVENT_LOOP_BLOCK_THRESHOLD = float(
+    os.environ.get("EVENT_LOOP_BLOCK_THRESHOLD_SECONDS", 0.1)
+)
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class EventLoopMonitor:
+    """Mede o atraso do event loop e registra a pilha de execução quando
+    ele fica bloqueado por mais de threshold segundos."""
+
+    def __init__(self, interval: float, threshold: float):
+        self.interval = interval
+        self.threshold = threshold
+        self.heartbeat = time.monotonic()
+        self.task: Optional[asyncio.Task] = None
+        self.watchdog: Optional[threading.Thread] = None
+        self.stopping = threading.Event()
+        self.loop_thread_id: Optional[int] = None
+
+    @property
+    def started(self) -> bool:
+        """Se o monitoramento está em execução."""
+        return self.task is not None
+
+    def start(self):
+        """Inicia a tarefa de medição e a thread de vigilância."""
+        self.loop_thread_id = threading.get_ident()
+        self.heartbeat = time.monotonic()
+        self.stopping.clear()
+        self.task = asyncio.create_task(self._measure_lag())
+        self.watchdog = threading.Thread(
+            target=self._watch, name="event-loop-watchdog", daemon=True
+        )
+        self.watchdog.start()
+
+    async def stop(self):
+        """Encerra a tarefa de medição e a thread de vigilância."""
+        if self.task is None:
+            return
+        self.stopping.set()
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        await asyncio.to_thread(self.watchdog.join)
+        self.task = None
+        self.watchdog = None
+
+    async def _measure_lag(self):
+        """Dorme por interval segundos, repetidamente, registrando o
+        atraso de cada despertar."""
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            EVENT_LOOP_LAG_SECONDS.observe(max(0.0, loop.time() - expected))
+            self.heartbeat = time.monotonic()
+
+    def _watch(self):
+        """Verifica as batidas da tarefa de medição e registra a pilha do
+        event loop em cada bloqueio, uma vez por bloqueio."""
+        blocked_since: Optional[float] = None
+        while not self.stopping.wait(self.threshold / 2):
+            heartbeat = self.heartbeat
+            silence = time.monotonic() - heartbeat - self.interval
+            if silence <= self.threshold:
+                if blocked_since is not None:
+                    EVENT_LOOP_BLOCKED_SECONDS.observe(heartbeat - blocked_since)
+                    blocked_since = None
+                continue
+            if blocked_since is not None:
+                continue
+            blocked_since = heartbeat + self.interval
+            EVENT_LOOP_BLOCKED.inc()
+            frame = sys._current_frames().get(  # pylint: disable=protected-access
+                self.loop_thread_id
+            )
+            stack = "".join(traceback.format_stack(frame)) if frame else ""
+            logger.warning("Event loop bloqueado há %.3f s:\n%s", silence, stack)
+
+
+event_loop_monitor = EventLoopMonitor(
+    EVENT_LOOP_MONITOR_INTERVAL, EVENT_LOOP_BLOCK_THRESHOLD
+)
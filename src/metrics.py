@@ -0,0 +1,242 @@
+"""Métricas operacionais da API no formato do Prometheus.
+
+Expostas em /metrics: quantidade e latência das requisições por rota e
+status, uso do pool de conexões do banco de dados, tempo de espera e de
+execução do bcrypt, latência dos tipos de consulta mais custosos,
+atraso e bloqueios do event loop e eventos de auditoria descartados.
+
+Com vários workers do uvicorn, a variável de ambiente
+PROMETHEUS_MULTIPROC_DIR deve apontar para um diretório vazio,
+compartilhado pelos processos, para que /metrics some as métricas de
+todos eles. Se o diretório não existir, as métricas ficam só na memória
+de cada processo, como com um único worker.
+
+/metrics só responde a quem enviar METRICS_TOKEN como token Bearer.
+"""
+
+import asyncio
+from functools import wraps
+import logging
+import os
+import secrets
+import time
+from typing import Callable, Optional
+
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# O prometheus_client escolhe o modo multiprocesso ao ser importado e, sem
+# o diretório, falharia ao criar a primeira métrica.
+_multiproc_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+if _multiproc_dir and not os.path.isdir(_multiproc_dir):
+    logging.getLogger("uvicorn.error").warning(
+        "PROMETHEUS_MULTIPROC_DIR (%s) não existe: métricas só deste processo",
+        _multiproc_dir,
+    )
+    del os.environ["PROMETHEUS_MULTIPROC_DIR"]
+
+# pylint: disable-next=wrong-import-position
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Token Bearer que o coletor do Prometheus envia para consultar /metrics;
+# sem ele, a rota fica desativada.
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+# buckets de latência, em segundos, de 5 ms a 30 s
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30,
+)
+
+REQUESTS = Counter(
+    "api_pgd_http_requests_total",
+    "Requisições HTTP atendidas.",
+    ["method", "route", "status"],
+)
+REQUEST_SECONDS = Histogram(
+    "api_pgd_http_request_duration_seconds",
+    "Duração das requisições HTTP.",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "api_pgd_db_pool_checked_out",
+    "Conexões do pool em uso.",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_OVERFLOW = Gauge(
+    "api_pgd_db_pool_overflow",
+    "Conexões abertas além do tamanho do pool (negativo enquanto o pool "
+    "não estiver cheio).",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_WAIT_SECONDS = Histogram(
+    "api_pgd_db_pool_wait_seconds",
+    "Espera por uma conexão do pool, incluindo a abertura de novas.",
+    ["pool"],
+    buckets=LATENCY_BUCKETS,
+)
+BCRYPT_QUEUE_SECONDS = Histogram(
+    "api_pgd_bcrypt_queue_seconds",
+    "Espera de uma operação do bcrypt por uma thread livre.",
+    ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+BCRYPT_SECONDS = Histogram(
+    "api_pgd_bcrypt_duration_seconds",
+    "Duração das operações do bcrypt.",
+    ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+QUERY_SECONDS = Histogram(
+    "api_pgd_db_query_duration_seconds",
+    "Duração das consultas ao banco de dados, por tipo.",
+    ["query"],
+    buckets=LATENCY_BUCKETS,
+)
+SLOW_QUERIES = Counter(
+    "api_pgd_db_slow_queries_total",
+    "Comandos SQL acima do limite do registro de consultas lentas, pela "
+    "função que os fez.",
+    ["origin"],
+)
+AUDIT_EVENTS_DROPPED = Counter(
+    "api_pgd_audit_events_dropped_total",
+    "Eventos de auditoria descartados: com a fila cheia (queue_full) ou por "
+    "falha na gravação durante o encerramento (flush).",
+    ["reason"],
+)
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "api_pgd_event_loop_lag_seconds",
+    "Atraso do event loop em atender uma tarefa pronta para executar.",
+    buckets=(0.001, 0.0025, *LATENCY_BUCKETS),
+)
+EVENT_LOOP_BLOCKED = Counter(
+    "api_pgd_event_loop_blocked_total",
+    "Bloqueios do event loop acima do limite configurado.",
+)
+EVENT_LOOP_BLOCKED_SECONDS = Histogram(
+    "api_pgd_event_loop_blocked_seconds",
+    "Duração dos bloqueios do event loop acima do limite configurado.",
+    buckets=LATENCY_BUCKETS,
+)
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Pool de conexões que mede a espera por conexões e mantém os
+    gauges de conexões em uso, rotulados pelo pool_logging_name do engine.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT_SECONDS.labels(self.logging_name).observe(
+                time.perf_counter() - start
+            )
+            self._update_gauges()
+
+    def _do_return_conn(self, record):
+        super()._do_return_conn(record)
+        self._update_gauges()
+
+    def _update_gauges(self):
+        DB_POOL_CHECKED_OUT.labels(self.logging_name).set(self.checkedout())
+        DB_POOL_OVERFLOW.labels(self.logging_name).set(self.overflow())
+
+
+def observe_query(func: Callable) -> Callable:
+    """Decorador que registra a duração de uma função assíncrona de
+    consulta ao banco de dados, rotulada pelo nome da função."""
+    histogram = QUERY_SECONDS.labels(func.__name__)
+
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            histogram.observe(time.perf_counter() - start)
+
+    return wrapper
+
+
+async def run_bcrypt(func: Callable, *args):
+    """Executa uma operação do bcrypt numa thread à parte, para não
+    bloquear o event loop, registrando a espera pela thread e a duração.
+
+    Args:
+        func (Callable): Função que calcula ou verifica o hash.
+        *args: Argumentos da função.
+
+    Returns:
+        O resultado da função.
+    """
+    submitted = time.perf_counter()
+
+    def run():
+        started = time.perf_counter()
+        BCRYPT_QUEUE_SECONDS.labels(func.__name__).observe(started - submitted)
+        try:
+            return func(*args)
+        finally:
+            BCRYPT_SECONDS.labels(func.__name__).observe(
+                time.perf_counter() - started
+            )
+
+    return await asyncio.to_thread(run)
+
+
+def observe_request(method: str, route: str, status_code: int, seconds: float):
+    """Registra uma requisição HTTP atendida.
+
+    Args:
+        method (str): Método HTTP.
+        route (str): Modelo do caminho da rota, como
+            "/user/{email}", para não criar uma série por URL.
+        status_code (int): Status da resposta.
+        seconds (float): Duração da requisição.
+    """
+    REQUESTS.labels(method, route, status_code).inc()
+    REQUEST_SECONDS.labels(method, route, status_code).observe(seconds)
+
+
+def is_authorized(authorization: Optional[str]) -> bool:
+    """Verifica se o cabeçalho Authorization traz o METRICS_TOKEN.
+
+    Args:
+        authorization (Optional[str]): Valor do cabeçalho Authorization.
+
+    Returns:
+        bool: True se o token for "Bearer METRICS_TOKEN".
+    """
+    if not METRICS_TOKEN or authorization is None:
+        return False
+    scheme, _, token = authorization.partition(" ")
+    return scheme.lower() == "bearer" and secrets.compare_digest(
+        token.encode(), METRICS_TOKEN.encode()
+    )
+
+
+def latest_metrics() -> tuple[bytes, str]:
+    """Gera as métricas no formato de texto do Prometheus.
+
+    Returns:
+        tuple[bytes, str]: O conteúdo e o seu media type.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,513 @@
+"""Middlewares ASGI da API.
+
+São middlewares ASGI puros, que atuam diretamente sobre as mensagens da
+requisição e da resposta: ao contrário dos registrados com
+@app.middleware("http"), não criam uma tarefa nem retransmitem o corpo da
+resposta a cada requisição. Os cabeçalhos são acrescentados à mensagem
+http.response.start, antes de repassá-la.
+
+Também comprimem as respostas e descomprimem os corpos de requisição
+enviados com gzip, para reduzir o volume de dados trafegado pelos
+sistemas que enviam e consultam os planos.
+"""
+
+import json
+import logging
+import math
+import os
+import time
+from typing import Optional
+import zlib
+
+import brotli
+from fastapi import status
+from fastapi.responses import JSONResponse
+from starlette.datastructures import MutableHeaders
+from starlette.requests import cookie_parser
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import metrics
+import replica_consistency
+import request_stats
+
+REQUEST_STATS_LOG_ENABLED = (
+    os.environ.get("REQUEST_STATS_LOG_ENABLED", "True") == "True"
+)
+
+CONTENT_SECURITY_POLICY = "; ".join(
+    [
+        "default-src 'self'",
+        "font-src 'self' fonts.gstatic.com",
+        "media-src 'self' data:",
+        "img-src 'self' data: fastapi.tiangolo.com raw.githubusercontent.com "
+        "cdn.redoc.ly",
+        "script-src 'self' 'unsafe-inline' cdn.jsdelivr.net",
+        "style-src 'self' 'unsafe-inline' cdn.jsdelivr.net fonts.googleapis.com",
+        "worker-src 'self' blob:",
+    ]
+)
+DOCS_PATHS = ("/docs", "/redoc")
+
+COMPRESSION_MINIMUM_SIZE = int(os.environ.get("COMPRESSION_MINIMUM_SIZE", 1024))
+REQUEST_MAX_DECOMPRESSED_SIZE = int(
+    os.environ.get("REQUEST_MAX_DECOMPRESSED_SIZE", 20 * 1024 * 1024)
+)
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def route_path(scope: Scope) -> str:
+    """Modelo do caminho da rota que atendeu a requisição (por exemplo,
+    "/user/{email}"), para que não seja criada uma série por URL."""
+    return getattr(scope.get("route", None), "path", "unmatched")
+
+
+def header_value(scope: Scope, name: bytes) -> Optional[bytes]:
+    """Valor do primeiro cabeçalho da requisição com o nome informado, em
+    minúsculas."""
+    return next((value for key, value in scope["headers"] if key == name), None)
+
+
+class ContentSecurityPolicyMiddleware:
+    """Adiciona cabeçalho Content-Security-Policy (CSP), definindo de
+    onde os recursos podem ser carregados pelo navegador, às páginas
+    de documentação (/docs na Swagger UI e /redoc na ReDoc).
+
+    As demais rotas não são feitas para ser acessadas por navegadores e por
+    isso não faz diferença existir CSP.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not scope["path"].startswith(DOCS_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_csp(message: Message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[
+                    "Content-Security-Policy"
+                ] = CONTENT_SECURITY_POLICY
+            await send(message)
+
+        await self.app(scope, receive, send_with_csp)
+
+
+class UserAgentMiddleware:
+    """Recusa, com erro 400, as requisições sem o cabeçalho User-Agent."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http":
+            if not header_value(scope, b"user-agent"):
+                response = JSONResponse(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    content={"detail": "User-Agent header is required"},
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+class ReplicaConsistencyMiddleware:
+    """Guarda, durante a requisição, a posição do WAL do banco principal
+    enviada pelo cliente no cookie WAL_LSN_COOKIE e, se a requisição
+    gravar dados, devolve no cookie a posição após a gravação (ver
+    replica_consistency.py)."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        cookie = header_value(scope, b"cookie")
+        required_lsn = replica_consistency.parse_wal_lsn(
+            cookie_parser(cookie.decode("latin-1")).get(
+                replica_consistency.WAL_LSN_COOKIE
+            )
+            if cookie
+            else None
+        )
+        with replica_consistency.track_replica_consistency(
+            required_lsn
+        ) as consistency:
+
+            async def send_with_lsn(message: Message):
+                if (
+                    message["type"] == "http.response.start"
+                    and consistency.written_lsn is not None
+                ):
+                    MutableHeaders(scope=message).append(
+                        "Set-Cookie", wal_lsn_cookie(consistency.written_lsn)
+                    )
+                await send(message)
+
+            await self.app(scope, receive, send_with_lsn)
+
+
+def wal_lsn_cookie(lsn: str) -> str:
+    """Cookie com a posição do WAL do banco principal após uma gravação,
+    válido por DB_REPLICA_PIN_SECONDS segundos."""
+    max_age = math.ceil(replica_consistency.DB_REPLICA_PIN_SECONDS)
+    return (
+        f"{replica_consistency.WAL_LSN_COOKIE}={lsn}; Max-Age={max_age}; "
+        "Path=/; HttpOnly; SameSite=Lax"
+    )
+
+
+class RequestMetricsMiddleware:
+    """Registra a quantidade e a duração das requisições por método, rota
+    e status, nas métricas expostas em /metrics.
+
+    A duração vai até o envio dos cabeçalhos da resposta, o que, nas
+    respostas transmitidas aos poucos (NDJSON), exclui a transmissão.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+
+        async def send_observed(message: Message):
+            if message["type"] == "http.response.start":
+                metrics.observe_request(
+                    scope["method"],
+                    route_path(scope),
+                    message["status"],
+                    time.perf_counter() - start,
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_observed)
+
+
+class RequestStatsMiddleware:
+    """Conta os comandos SQL e mede as fases da requisição, informando-os
+    no cabeçalho Server-Timing e num registro de log em JSON.
+
+    Os números são calculados no envio dos cabeçalhos da resposta. Nas
+    respostas transmitidas aos poucos (NDJSON), as consultas feitas durante
+    a transmissão não entram neles.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with request_stats.track_request() as stats:
+
+            async def send_with_stats(message: Message):
+                if message["type"] == "http.response.start":
+                    stats.end = time.perf_counter()
+                    MutableHeaders(scope=message)[
+                        "Server-Timing"
+                    ] = stats.server_timing()
+                    if REQUEST_STATS_LOG_ENABLED:
+                        log_request_stats(scope, message["status"], stats)
+                await send(message)
+
+            await self.app(scope, receive, send_with_stats)
+
+
+def log_request_stats(
+    scope: Scope, status_code: int, stats: request_stats.RequestStats
+):
+    """Registra no log, em JSON, as estatísticas de uma requisição."""
+    logger.info(
+        json.dumps(
+            {
+                "method": scope["method"],
+                "route": route_path(scope),
+                "status": status_code,
+                "queries": stats.queries,
+                **{
+                    f"{name}_ms": round(seconds * 1000, 1)
+                    for name, seconds in stats.phases().items()
+                },
+            }
+        )
+    )
+
+
+class GzipEncoder:
+    """Compressão gzip de um corpo de resposta, bloco a bloco."""
+
+    def __init__(self):
+        self.compressor = zlib.compressobj(
+            GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+        )
+
+    def compress(self, data: bytes) -> bytes:
+        """Comprime um bloco, liberando-o para envio imediato."""
+        return self.compressor.compress(data) + self.compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+
+    def finish(self, data: bytes) -> bytes:
+        """Comprime o último bloco e encerra o fluxo."""
+        return self.compressor.compress(data) + self.compressor.flush()
+
+
+class BrotliEncoder:
+    """Compressão brotli de um corpo de resposta, bloco a bloco."""
+
+    def __init__(self):
+        self.compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        """Comprime um bloco, liberando-o para envio imediato."""
+        return self.compressor.process(data) + self.compressor.flush()
+
+    def finish(self, data: bytes) -> bytes:
+        """Comprime o último bloco e encerra o fluxo."""
+        return self.compressor.process(data) + self.compressor.finish()
+
+
+# em ordem de preferência, quando o cliente aceita ambas com o mesmo peso
+ENCODERS = {"br": BrotliEncoder, "gzip": GzipEncoder}
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Escolhe a compressão da resposta conforme o cabeçalho
+    Accept-Encoding.
+
+    Args:
+        accept_encoding (str): valor do cabeçalho Accept-Encoding.
+
+    Returns:
+        Optional[str]: "br", "gzip" ou None, se o cliente não aceitar
+        nenhuma delas.
+    """
+    qualities = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[name.strip().lower()] = quality
+    default = qualities.get("*", 0.0)
+    encoding = max(ENCODERS, key=lambda name: qualities.get(name, default))
+    return encoding if qualities.get(encoding, default) > 0 else None
+
+
+class CompressionMiddleware:
+    """Comprime com brotli ou gzip, conforme o Accept-Encoding, as respostas
+    em JSON, NDJSON ou texto a partir de COMPRESSION_MINIMUM_SIZE bytes.
+
+    Nas respostas transmitidas aos poucos (NDJSON), cada bloco é comprimido
+    e enviado assim que chega, sem esperar o restante.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        encoding = None
+        if scope["type"] == "http":
+            accept_encoding = header_value(scope, b"accept-encoding")
+            if accept_encoding:
+                encoding = negotiate_encoding(accept_encoding.decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        encoder = None
+
+        async def send_compressed(message: Message):
+            nonlocal start_message, encoder
+            if message["type"] == "http.response.start":
+                # os cabeçalhos só são enviados com o primeiro bloco do
+                # corpo, quando se sabe se a resposta será comprimida
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                if start_message is not None:
+                    await send(start_message)
+                    start_message = None
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start_message is not None:
+                headers = MutableHeaders(scope=start_message)
+                start, start_message = start_message, None
+                if "content-encoding" not in headers and headers.get(
+                    "content-type", ""
+                ).startswith(COMPRESSIBLE_TYPES):
+                    headers.add_vary_header("Accept-Encoding")
+                    if more_body or len(body) >= self.minimum_size:
+                        encoder = ENCODERS[encoding]()
+                        headers["Content-Encoding"] = encoding
+                        del headers["Content-Length"]
+                if encoder is None:
+                    await send(start)
+                    await send(message)
+                    return
+                if not more_body:
+                    body = encoder.finish(body)
+                    headers["Content-Length"] = str(len(body))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send(start)
+            elif encoder is None:
+                await send(message)
+                return
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": (
+                        encoder.compress(body) if more_body else encoder.finish(body)
+                    ),
+                    "more_body": more_body,
+                }
+            )
+
+        await self.app(scope, receive, send_compressed)
+
+
+class RequestBodyTooLarge(Exception):
+    """O corpo descomprimido da requisição passa do limite."""
+
+
+class RequestDecompressionMiddleware:
+    """Descomprime os corpos de requisição enviados com
+    Content-Encoding: gzip.
+
+    O corpo é descomprimido por inteiro antes de a requisição seguir, e a
+    requisição é recusada, com erro 413, se o resultado passar de
+    REQUEST_MAX_DECOMPRESSED_SIZE bytes, o que protege a API de corpos
+    que crescem desproporcionalmente ao serem descomprimidos.
+    """
+
+    def __init__(
+        self, app: ASGIApp, max_size: int = REQUEST_MAX_DECOMPRESSED_SIZE
+    ):
+        self.app = app
+        self.max_size = max_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        content_encoding = (
+            header_value(scope, b"content-encoding")
+            if scope["type"] == "http"
+            else None
+        )
+        if content_encoding is None or content_encoding.lower() == b"identity":
+            await self.app(scope, receive, send)
+            return
+        if content_encoding.lower() != b"gzip":
+            response = JSONResponse(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                content={"detail": "Only gzip Content-Encoding is supported"},
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            body = await self.read_body(receive)
+        except zlib.error:
+            response = JSONResponse(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                content={"detail": "Invalid gzip request body"},
+            )
+        except RequestBodyTooLarge:
+            response = JSONResponse(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                content={
+                    "detail": "Decompressed request body exceeds "
+                    f"{self.max_size} bytes"
+                },
+            )
+        else:
+            response = None
+        if response is not None:
+            await response(scope, receive, send)
+            return
+        if body is None:  # o cliente desconectou
+            return
+
+        # altera o próprio scope, que os middlewares externos também leem
+        scope["headers"] = [
+            (name, value)
+            for name, value in scope["headers"]
+            if name not in (b"content-encoding", b"content-length")
+        ] + [(b"content-length", str(len(body)).encode())]
+        body_sent = False
+
+        async def receive_decompressed() -> Message:
+            nonlocal body_sent
+            if body_sent:
+                return await receive()
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        await self.app(scope, receive_decompressed, send)
+
+    async def read_body(self, receive: Receive) -> Optional[bytes]:
+        """Lê e descomprime o corpo da requisição.
+
+        Um corpo com vários membros gzip concatenados é descomprimido por
+        inteiro, com o limite de tamanho valendo para a soma dos membros.
+
+        Returns:
+            Optional[bytes]: O corpo descomprimido, ou None se o cliente
+            desconectou antes de enviá-lo por inteiro.
+
+        Raises:
+            zlib.error: O corpo não está no formato gzip ou tem dados
+                depois do último membro.
+            RequestBodyTooLarge: O corpo descomprimido passa de max_size
+                bytes.
+        """
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        chunks = []
+        size = 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return None
+            more_body = message.get("more_body", False)
+            data = message.get("body", b"")
+            while data:
+                if decompressor.eof:
+                    # outro membro gzip, concatenado ao anterior (RFC 1952);
+                    # dados que não são gzip geram zlib.error
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                chunk = decompressor.decompress(data, self.max_size - size + 1)
+                size += len(chunk)
+                if size > self.max_size:
+                    raise RequestBodyTooLarge()
+                chunks.append(chunk)
+                data = (
+                    decompressor.unused_data
+                    if decompressor.eof
+                    else decompressor.unconsumed_tail
+                )
+        if not decompressor.eof:
+            raise zlib.error("Corpo gzip incompleto")
+        return b"".join(chunks)
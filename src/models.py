@@ -12,11 +12,14 @@ from sqlalchemy import (
     Date,
     DateTime,
     ForeignKeyConstraint,
+    Index,
     Integer,
     String,
     UniqueConstraint,
 )
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
 from sqlalchemy.sql.functions import now
 
 from db_config import Base
@@ -136,7 +139,7 @@ class PlanoEntregas(Base):
         "entregas",
     )
     data_atualizacao = Column(DateTime)
-    data_insercao = Column(DateTime, nullable=False)
+    data_insercao = Column(DateTime, nullable=False, default=func.localtimestamp())
     entregas = relationship(
         "Entrega",
         back_populates="plano_entregas",
@@ -151,6 +154,23 @@ class PlanoEntregas(Base):
             "id_plano_entregas",
             name="_instituidora_plano_entregas_uc",
         ),
+        # listagem por unidade executora e verificação de sobreposição de
+        # períodos
+        Index(
+            "ix_plano_entregas_executora_periodo",
+            "origem_unidade",
+            "cod_unidade_autorizadora",
+            "cod_unidade_executora",
+            "data_inicio",
+            "data_termino",
+        ),
+        # feed de alterações
+        Index(
+            "ix_plano_entregas_data_alteracao",
+            origem_unidade,
+            cod_unidade_autorizadora,
+            func.coalesce(data_atualizacao, data_insercao),
+        ),
     )
 
 
@@ -214,7 +234,7 @@ class Entrega(Base):
         comment="Nome da unidade destinatária ou beneficiária da entrega.",
     )
     data_atualizacao = Column(DateTime)
-    data_insercao = Column(DateTime, nullable=False)
+    data_insercao = Column(DateTime, nullable=False, default=func.localtimestamp())
     # relacionamentos
     plano_entregas = relationship(
         "PlanoEntregas",
@@ -372,7 +392,7 @@ class PlanoTrabalho(Base):
         "ocorrências e afastamentos.",
     )
     data_atualizacao = Column(DateTime)
-    data_insercao = Column(DateTime, nullable=False)
+    data_insercao = Column(DateTime, nullable=False, default=func.localtimestamp())
     contribuicoes = relationship(
         "Contribuicao",
         back_populates="plano_trabalho",
@@ -413,6 +433,31 @@ class PlanoTrabalho(Base):
             "id_plano_trabalho",
             name="_plano_trabalho_uc",
         ),
+        # listagem por unidade executora e participante e verificação de
+        # sobreposição de períodos
+        Index(
+            "ix_plano_trabalho_executora_matricula_periodo",
+            "origem_unidade",
+            "cod_unidade_autorizadora",
+            "cod_unidade_executora",
+            "matricula_siape",
+            "data_inicio",
+            "data_termino",
+        ),
+        # listagem por participante, independente da unidade executora
+        Index(
+            "ix_plano_trabalho_matricula",
+            "origem_unidade",
+            "cod_unidade_autorizadora",
+            "matricula_siape",
+        ),
+        # feed de alterações
+        Index(
+            "ix_plano_trabalho_data_alteracao",
+            origem_unidade,
+            cod_unidade_autorizadora,
+            func.coalesce(data_atualizacao, data_insercao),
+        ),
     )
 
 
@@ -468,7 +513,7 @@ class Contribuicao(Base):
         ),
     )
     data_atualizacao = Column(DateTime)
-    data_insercao = Column(DateTime, nullable=False)
+    data_insercao = Column(DateTime, nullable=False, default=func.localtimestamp())
     # relacionamentos
     plano_trabalho = relationship(
         "PlanoTrabalho",
@@ -512,6 +557,12 @@ class Contribuicao(Base):
                 "plano_trabalho.id_plano_trabalho",
             ],
         ),
+        Index(
+            "ix_contribuicao_plano_trabalho",
+            "origem_unidade_pt",
+            "cod_unidade_autorizadora_pt",
+            "id_plano_trabalho",
+        ),
     )
 
 
@@ -566,7 +617,7 @@ class AvaliacaoRegistrosExecucao(Base):
         "data futura”",
     )
     data_atualizacao = Column(DateTime)
-    data_insercao = Column(DateTime, nullable=False)
+    data_insercao = Column(DateTime, nullable=False, default=func.localtimestamp())
     plano_trabalho = relationship(
         "PlanoTrabalho",
         back_populates="avaliacoes_registros_execucao",
@@ -598,6 +649,12 @@ class AvaliacaoRegistrosExecucao(Base):
                 "plano_trabalho.id_plano_trabalho",
             ],
         ),
+        Index(
+            "ix_avaliacao_registros_execucao_plano_trabalho",
+            "origem_unidade_pt",
+            "cod_unidade_autorizadora_pt",
+            "id_plano_trabalho",
+        ),
     )
 
 
@@ -702,12 +759,61 @@ class Participante(Base):
         "haver repactuação.",
     )
     data_atualizacao = Column(DateTime)
-    data_insercao = Column(DateTime, nullable=False)
+    data_insercao = Column(DateTime, nullable=False, default=func.localtimestamp())
     planos_trabalho = relationship(
         "PlanoTrabalho",
         back_populates="participante",
         lazy="joined",
     )
+    __table_args__ = (
+        # feed de alterações
+        Index(
+            "ix_participante_data_alteracao",
+            origem_unidade,
+            cod_unidade_autorizadora,
+            func.coalesce(data_atualizacao, data_insercao),
+        ),
+    )
+
+
+class RegistroRemovido(Base):
+    "Marca (tombstone) de participante, plano de entregas ou plano de trabalho removido"
+    __tablename__ = "registro_removido"
+
+    tipo = Column(
+        String,
+        primary_key=True,
+        comment="Tabela de onde o registro foi removido: “participante”, "
+        "“plano_entregas” ou “plano_trabalho”.",
+    )
+    origem_unidade = Column(
+        String,
+        primary_key=True,
+        comment="Código do sistema da unidade: “SIAPE” ou “SIORG”.",
+    )
+    cod_unidade_autorizadora = Column(
+        BigInteger,
+        primary_key=True,
+        comment="Código da unidade autorizadora do registro removido.",
+    )
+    chave = Column(
+        JSONB,
+        primary_key=True,
+        comment="Demais campos da chave do registro removido.",
+    )
+    data_remocao = Column(
+        DateTime,
+        nullable=False,
+        comment="Data e hora da remoção.",
+    )
+    __table_args__ = (
+        Index(
+            "ix_registro_removido_data_remocao",
+            "origem_unidade",
+            "cod_unidade_autorizadora",
+            "data_remocao",
+        ),
+    )
 
 
 class Users(Base):
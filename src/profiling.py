@@ -0,0 +1,144 @@
+"""Profiling por amostragem de requisições individuais.
+
+Um administrador pode pedir o profiling de uma requisição com o cabeçalho
+X-Profile ("html", o padrão, ou "speedscope"); a variável de ambiente
+PROFILING_SAMPLE_RATE faz o mesmo com uma fração das requisições
+autenticadas de qualquer usuário. O profiler, o pyinstrument, amostra a
+pilha de execução da requisição a partir da autenticação, passando pela
+validação, pelo endpoint e pela serialização da resposta, e o resultado é
+gravado em PROFILING_DIR. Para as requisições pedidas, o nome do arquivo
+volta no cabeçalho X-Profile da resposta e o arquivo pode ser baixado em
+/profiling/{nome}.
+
+Quando não há profiling, o custo por requisição é o de procurar o
+cabeçalho.
+"""
+
+import asyncio
+from datetime import datetime
+import os
+import random
+import re
+from typing import Callable, Optional
+import uuid
+
+from fastapi import Request
+from fastapi.routing import APIRoute
+from pyinstrument import Profiler
+from pyinstrument.renderers import SpeedscopeRenderer
+
+import schemas
+
+PROFILE_HEADER = "X-Profile"
+PROFILING_DIR = os.environ.get("PROFILING_DIR", "/tmp/api-pgd-profiles")
+PROFILING_SAMPLE_RATE = float(os.environ.get("PROFILING_SAMPLE_RATE", 0))
+PROFILING_INTERVAL = float(os.environ.get("PROFILING_INTERVAL_SECONDS", 0.001))
+PROFILING_MAX_FILES = int(os.environ.get("PROFILING_MAX_FILES", 100))
+
+FORMATS = {"html": "html", "speedscope": "json"}
+PROFILE_NAME_PATTERN = re.compile(r"^[\w-]+\.(html|json)$")
+
+
+def start_profiling(request: Request, user: schemas.UsersSchema):
+    """Inicia o profiling da requisição, se um administrador o pediu ou
+    se ela foi sorteada.
+
+    Deve ser chamada na tarefa que executa o endpoint, como nas
+    dependências assíncronas, para que o profiler acompanhe somente
+    essa requisição.
+
+    Args:
+        request (Request): Requisição em andamento.
+        user (schemas.UsersSchema): Usuário autenticado.
+    """
+    requested = request.headers.get(PROFILE_HEADER)
+    if requested is not None and user.is_admin:
+        profile_format = requested.lower()
+        if profile_format not in FORMATS:
+            profile_format = "html"
+    elif PROFILING_SAMPLE_RATE > 0 and random.random() < PROFILING_SAMPLE_RATE:
+        requested = None
+        profile_format = "html"
+    else:
+        return
+    if getattr(request.state, "profiler", None) is not None:
+        return
+    profiler = Profiler(interval=PROFILING_INTERVAL, async_mode="enabled")
+    profiler.start()
+    request.state.profiler = profiler
+    request.state.profile_format = profile_format
+    request.state.profile_requested = requested is not None
+
+
+def profile_path(name: str) -> str:
+    """Caminho do arquivo de um profiling gravado.
+
+    Raises:
+        ValueError: Nome de arquivo inválido.
+    """
+    if not PROFILE_NAME_PATTERN.match(name):
+        raise ValueError("Nome de arquivo inválido")
+    return os.path.join(PROFILING_DIR, name)
+
+
+def _write_profile(profiler: Profiler, profile_format: str, name: str):
+    """Gera a saída do profiler, grava-a e apaga os arquivos mais antigos
+    além de PROFILING_MAX_FILES."""
+    if profile_format == "speedscope":
+        content = profiler.output(renderer=SpeedscopeRenderer())
+    else:
+        content = profiler.output_html()
+    os.makedirs(PROFILING_DIR, exist_ok=True)
+    with open(profile_path(name), "w", encoding="utf-8") as file:
+        file.write(content)
+    files = sorted(
+        (entry for entry in os.scandir(PROFILING_DIR) if entry.is_file()),
+        key=lambda entry: entry.stat().st_mtime,
+    )
+    for entry in files[: max(0, len(files) - PROFILING_MAX_FILES)]:
+        os.remove(entry.path)
+
+
+async def finish_profiling(request: Request) -> Optional[str]:
+    """Encerra o profiling da requisição, se houver, e grava o resultado
+    numa thread à parte.
+
+    Args:
+        request (Request): Requisição em andamento.
+
+    Returns:
+        Optional[str]: Nome do arquivo gravado, se o profiling foi pedido
+        no cabeçalho da requisição.
+    """
+    profiler: Optional[Profiler] = getattr(request.state, "profiler", None)
+    if profiler is None:
+        return None
+    profiler.stop()
+    request.state.profiler = None
+    profile_format = request.state.profile_format
+    name = (
+        f"{datetime.now():%Y%m%dT%H%M%S}-{request.method}-{uuid.uuid4().hex[:8]}"
+        f".{FORMATS[profile_format]}"
+    )
+    await asyncio.to_thread(_write_profile, profiler, profile_format, name)
+    return name if request.state.profile_requested else None
+
+
+class ProfiledRoute(APIRoute):
+    """Rota que encerra, ao final do tratamento da requisição, o profiling
+    iniciado pela autenticação."""
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def profiled_handler(request: Request):
+            response = None
+            try:
+                response = await handler(request)
+                return response
+            finally:
+                name = await finish_profiling(request)
+                if name is not None and response is not None:
+                    response.headers[PROFILE_HEADER] = name
+
+        return profiled_handler
@@ -0,0 +1,88 @@
+"""Leitura das próprias gravações com a réplica de leitura.
+
+Depois de gravar, a API devolve ao cliente, num cookie, a posição do WAL
+do banco de dados principal logo após a gravação. Enquanto o cookie valer
+(DB_REPLICA_PIN_SECONDS segundos), as consultas do cliente só usam a
+réplica se ela já tiver reproduzido o WAL até essa posição; senão, vão ao
+banco principal. Como a posição acompanha o cliente, e não fica na memória
+de um processo, vale em qualquer worker ou instância da API.
+
+Cada requisição guarda as posições numa ReplicaConsistency, mantida numa
+ContextVar pelo ReplicaConsistencyMiddleware (ver middleware.py).
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+import os
+import re
+from typing import Iterator, Optional
+
+# Por quantos segundos, após gravar algo, o cliente exige da réplica a
+# posição do WAL da sua gravação.
+DB_REPLICA_PIN_SECONDS = float(os.environ.get("DB_REPLICA_PIN_SECONDS", 10))
+WAL_LSN_COOKIE = "api_pgd_wal_lsn"
+WAL_LSN_PATTERN = re.compile(r"[0-9A-Fa-f]{1,8}/[0-9A-Fa-f]{1,8}")
+
+
+@dataclass
+class ReplicaConsistency:
+    """Posições do WAL do banco principal na requisição em andamento.
+
+    required_lsn vem do cookie enviado pelo cliente; written_lsn é a
+    posição após a última gravação da própria requisição, devolvida ao
+    cliente no cookie.
+    """
+
+    required_lsn: Optional[str] = None
+    written_lsn: Optional[str] = None
+
+    @property
+    def min_replica_lsn(self) -> Optional[str]:
+        """Posição que a réplica precisa ter reproduzido para atender às
+        consultas da requisição, se houver."""
+        return self.written_lsn or self.required_lsn
+
+
+_current: ContextVar[Optional[ReplicaConsistency]] = ContextVar(
+    "replica_consistency", default=None
+)
+
+
+def current_replica_consistency() -> Optional[ReplicaConsistency]:
+    """Retorna as posições do WAL da requisição em andamento, se houver."""
+    return _current.get()
+
+
+def parse_wal_lsn(value: Optional[str]) -> Optional[str]:
+    """Valida uma posição do WAL recebida do cliente.
+
+    Args:
+        value (Optional[str]): Valor do cookie, no formato de pg_lsn.
+
+    Returns:
+        Optional[str]: A posição, ou None se o valor for inválido.
+    """
+    if value is None or not WAL_LSN_PATTERN.fullmatch(value):
+        return None
+    return value
+
+
+@contextmanager
+def track_replica_consistency(
+    required_lsn: Optional[str],
+) -> Iterator[ReplicaConsistency]:
+    """Guarda as posições do WAL de uma requisição enquanto o bloco executa.
+
+    Args:
+        required_lsn (Optional[str]): Posição do WAL enviada pelo cliente.
+
+    Yields:
+        ReplicaConsistency: As posições do WAL da requisição.
+    """
+    consistency = ReplicaConsistency(required_lsn=required_lsn)
+    token = _current.set(consistency)
+    try:
+        yield consistency
+    finally:
+        _current.reset(token)
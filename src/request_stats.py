@@ -0,0 +1,186 @@
+"""Consultas ao banco de dados e tempo de cada fase de uma requisição.
+
+Cada requisição acumula, num RequestStats guardado numa ContextVar, a
+quantidade de comandos SQL executados, o tempo gasto no banco de dados e
+os instantes que delimitam as fases de autenticação, validação da
+requisição, execução do endpoint e serialização da resposta. Esses
+números vão para o cabeçalho Server-Timing e para o log da requisição.
+"""
+
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import wraps
+import time
+from typing import Callable, Iterator, Optional
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+@dataclass
+class RequestStats:
+    """Estatísticas de uma requisição em andamento.
+
+    Os instantes são valores de time.perf_counter(); os que ficarem None
+    correspondem a fases pelas quais a requisição não passou, como nas
+    rotas sem endpoint ou quando a autenticação falha.
+    """
+
+    start: float = field(default_factory=time.perf_counter)
+    end: Optional[float] = None
+    queries: int = 0
+    db_seconds: float = 0.0
+    auth_seconds: float = 0.0
+    handler_start: Optional[float] = None
+    endpoint_start: Optional[float] = None
+    endpoint_end: Optional[float] = None
+    handler_end: Optional[float] = None
+
+    def phases(self) -> dict[str, float]:
+        """Calcula a duração, em segundos, de cada fase da requisição.
+
+        A validação é o tempo de leitura da requisição e resolução das
+        dependências do endpoint, exceto a autenticação. As fases podem se
+        sobrepor: as consultas da autenticação também contam em "db".
+
+        Returns:
+            dict[str, float]: Duração de cada fase, por nome.
+        """
+        phases = {"auth": self.auth_seconds}
+        if self.handler_start is not None and self.endpoint_start is not None:
+            phases["validation"] = max(
+                0.0, self.endpoint_start - self.handler_start - self.auth_seconds
+            )
+        phases["db"] = self.db_seconds
+        if self.endpoint_end is not None and self.handler_end is not None:
+            phases["serialization"] = self.handler_end - self.endpoint_end
+        phases["total"] = (self.end or time.perf_counter()) - self.start
+        return phases
+
+    def server_timing(self) -> str:
+        """Monta o valor do cabeçalho Server-Timing, em milissegundos."""
+        return ", ".join(
+            f"{name};dur={seconds * 1000:.1f}"
+            + (f';desc="{self.queries} consultas"' if name == "db" else "")
+            for name, seconds in self.phases().items()
+        )
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar(
+    "request_stats", default=None
+)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    """Retorna as estatísticas da requisição em andamento, se houver."""
+    return _current.get()
+
+
+@contextmanager
+def track_request() -> Iterator[RequestStats]:
+    """Acumula as estatísticas de uma requisição enquanto o bloco executa.
+
+    Yields:
+        RequestStats: As estatísticas da requisição.
+    """
+    stats = RequestStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        stats.end = time.perf_counter()
+        _current.reset(token)
+
+
+@contextmanager
+def auth_phase() -> Iterator[None]:
+    """Soma a duração do bloco ao tempo de autenticação da requisição."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats = _current.get()
+        if stats is not None:
+            stats.auth_seconds += time.perf_counter() - start
+
+
+class TimedRoute(APIRoute):
+    """Rota que registra o início e o fim do seu tratamento e da execução
+    do endpoint, delimitando as fases de validação e serialização."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        call = self.dependant.call
+        # o handler da rota decide antes como chamar o endpoint; endpoints
+        # síncronos, executados numa thread, não são medidos
+        if asyncio.iscoroutinefunction(call):
+
+            @wraps(call)
+            async def timed_call(*call_args, **call_kwargs):
+                stats = _current.get()
+                if stats is not None:
+                    stats.endpoint_start = time.perf_counter()
+                try:
+                    return await call(*call_args, **call_kwargs)
+                finally:
+                    if stats is not None:
+                        stats.endpoint_end = time.perf_counter()
+
+            self.dependant.call = timed_call
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            stats = _current.get()
+            if stats is not None:
+                stats.handler_start = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                if stats is not None:
+                    stats.handler_end = time.perf_counter()
+
+        return timed_handler
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # pylint: disable=unused-argument,too-many-arguments
+    conn.info.setdefault("request_stats_query_start", []).append(
+        time.perf_counter()
+    )
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # pylint: disable=unused-argument,too-many-arguments
+    start = conn.info["request_stats_query_start"].pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - start
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("request_stats_query_start"):
+        start = conn.info["request_stats_query_start"].pop()
+        stats = _current.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += time.perf_counter() - start
+
+
+def instrument_engine(engine: AsyncEngine):
+    """Passa a contar os comandos executados pelo engine e o seu tempo
+    nas estatísticas da requisição em andamento.
+
+    Args:
+        engine (AsyncEngine): Engine a instrumentar.
+    """
+    sync_engine = engine.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
@@ -5,11 +5,11 @@ A principal ferramenta de validação de dados usada no FastAPI é o
 Pydantic: https://docs.pydantic.dev/2.0/
 """
 
-from datetime import date
+from datetime import date, datetime
 from enum import Enum, IntEnum
-from typing import Annotated, List, Optional
+from typing import Annotated, List, Literal, Optional
 
-from pydantic import BaseModel, ConfigDict, Field, EmailStr
+from pydantic import BaseModel, ConfigDict, Field, EmailStr, SerializeAsAny
 from pydantic import NonNegativeInt, PastDatetime, PositiveInt
 from pydantic import model_validator, field_validator
 
@@ -352,6 +352,24 @@ class PlanoTrabalhoBase(BaseModel):
 class PlanoTrabalhoResponseSchema(PlanoTrabalhoBase):
     pass
 
+# Utilizado para listagens (sem validação). As listas de contribuições e de
+# avaliações são nulas quando não solicitadas.
+class PlanoTrabalhoListItemSchema(PlanoTrabalhoBase):
+    contribuicoes: Optional[List[ContribuicaoSchema]] = Field(
+        default=None,
+        title="Contribuições",
+        description="Lista de Contribuições planejadas para o Plano de "
+        "Trabalho. Nula se não solicitada no parâmetro `include`.",
+    )
+    avaliacoes_registros_execucao: Optional[List[AvaliacaoRegistrosExecucaoSchema]] = (
+        Field(
+            default=None,
+            title="Avaliações de registros de execução",
+            description="Lista de avaliações de registros de execução do Plano "
+            "de Trabalho. Nula se não solicitada no parâmetro `include`.",
+        )
+    )
+
 # Utilizado para requisições POST/PUT (com validação)
 class PlanoTrabalhoSchema(PlanoTrabalhoBase):
 
@@ -540,6 +558,16 @@ class PlanoEntregasBase(BaseModel):
 class PlanoEntregasResponseSchema(PlanoEntregasBase):
     pass
 
+# Utilizado para listagens (sem validação). A lista de entregas é nula
+# quando não solicitada.
+class PlanoEntregasListItemSchema(PlanoEntregasBase):
+    entregas: Optional[List[EntregaSchema]] = Field(
+        default=None,
+        title="Entregas",
+        description="Lista de entregas associadas ao Plano de Entregas. "
+        "Nula se não solicitada no parâmetro `include`.",
+    )
+
 # Utilizado para requisições POST/PUT (com validação)
 class PlanoEntregasSchema(PlanoEntregasBase):
     @model_validator(mode="after")
@@ -664,6 +692,102 @@ class ParticipanteSchema(BaseModel):
         return self
 
 
+class RegistroExportacaoSchema(BaseModel):
+    """Linha da exportação em NDJSON dos dados de uma unidade autorizadora."""
+
+    tipo: Literal["participante", "plano_entregas", "plano_trabalho"] = Field(
+        title="Tipo do registro",
+        description="Define o esquema do conteúdo do campo `dados`.",
+    )
+    cursor: str = Field(
+        title="Cursor do registro",
+        description="Para retomar a exportação a partir do registro "
+        "seguinte, informe este valor no parâmetro `cursor`.",
+    )
+    dados: SerializeAsAny[BaseModel] = Field(
+        title="Dados do registro",
+        description="Participante, Plano de Entregas com as entregas ou "
+        "Plano de Trabalho com as contribuições e avaliações.",
+    )
+
+
+class AlteracaoSchema(BaseModel):
+    """Registro do feed de alterações de uma unidade autorizadora."""
+
+    tipo: Literal["participante", "plano_entregas", "plano_trabalho"] = Field(
+        title="Tipo do registro",
+        description="Define o esquema do conteúdo do campo `dados`.",
+    )
+    cursor: str = Field(
+        title="Cursor da alteração",
+        description="Para obter as alterações seguintes, informe este valor "
+        "no parâmetro `cursor`.",
+    )
+    data_alteracao: datetime = Field(
+        title="Data da alteração",
+        description="Data e hora da inclusão, atualização ou remoção do registro.",
+    )
+    removido: bool = Field(
+        title="Registro removido",
+        description="Se o registro foi removido. Neste caso, somente a `chave` "
+        "é informada.",
+    )
+    chave: dict = Field(
+        title="Chave do registro",
+        description="Campos que identificam o registro na unidade autorizadora.",
+    )
+    dados: Optional[SerializeAsAny[BaseModel]] = Field(
+        default=None,
+        title="Dados do registro",
+        description="Versão atual do Participante, do Plano de Entregas com "
+        "as entregas ou do Plano de Trabalho com as contribuições e "
+        "avaliações. Nulo se o registro foi removido.",
+    )
+
+
+class RegistroAuditoriaSchema(BaseModel):
+    """Registro da trilha de auditoria de um participante, plano de
+    entregas ou plano de trabalho."""
+
+    cursor: str = Field(
+        title="Cursor do registro",
+        description="Para obter os registros seguintes, informe este valor "
+        "no parâmetro `cursor`.",
+    )
+    id: int = Field(title="Id do registro de auditoria")
+    operacao: Literal["INSERT", "UPDATE", "DELETE"] = Field(
+        title="Operação",
+        description="Operação feita no banco de dados.",
+    )
+    tabela: str = Field(
+        title="Tabela",
+        description="Tabela do registro alterado: o próprio plano ou "
+        "participante ou um dos seus registros filhos.",
+    )
+    chave: dict = Field(
+        title="Chave do registro",
+        description="Campos que identificam o registro alterado.",
+    )
+    registro_antigo: Optional[dict] = Field(
+        default=None,
+        title="Registro antigo",
+        description="Registro removido ou, numa atualização, os valores "
+        "anteriores dos campos alterados.",
+    )
+    registro_novo: Optional[dict] = Field(
+        default=None,
+        title="Registro novo",
+        description="Registro incluído ou, numa atualização, os novos "
+        "valores dos campos alterados.",
+    )
+    usuario: Optional[str] = Field(
+        default=None,
+        title="Usuário",
+        description="Usuário do banco de dados que fez a operação.",
+    )
+    data_operacao: datetime = Field(title="Data e hora da operação")
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str
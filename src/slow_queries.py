@@ -0,0 +1,284 @@
+"""Registro das consultas lentas ao banco de dados, com o plano de execução.
+
+Os comandos feitos a partir de crud.py e crud_auth.py que demorarem mais
+que SLOW_QUERY_THRESHOLD_SECONDS são registrados no log, em JSON, com o
+SQL, a origem e os parâmetros, estes com os CPFs ocultados. Os comandos
+são agrupados por fingerprint, o SQL sem os valores e com as listas de
+parâmetros de tamanho variável reduzidas, e para cada fingerprint é
+obtido o plano de execução (EXPLAIN, sem executar o comando), numa
+tarefa à parte e com outra conexão, no máximo uma vez a cada
+SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS. Assim, é possível ver quando uma
+consulta passa a ler sequencialmente uma tabela que cresceu.
+
+Os totais por fingerprint e o último plano de cada um, com as tabelas
+lidas sequencialmente, podem ser consultados por administradores em
+/consultas_lentas.
+"""
+
+import asyncio
+from collections.abc import Mapping
+import contextvars
+from dataclasses import dataclass, field
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+from typing import Any, Iterator, Optional
+
+from greenlet import getcurrent
+from sqlalchemy import event
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from metrics import SLOW_QUERIES
+
+SLOW_QUERY_THRESHOLD = float(os.environ.get("SLOW_QUERY_THRESHOLD_SECONDS", 0.5))
+SLOW_QUERY_EXPLAIN_INTERVAL = float(
+    os.environ.get("SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS", 300)
+)
+# módulos cujos comandos são registrados
+SLOW_QUERY_ORIGINS = frozenset({"crud.py", "crud_auth.py"})
+EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+CPF_PATTERN = re.compile(r"(?<!\d)\d{11}(?!\d)")
+REDACTED_CPF = "<cpf>"
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def fingerprint(statement: str) -> str:
+    """Normaliza o SQL para agrupar os comandos iguais, exceto pelos
+    valores e pela quantidade de itens das listas de parâmetros."""
+    normalized = re.sub(r"%\(\w+\)s|\$\d+|%s", "?", statement)
+    normalized = re.sub(r"'(?:[^']|'')*'", "?", normalized)
+    normalized = re.sub(r"(?<![\w.])\d+(?:\.\d+)?\b", "?", normalized)
+    normalized = re.sub(r"\s+", " ", normalized).strip()
+    # listas de tamanho variável, como IN (?, ?, ?) ou VALUES (?, ?), (?, ?)
+    normalized = re.sub(r"\(\?(?:, \?)*\)", "(?)", normalized)
+    normalized = re.sub(r"\(\?\)(?:, \(\?\))+", "(?)", normalized)
+    return normalized
+
+
+def redact(value: Any, key: str = "") -> Any:
+    """Oculta os CPFs de um valor ou dos itens de uma coleção."""
+    if "cpf" in key.lower() and value is not None:
+        return REDACTED_CPF
+    if isinstance(value, str):
+        return CPF_PATTERN.sub(REDACTED_CPF, value)
+    if isinstance(value, Mapping):
+        return {name: redact(item, str(name)) for name, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    return value
+
+
+def seq_scan_relations(plan: Any) -> list[str]:
+    """Tabelas lidas sequencialmente num plano de execução em JSON."""
+
+    def walk(node: Any) -> Iterator[str]:
+        if isinstance(node, list):
+            for item in node:
+                yield from walk(item)
+        elif isinstance(node, dict):
+            if node.get("Node Type") == "Seq Scan":
+                yield node.get("Relation Name", "?")
+            for item in node.values():
+                if isinstance(item, (list, dict)):
+                    yield from walk(item)
+
+    return sorted(set(walk(plan)))
+
+
+def statement_origin() -> Optional[str]:
+    """Procura, na pilha de execução, a função de SLOW_QUERY_ORIGINS que
+    fez o comando.
+
+    No SQLAlchemy assíncrono, o comando é executado num greenlet filho do
+    que executa a corrotina; a busca continua na pilha dos greenlets pais.
+    """
+    frame = sys._getframe(1)  # pylint: disable=protected-access
+    current = getcurrent()
+    while True:
+        while frame is not None:
+            if os.path.basename(frame.f_code.co_filename) in SLOW_QUERY_ORIGINS:
+                module = os.path.basename(frame.f_code.co_filename)[:-3]
+                return f"{module}.{frame.f_code.co_name}"
+            frame = frame.f_back
+        current = current.parent
+        if current is None:
+            return None
+        frame = current.gr_frame
+
+
+@dataclass
+class SlowQueryStats:
+    """Totais das consultas lentas de um fingerprint."""
+
+    statement: str
+    count: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    origins: set[str] = field(default_factory=set)
+    plan: Optional[Any] = None
+    seq_scans: list[str] = field(default_factory=list)
+    explained_at: Optional[float] = None
+
+    def summary(self, fingerprint_id: str) -> dict:
+        """Resumo dos totais, para consulta."""
+        return {
+            "fingerprint": fingerprint_id,
+            "statement": self.statement,
+            "origins": sorted(self.origins),
+            "count": self.count,
+            "total_seconds": round(self.total_seconds, 3),
+            "max_seconds": round(self.max_seconds, 3),
+            "seq_scans": self.seq_scans,
+            "plan": self.plan,
+        }
+
+
+class SlowQueryLog:
+    """Consultas lentas agrupadas por fingerprint."""
+
+    def __init__(self, threshold: float, explain_interval: float):
+        self.threshold = threshold
+        self.explain_interval = explain_interval
+        self.stats: dict[str, SlowQueryStats] = {}
+        self.tasks: set[asyncio.Task] = set()
+
+    def record(
+        self,
+        engine: AsyncEngine,
+        statement: str,
+        parameters: Any,
+        seconds: float,
+        origin: str,
+    ):
+        """Registra uma consulta lenta e, se for a hora, agenda a obtenção
+        do seu plano de execução."""
+        SLOW_QUERIES.labels(origin).inc()
+        if isinstance(parameters, Mapping):
+            parameters = dict(parameters)
+        normalized = fingerprint(statement)
+        fingerprint_id = hashlib.sha1(normalized.encode()).hexdigest()[:12]
+        stats = self.stats.setdefault(fingerprint_id, SlowQueryStats(normalized))
+        stats.count += 1
+        stats.total_seconds += seconds
+        stats.max_seconds = max(stats.max_seconds, seconds)
+        stats.origins.add(origin)
+        logger.warning(
+            json.dumps(
+                {
+                    "slow_query": fingerprint_id,
+                    "origin": origin,
+                    "seconds": round(seconds, 3),
+                    "statement": statement,
+                    "parameters": redact(parameters),
+                },
+                default=str,
+            )
+        )
+        now = time.monotonic()
+        if not statement.lstrip().upper().startswith(EXPLAINABLE) or (
+            stats.explained_at is not None
+            and now - stats.explained_at < self.explain_interval
+        ):
+            return
+        stats.explained_at = now
+        # num contexto vazio, para que o EXPLAIN não conte nas
+        # estatísticas da requisição em andamento
+        task = asyncio.get_running_loop().create_task(
+            self._explain(engine, fingerprint_id, statement, parameters),
+            context=contextvars.Context(),
+        )
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _explain(
+        self,
+        engine: AsyncEngine,
+        fingerprint_id: str,
+        statement: str,
+        parameters: Any,
+    ):
+        """Obtém e registra o plano de execução do comando."""
+        try:
+            async with engine.connect() as conn:
+                result = await conn.exec_driver_sql(
+                    f"EXPLAIN (ANALYZE off, FORMAT JSON) {statement}", parameters
+                )
+                plan = result.scalar_one()
+        except SQLAlchemyError as exception:
+            logger.warning(
+                "EXPLAIN da consulta lenta %s falhou: %s", fingerprint_id, exception
+            )
+            return
+        # os valores dos parâmetros aparecem nos filtros do plano
+        plan = json.loads(CPF_PATTERN.sub(REDACTED_CPF, json.dumps(plan)))
+        stats = self.stats[fingerprint_id]
+        stats.plan = plan
+        stats.seq_scans = seq_scan_relations(plan)
+        logger.warning(
+            json.dumps(
+                {
+                    "slow_query": fingerprint_id,
+                    "seq_scans": stats.seq_scans,
+                    "plan": plan,
+                }
+            )
+        )
+
+    def summary(self) -> list[dict]:
+        """Totais por fingerprint, do maior tempo total para o menor."""
+        return [
+            stats.summary(fingerprint_id)
+            for fingerprint_id, stats in sorted(
+                self.stats.items(), key=lambda item: -item[1].total_seconds
+            )
+        ]
+
+
+slow_query_log = SlowQueryLog(SLOW_QUERY_THRESHOLD, SLOW_QUERY_EXPLAIN_INTERVAL)
+
+
+def instrument_engine(engine: AsyncEngine):
+    """Passa a registrar as consultas lentas feitas pelo engine.
+
+    Args:
+        engine (AsyncEngine): Engine a instrumentar.
+    """
+    if slow_query_log.threshold <= 0:
+        return
+
+    def before_cursor_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ):
+        # pylint: disable=unused-argument,too-many-arguments
+        conn.info.setdefault("slow_query_start", []).append(time.perf_counter())
+
+    def after_cursor_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ):
+        # pylint: disable=unused-argument,too-many-arguments
+        seconds = time.perf_counter() - conn.info["slow_query_start"].pop()
+        if seconds < slow_query_log.threshold:
+            return
+        origin = statement_origin()
+        if origin is None:
+            return
+        if executemany:
+            parameters = parameters[0] if parameters else None
+        slow_query_log.record(engine, statement, parameters, seconds, origin)
+
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("slow_query_start"):
+            conn.info["slow_query_start"].pop()
+
+    sync_engine = engine.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(sync_engine, "handle_error", handle_error)
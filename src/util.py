@@ -1,11 +1,18 @@
 """Funções de utilidade comum.
 """
 
+import base64
 import calendar
 from datetime import date, timedelta
+import json
+from typing import AsyncIterator
 
 from fastapi import status, HTTPException
 from httpx import Response
+from pydantic import BaseModel
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+NDJSON_CHUNK_SIZE = 64 * 1024
 
 
 def over_a_year(start: date, end: date) -> int:
@@ -70,3 +77,82 @@ def check_permissions(
             status.HTTP_403_FORBIDDEN,
             detail="Usuário não tem permissão na cod_unidade_autorizadora informada",
         )
+
+
+def accepts_ndjson(accept: str | None) -> bool:
+    """Verifica se o cliente pediu a resposta em NDJSON (um documento
+    JSON por linha) pelo cabeçalho Accept.
+
+    Args:
+        accept (str | None): valor do cabeçalho Accept.
+
+    Returns:
+        bool: True se o cliente aceita NDJSON.
+    """
+    return bool(accept) and NDJSON_MEDIA_TYPE in accept
+
+
+async def ndjson_stream(
+    items: AsyncIterator[BaseModel], chunk_size: int = NDJSON_CHUNK_SIZE
+) -> AsyncIterator[str]:
+    """Serializa, à medida em que são lidos, os itens de um iterador
+    assíncrono no formato NDJSON.
+
+    As linhas são agrupadas em blocos de aproximadamente `chunk_size`
+    caracteres, para evitar uma escrita na rede por item.
+
+    Args:
+        items (AsyncIterator[BaseModel]): itens a serializar.
+        chunk_size (int): tamanho aproximado de cada bloco enviado.
+
+    Yields:
+        str: bloco com uma ou mais linhas JSON, uma por item.
+    """
+    lines = []
+    size = 0
+    async for item in items:
+        line = item.model_dump_json() + "\n"
+        lines.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield "".join(lines)
+            lines = []
+            size = 0
+    if lines:
+        yield "".join(lines)
+
+
+def encode_cursor(*values) -> str:
+    """Codifica os valores da chave de um registro em um cursor opaco de
+    paginação, seguro para uso em URLs.
+
+    Args:
+        values: valores serializáveis em JSON.
+
+    Returns:
+        str: o cursor.
+    """
+    return base64.urlsafe_b64encode(
+        json.dumps(values, separators=(",", ":")).encode("utf-8")
+    ).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> list:
+    """Decodifica um cursor gerado por `encode_cursor`.
+
+    Args:
+        cursor (str): o cursor.
+
+    Raises:
+        ValueError: cursor inválido.
+
+    Returns:
+        list: os valores da chave do registro.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (UnicodeError, ValueError) as exception:
+        raise ValueError("Cursor inválido") from exception
+    if not isinstance(values, list) or not values:
+        raise ValueError("Cursor inválido")
+    return values
@@ -0,0 +1,200 @@
+"""
+Testes relacionados ao feed de alterações dos dados de uma unidade
+autorizadora.
+"""
+
+from datetime import timedelta, timezone
+from typing import Optional
+
+from fastapi import status
+from httpx import Client, Response
+import pytest
+from sqlalchemy.sql import text
+
+import crud
+from db_config import get_sync_engine
+from util import encode_cursor
+
+
+class TestAlteracoes:
+    """Testes para o feed de alterações de uma unidade autorizadora."""
+
+    # pylint: disable=too-many-arguments
+    @pytest.fixture(autouse=True)
+    def setup(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+        truncate_participantes,  # pylint: disable=unused-argument
+        truncate_pe,  # pylint: disable=unused-argument
+        truncate_pt,  # pylint: disable=unused-argument
+        example_part,  # pylint: disable=unused-argument
+        example_part_lotacao_99,  # pylint: disable=unused-argument
+        example_pe,  # pylint: disable=unused-argument
+        example_pt,  # pylint: disable=unused-argument
+        input_part: dict,
+        input_pt: dict,
+        header_usr_1: dict,
+        client: Client,
+    ):
+        """Configurar o ambiente de teste, com dois participantes, um
+        plano de entregas e um plano de trabalho na unidade autorizadora.
+        """
+        # mostra imediatamente as alterações recém gravadas
+        monkeypatch.setattr(crud, "CHANGE_FEED_SAFETY_MARGIN", timedelta(0))
+        with get_sync_engine().connect() as conn:
+            conn.execute(text("TRUNCATE registro_removido;"))
+            conn.commit()
+        # pylint: disable=attribute-defined-outside-init
+        self.input_part = input_part
+        self.input_pt = input_pt
+        self.header_usr_1 = header_usr_1
+        self.client = client
+
+    def get_alteracoes(
+        self,
+        params: Optional[dict] = None,
+        header_usr: Optional[dict] = None,
+    ) -> Response:
+        """Consulta o feed de alterações da unidade autorizadora pela API.
+
+        Args:
+            params (dict): Parâmetros de consulta.
+            header_usr (dict): Cabeçalhos HTTP para o usuário.
+
+        Returns:
+            httpx.Response: A resposta da API.
+        """
+        if header_usr is None:
+            header_usr = self.header_usr_1
+        return self.client.get(
+            f"/organizacao/SIAPE/{self.input_part['cod_unidade_autorizadora']}"
+            "/alteracoes",
+            params=params,
+            headers=header_usr,
+        )
+
+    def test_get_alteracoes(self):
+        """Consulta todas as alterações da unidade."""
+        response = self.get_alteracoes()
+
+        assert response.status_code == status.HTTP_200_OK
+        alteracoes = response.json()
+        assert sorted(alteracao["tipo"] for alteracao in alteracoes) == [
+            "participante",
+            "participante",
+            "plano_entregas",
+            "plano_trabalho",
+        ]
+        assert not any(alteracao["removido"] for alteracao in alteracoes)
+        assert all(alteracao["dados"] is not None for alteracao in alteracoes)
+
+    def test_get_alteracoes_paginated(self):
+        """Percorre o feed uma alteração por vez, usando o cursor."""
+        todas = self.get_alteracoes().json()
+        alteracoes = []
+        params = {"limit": 1}
+        while True:
+            response = self.get_alteracoes(params)
+            assert response.status_code == status.HTTP_200_OK
+            alteracoes.extend(response.json())
+            next_cursor = response.headers.get("X-Next-Cursor", None)
+            if next_cursor is None:
+                break
+            params["cursor"] = next_cursor
+
+        assert alteracoes == todas
+
+    @pytest.mark.parametrize(
+        "deslocamento, quantidade",
+        [(timedelta(hours=-1), 4), (timedelta(minutes=1), 0)],
+    )
+    def test_get_alteracoes_desde_with_time_zone(
+        self, deslocamento: timedelta, quantidade: int
+    ):
+        """Consulta as alterações desde uma data com fuso horário diferente
+        do banco de dados, que deve ser convertida pelo próprio banco."""
+        with get_sync_engine().connect() as conn:
+            agora = conn.execute(text("SELECT now()")).scalar_one()
+        desde = (agora + deslocamento).astimezone(timezone(timedelta(hours=-3)))
+
+        response = self.get_alteracoes({"desde": desde.isoformat()})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.json()) == quantidade
+
+    def test_get_alteracoes_after_update(self):
+        """Atualiza o plano de trabalho e verifica se somente ele aparece
+        no feed a partir do cursor da última alteração conhecida."""
+        cursor = self.get_alteracoes().json()[-1]["cursor"]
+        input_pt = dict(self.input_pt, carga_horaria_disponivel=40)
+        response = self.client.put(
+            f"/organizacao/SIAPE/{input_pt['cod_unidade_autorizadora']}"
+            f"/plano_trabalho/{input_pt['id_plano_trabalho']}",
+            json=input_pt,
+            headers=self.header_usr_1,
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+        response = self.get_alteracoes({"cursor": cursor})
+
+        assert response.status_code == status.HTTP_200_OK
+        alteracoes = response.json()
+        assert len(alteracoes) == 1
+        assert alteracoes[0]["tipo"] == "plano_trabalho"
+        assert not alteracoes[0]["removido"]
+        assert alteracoes[0]["dados"]["carga_horaria_disponivel"] == 40
+
+    def test_get_alteracoes_removido(self):
+        """Remove um participante e verifica se a remoção aparece no feed."""
+        cursor = self.get_alteracoes().json()[-1]["cursor"]
+        with get_sync_engine().connect() as conn:
+            conn.execute(
+                text(
+                    "DELETE FROM participante "
+                    "WHERE cod_unidade_lotacao = 99 AND matricula_siape = '1234567';"
+                )
+            )
+            conn.commit()
+
+        response = self.get_alteracoes({"cursor": cursor})
+
+        assert response.status_code == status.HTTP_200_OK
+        alteracoes = response.json()
+        assert len(alteracoes) == 1
+        assert alteracoes[0]["tipo"] == "participante"
+        assert alteracoes[0]["removido"]
+        assert alteracoes[0]["dados"] is None
+        assert alteracoes[0]["chave"] == {
+            "cod_unidade_lotacao": 99,
+            "matricula_siape": "1234567",
+        }
+
+    @pytest.mark.parametrize(
+        "cursor",
+        [
+            "invalido",
+            encode_cursor("2024-01-01T00:00:00", ["participante"], {}),
+            encode_cursor(
+                "2024-01-01T00:00:00",
+                "participante",
+                {"cod_unidade_lotacao": "99", "matricula_siape": "1234567"},
+            ),
+            encode_cursor(
+                "2024-01-01T00:00:00", "plano_trabalho", {"id_plano_trabalho": 555}
+            ),
+            encode_cursor(20240101, "plano_trabalho", {"id_plano_trabalho": "555"}),
+        ],
+    )
+    def test_get_alteracoes_invalid_cursor(self, cursor: str):
+        """Tenta consultar o feed com um cursor inválido ou com valores da
+        chave de tipo diferente do das colunas."""
+        response = self.get_alteracoes({"cursor": cursor})
+
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    def test_get_alteracoes_different_unit(self, header_usr_2: dict):
+        """Tenta consultar o feed de uma unidade à qual o usuário não tem
+        acesso."""
+        response = self.get_alteracoes(header_usr=header_usr_2)
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
@@ -0,0 +1,586 @@
+"""
+Testes relacionados à auditoria das operações no banco de dados.
+"""
+
+import asyncio
+from copy import deepcopy
+import json
+import time
+from typing import Optional
+
+from fastapi import status
+from httpx import Client, Response
+from pydantic import BaseModel
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.sql import text
+
+from api import DB_AUDIT_LOGS_ENABLED, DB_AUDIT_LOGS_MODE
+import audit_events
+from audit_events import AuditEventBuffer
+from db_audit import AUDIT_DDL_BY_MODE
+from db_config import get_sync_engine, maintain_audit_partitions
+from util import encode_cursor
+
+
+@pytest.mark.skipif(
+    not DB_AUDIT_LOGS_ENABLED, reason="Auditoria desativada no ambiente de testes"
+)
+class TestAuditoria:
+    """Testes para os registros de auditoria de atualizações."""
+
+    # pylint: disable=too-many-arguments
+    @pytest.fixture(autouse=True, params=["row", "statement"])
+    def setup(
+        self,
+        request: pytest.FixtureRequest,
+        truncate_participantes,  # pylint: disable=unused-argument
+        example_part,  # pylint: disable=unused-argument
+        input_part: dict,
+        header_admin: dict,
+        client: Client,
+    ):
+        """Instala os triggers de auditoria do modo testado e restaura os
+        do modo configurado ao final."""
+        with get_sync_engine().connect() as conn:
+            conn.execute(text(AUDIT_DDL_BY_MODE[request.param]))
+            conn.commit()
+        # pylint: disable=attribute-defined-outside-init
+        self.input_part = input_part
+        self.header_admin = header_admin
+        self.client = client
+        yield
+        with get_sync_engine().connect() as conn:
+            conn.execute(text(AUDIT_DDL_BY_MODE[DB_AUDIT_LOGS_MODE]))
+            conn.commit()
+
+    def put_participante(self, participante: dict):
+        """Grava o participante pela API."""
+        response = self.client.put(
+            f"/organizacao/{participante['origem_unidade']}"
+            f"/{participante['cod_unidade_autorizadora']}"
+            f"/{participante['cod_unidade_lotacao']}"
+            f"/participante/{participante['matricula_siape']}",
+            json=participante,
+            headers=self.header_admin,
+        )
+        assert response.status_code in (status.HTTP_200_OK, status.HTTP_201_CREATED)
+
+    def last_update(self) -> Optional[dict]:
+        """Retorna o último registro de auditoria de UPDATE do
+        participante de exemplo."""
+        with get_sync_engine().connect() as conn:
+            row = conn.execute(
+                text(
+                    "SELECT id, chave, registro_antigo, registro_novo "
+                    "FROM auditoria.auditoria_db "
+                    "WHERE tabela = 'participante' AND operacao = 'UPDATE' "
+                    "AND chave ->> 'matricula_siape' = :matricula "
+                    "ORDER BY id DESC LIMIT 1;"
+                ),
+                {"matricula": self.input_part["matricula_siape"]},
+            ).one_or_none()
+        return row._asdict() if row is not None else None
+
+    def test_update_stores_only_changed_fields(self):
+        """Atualiza um campo do participante e verifica se a auditoria
+        guarda somente os campos alterados."""
+        participante = deepcopy(self.input_part)
+        participante["modalidade_execucao"] = 2
+        self.put_participante(participante)
+
+        registro = self.last_update()
+
+        assert registro is not None
+        assert registro["chave"] == {
+            "origem_unidade": participante["origem_unidade"],
+            "cod_unidade_autorizadora": participante["cod_unidade_autorizadora"],
+            "cod_unidade_lotacao": participante["cod_unidade_lotacao"],
+            "matricula_siape": participante["matricula_siape"],
+        }
+        assert set(registro["registro_novo"]) == {
+            "modalidade_execucao",
+            "data_atualizacao",
+        }
+        assert registro["registro_novo"]["modalidade_execucao"] == 2
+        assert registro["registro_antigo"]["modalidade_execucao"] == (
+            self.input_part["modalidade_execucao"]
+        )
+
+    def test_noop_update_is_not_audited(self):
+        """Grava o participante com os mesmos dados e verifica se nenhum
+        registro de auditoria é criado."""
+        anterior = self.last_update()
+
+        self.put_participante(self.input_part)
+
+        assert self.last_update() == anterior
+
+
+@pytest.mark.skipif(
+    not DB_AUDIT_LOGS_ENABLED, reason="Auditoria desativada no ambiente de testes"
+)
+class TestParticoesAuditoria:
+    """Testes para a manutenção das partições da tabela de auditoria."""
+
+    @staticmethod
+    def maintain(*args):
+        """Executa a manutenção das partições com os argumentos dados."""
+        with get_sync_engine().connect() as conn:
+            conn.execute(
+                text(
+                    "SELECT auditoria.fn_manter_particoes("
+                    + ", ".join(f":arg{i}" for i in range(len(args)))
+                    + ");"
+                ),
+                {f"arg{i}": arg for i, arg in enumerate(args)},
+            )
+            conn.commit()
+
+    @staticmethod
+    def partition_exists(name: str) -> bool:
+        """Verifica se a tabela de auditoria tem a partição informada."""
+        with get_sync_engine().connect() as conn:
+            return conn.execute(
+                text(
+                    "SELECT EXISTS (SELECT FROM pg_inherits "
+                    "WHERE inhparent = 'auditoria.auditoria_db'::regclass "
+                    "AND inhrelid = to_regclass(:name));"
+                ),
+                {"name": f"auditoria.{name}"},
+            ).scalar_one()
+
+    def test_create_future_partitions(self):
+        """Verifica se as partições dos meses seguintes são criadas."""
+        self.maintain(2)
+
+        with get_sync_engine().connect() as conn:
+            name = conn.execute(
+                text(
+                    "SELECT 'auditoria_db_' || "
+                    "to_char(now() + interval '2 months', 'YYYY_MM');"
+                )
+            ).scalar_one()
+        assert self.partition_exists(name)
+
+    @staticmethod
+    def table_exists(name: str) -> bool:
+        """Verifica se a tabela informada existe no esquema de auditoria."""
+        with get_sync_engine().connect() as conn:
+            return conn.execute(
+                text("SELECT to_regclass(:name) IS NOT NULL;"),
+                {"name": f"auditoria.{name}"},
+            ).scalar_one()
+
+    @staticmethod
+    def apply_retention(retention_months: int, retention_action: str):
+        """Retira, uma por transação, as partições expiradas, como faz
+        maintain_audit_partitions."""
+        with get_sync_engine().connect() as conn:
+            expired = (
+                conn.execute(
+                    text("SELECT auditoria.fn_particoes_expiradas(:meses);"),
+                    {"meses": retention_months},
+                )
+                .scalars()
+                .all()
+            )
+            conn.commit()
+            for partition in expired:
+                conn.execute(
+                    text("SELECT auditoria.fn_retirar_particao(:tabela, :acao);"),
+                    {"tabela": partition, "acao": retention_action},
+                )
+                conn.commit()
+
+    @pytest.fixture(name="old_partition")
+    def fixture_old_partition(self):
+        """Cria uma partição antiga, de janeiro de 2000."""
+        with get_sync_engine().connect() as conn:
+            conn.execute(
+                text(
+                    "DROP TABLE IF EXISTS auditoria.auditoria_db_2000_01;"
+                    "CREATE TABLE auditoria.auditoria_db_2000_01 "
+                    "PARTITION OF auditoria.auditoria_db "
+                    "FOR VALUES FROM ('2000-01-01') TO ('2000-02-01');"
+                )
+            )
+            conn.commit()
+        assert self.partition_exists("auditoria_db_2000_01")
+        yield "auditoria_db_2000_01"
+        with get_sync_engine().connect() as conn:
+            conn.execute(text("DROP TABLE IF EXISTS auditoria.auditoria_db_2000_01;"))
+            conn.commit()
+
+    def test_retention_drops_old_partitions(self, old_partition: str):
+        """Verifica se a retenção apaga uma partição antiga."""
+        self.apply_retention(12, "drop")
+
+        assert not self.partition_exists(old_partition)
+        assert not self.table_exists(old_partition)
+
+    def test_retention_detaches_old_partitions(self, old_partition: str):
+        """Verifica se a retenção desanexa uma partição antiga, mantendo-a
+        como tabela avulsa, e se repeti-la não causa erro."""
+        self.apply_retention(12, "detach")
+        with get_sync_engine().connect() as conn:
+            conn.execute(
+                text("SELECT auditoria.fn_retirar_particao(:tabela);"),
+                {"tabela": f"auditoria.{old_partition}"},
+            )
+            conn.commit()
+
+        assert not self.partition_exists(old_partition)
+        assert self.table_exists(old_partition)
+
+    def test_concurrent_maintenance(self, old_partition: str):
+        """Executa a manutenção ao mesmo tempo em várias conexões, como
+        os workers na inicialização, e verifica se nenhuma falha."""
+
+        async def maintain_concurrently():
+            await asyncio.gather(
+                *(maintain_audit_partitions(2, 12, "detach") for _ in range(4))
+            )
+
+        asyncio.get_event_loop().run_until_complete(maintain_concurrently())
+
+        assert not self.partition_exists(old_partition)
+        assert self.table_exists(old_partition)
+
+    def test_retention_keeps_recent_partitions(self):
+        """Verifica se as partições do período de retenção não expiram."""
+        self.maintain(0)
+
+        with get_sync_engine().connect() as conn:
+            expired = (
+                conn.execute(text("SELECT auditoria.fn_particoes_expiradas(12);"))
+                .scalars()
+                .all()
+            )
+            name = conn.execute(
+                text("SELECT 'auditoria.auditoria_db_' || to_char(now(), 'YYYY_MM');")
+            ).scalar_one()
+        assert name not in expired
+
+
+@pytest.mark.skipif(
+    not DB_AUDIT_LOGS_ENABLED, reason="Auditoria desativada no ambiente de testes"
+)
+class TestTrilhaAuditoria:
+    """Testes para a consulta da trilha de auditoria pela API."""
+
+    # pylint: disable=too-many-arguments
+    @pytest.fixture(autouse=True)
+    def setup(
+        self,
+        truncate_participantes,  # pylint: disable=unused-argument
+        truncate_pe,  # pylint: disable=unused-argument
+        truncate_pt,  # pylint: disable=unused-argument
+        input_pt: dict,
+        header_admin: dict,
+        client: Client,
+    ):
+        """Limpa a tabela de auditoria antes de criar os dados de exemplo."""
+        with get_sync_engine().connect() as conn:
+            conn.execute(text("TRUNCATE auditoria.auditoria_db;"))
+            conn.commit()
+        # pylint: disable=attribute-defined-outside-init
+        self.input_pt = input_pt
+        self.header_admin = header_admin
+        self.client = client
+
+    def get_trilha(
+        self,
+        params: Optional[dict] = None,
+        headers: Optional[dict] = None,
+    ) -> Response:
+        """Consulta a trilha de auditoria do plano de trabalho de exemplo."""
+        return self.client.get(
+            f"/organizacao/SIAPE/{self.input_pt['cod_unidade_autorizadora']}"
+            f"/plano_trabalho/{self.input_pt['id_plano_trabalho']}/auditoria",
+            params=params,
+            headers=headers if headers is not None else self.header_admin,
+        )
+
+    # pylint: disable=unused-argument
+    def test_get_trilha_plano_trabalho(self, example_part, example_pe, example_pt):
+        """Verifica se a trilha traz a inclusão do plano e dos seus filhos."""
+        response = self.get_trilha()
+
+        assert response.status_code == status.HTTP_200_OK
+        registros = response.json()
+        assert {registro["operacao"] for registro in registros} == {"INSERT"}
+        assert sorted(registro["tabela"] for registro in registros) == sorted(
+            ["plano_trabalho"]
+            + ["contribuicao"] * len(self.input_pt["contribuicoes"])
+            + ["avaliacao_registros_execucao"]
+            * len(self.input_pt["avaliacoes_registros_execucao"])
+        )
+        assert all(
+            registro["chave"]["id_plano_trabalho"]
+            == self.input_pt["id_plano_trabalho"]
+            for registro in registros
+        )
+
+    # pylint: disable=unused-argument
+    def test_get_trilha_paginated(self, example_part, example_pe, example_pt):
+        """Percorre a trilha um registro por vez, usando o cursor."""
+        todos = self.get_trilha().json()
+        registros = []
+        params = {"limit": 1}
+        while True:
+            response = self.get_trilha(params)
+            assert response.status_code == status.HTTP_200_OK
+            registros.extend(response.json())
+            next_cursor = response.headers.get("X-Next-Cursor", None)
+            if next_cursor is None:
+                break
+            params["cursor"] = next_cursor
+
+        assert registros == todos
+
+    # pylint: disable=unused-argument
+    def test_get_trilha_ndjson(self, example_part, example_pe, example_pt):
+        """Transmite a trilha em NDJSON."""
+        todos = self.get_trilha().json()
+
+        response = self.get_trilha(
+            headers={**self.header_admin, "Accept": "application/x-ndjson"}
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [
+            json.loads(line) for line in response.text.splitlines() if line
+        ] == todos
+
+    @pytest.mark.parametrize(
+        "cursor",
+        [
+            "invalido",
+            encode_cursor({"data_operacao": "2024-01-01T00:00:00"}),
+            encode_cursor("2024-01-01T00:00:00", "1"),
+            encode_cursor("2024-01-01T00:00:00", True),
+            encode_cursor(20240101, 1),
+        ],
+    )
+    def test_get_trilha_invalid_cursor(self, cursor: str):
+        """Tenta consultar a trilha com um cursor inválido ou com valores
+        de tipo diferente do das colunas."""
+        response = self.get_trilha({"cursor": cursor})
+
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    def test_get_trilha_not_admin(self, header_usr_2: dict):
+        """Tenta consultar a trilha sem ser administrador."""
+        response = self.get_trilha(headers=header_usr_2)
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+class DocumentoTeste(BaseModel):
+    """Documento de um agregado fictício, usado nos eventos de teste."""
+
+    numero: int
+
+
+@pytest.mark.skipif(
+    not DB_AUDIT_LOGS_ENABLED, reason="Auditoria desativada no ambiente de testes"
+)
+def test_audit_event_buffer_flushes_in_batches():
+    """Registra mais eventos do que cabem num lote e verifica se todos
+    são gravados, inclusive os pendentes no encerramento."""
+    usuario = "audit-event-buffer@api.com"
+    with get_sync_engine().connect() as conn:
+        conn.execute(
+            text("DELETE FROM auditoria.auditoria_db WHERE usuario = :usuario;"),
+            {"usuario": usuario},
+        )
+        conn.commit()
+    buffer = AuditEventBuffer(batch_size=2, flush_interval=0.1, max_size=10)
+
+    async def record_events():
+        buffer.start()
+        for numero in range(5):
+            buffer.record(
+                "UPDATE" if numero else "INSERT",
+                "teste",
+                {"numero": 1},
+                DocumentoTeste(numero=numero - 1) if numero else None,
+                DocumentoTeste(numero=numero),
+                usuario,
+            )
+        await buffer.stop()
+
+    asyncio.get_event_loop().run_until_complete(record_events())
+
+    with get_sync_engine().connect() as conn:
+        registros = conn.execute(
+            text(
+                "SELECT operacao, registro_antigo, registro_novo "
+                "FROM auditoria.auditoria_db WHERE usuario = :usuario "
+                "ORDER BY id;"
+            ),
+            {"usuario": usuario},
+        ).all()
+    assert [registro.registro_novo["numero"] for registro in registros] == list(
+        range(5)
+    )
+    assert registros[0].operacao == "INSERT"
+    assert registros[0].registro_antigo is None
+    assert registros[4].registro_antigo == {"numero": 3}
+
+
+def events_of(usuario: str) -> list:
+    """Eventos de auditoria gravados pelo usuário, na ordem de gravação."""
+    with get_sync_engine().connect() as conn:
+        return conn.execute(
+            text(
+                "SELECT operacao, tabela, chave, registro_antigo, registro_novo "
+                "FROM auditoria.auditoria_db WHERE usuario = :usuario "
+                "ORDER BY id;"
+            ),
+            {"usuario": usuario},
+        ).all()
+
+
+def delete_events_of(usuario: str):
+    """Apaga os eventos de auditoria gravados pelo usuário."""
+    with get_sync_engine().connect() as conn:
+        conn.execute(
+            text("DELETE FROM auditoria.auditoria_db WHERE usuario = :usuario;"),
+            {"usuario": usuario},
+        )
+        conn.commit()
+
+
+def dropped_events(reason: str) -> float:
+    """Total de eventos de auditoria descartados pelo motivo informado."""
+    return (
+        REGISTRY.get_sample_value(
+            "api_pgd_audit_events_dropped_total", {"reason": reason}
+        )
+        or 0
+    )
+
+
+@pytest.mark.skipif(
+    not DB_AUDIT_LOGS_ENABLED, reason="Auditoria desativada no ambiente de testes"
+)
+def test_audit_event_buffer_drops_when_full():
+    """Registra mais eventos do que cabem na fila sem esperar pela
+    gravação e verifica se o excedente é descartado e contado."""
+    usuario = "audit-event-buffer-full@api.com"
+    delete_events_of(usuario)
+    buffer = AuditEventBuffer(batch_size=10, flush_interval=0.1, max_size=2)
+    descartados = dropped_events("queue_full")
+
+    async def record_events():
+        buffer.start()
+        for numero in range(3):
+            buffer.record(
+                "INSERT",
+                "teste",
+                {"numero": numero},
+                None,
+                DocumentoTeste(numero=numero),
+                usuario,
+            )
+        await buffer.stop()
+
+    asyncio.get_event_loop().run_until_complete(record_events())
+
+    assert dropped_events("queue_full") == descartados + 1
+    assert [evento.registro_novo["numero"] for evento in events_of(usuario)] == [
+        0,
+        1,
+    ]
+
+
+class FlakyEngine:
+    """Engine cuja primeira transação falha, para simular uma queda
+    momentânea do banco de dados."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.failures = 0
+
+    def begin(self):
+        """Falha na primeira chamada e depois abre a transação no engine."""
+        if not self.failures:
+            self.failures += 1
+            raise OperationalError("INSERT", {}, Exception("falha simulada"))
+        return self.engine.begin()
+
+
+@pytest.mark.skipif(
+    not DB_AUDIT_LOGS_ENABLED, reason="Auditoria desativada no ambiente de testes"
+)
+def test_audit_event_buffer_retries_failed_flush(monkeypatch: pytest.MonkeyPatch):
+    """Verifica se um lote cuja gravação falha é gravado na tentativa
+    seguinte, sem perder eventos."""
+    usuario = "audit-event-buffer-retry@api.com"
+    delete_events_of(usuario)
+    engine = FlakyEngine(audit_events.engine)
+    monkeypatch.setattr(audit_events, "engine", engine)
+    monkeypatch.setattr(audit_events, "AUDIT_EVENTS_RETRY_DELAY", 0.01)
+    buffer = AuditEventBuffer(batch_size=10, flush_interval=0.1, max_size=10)
+
+    async def record_events():
+        buffer.start()
+        for numero in range(3):
+            buffer.record(
+                "INSERT",
+                "teste",
+                {"numero": numero},
+                None,
+                DocumentoTeste(numero=numero),
+                usuario,
+            )
+        await buffer.stop()
+
+    asyncio.get_event_loop().run_until_complete(record_events())
+
+    assert engine.failures == 1
+    assert [evento.registro_novo["numero"] for evento in events_of(usuario)] == [
+        0,
+        1,
+        2,
+    ]
+
+
+@pytest.mark.skipif(
+    not DB_AUDIT_LOGS_ENABLED or DB_AUDIT_LOGS_MODE != "aggregate",
+    reason="Auditoria por agregado desativada no ambiente de testes",
+)
+def test_put_participante_records_aggregate_event(
+    truncate_participantes,  # pylint: disable=unused-argument
+    input_part: dict,
+    admin_credentials: dict,
+    header_admin: dict,
+    client: Client,
+):
+    """Cria um participante pela API e verifica se o evento de auditoria
+    do agregado é gravado em segundo plano."""
+    usuario = admin_credentials["username"]
+    delete_events_of(usuario)
+    response = client.put(
+        f"/organizacao/{input_part['origem_unidade']}"
+        f"/{input_part['cod_unidade_autorizadora']}"
+        f"/{input_part['cod_unidade_lotacao']}"
+        f"/participante/{input_part['matricula_siape']}",
+        json=input_part,
+        headers=header_admin,
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+
+    prazo = time.monotonic() + audit_events.AUDIT_EVENTS_FLUSH_INTERVAL + 5
+    while not (eventos := events_of(usuario)) and time.monotonic() < prazo:
+        time.sleep(0.1)
+
+    assert len(eventos) == 1
+    assert eventos[0].operacao == "INSERT"
+    assert eventos[0].tabela == "participante"
+    assert eventos[0].chave["matricula_siape"] == input_part["matricula_siape"]
+    assert eventos[0].registro_antigo is None
+    assert eventos[0].registro_novo["matricula_siape"] == input_part["matricula_siape"]
@@ -0,0 +1,147 @@
+"""
+Testes relacionados à compressão das respostas e dos corpos de requisição.
+"""
+
+import gzip
+import json
+
+from fastapi import status
+from httpx import Client
+import pytest
+
+from middleware import REQUEST_MAX_DECOMPRESSED_SIZE, negotiate_encoding
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    [
+        ("gzip, deflate, br", "br"),
+        ("gzip, deflate", "gzip"),
+        ("br;q=0.5, gzip", "gzip"),
+        ("*", "br"),
+        ("*;q=0, gzip", "gzip"),
+        ("identity", None),
+        ("br;q=0, gzip;q=0", None),
+    ],
+)
+def test_negotiate_encoding(accept_encoding: str, expected: str):
+    """Verifica a escolha da compressão conforme o Accept-Encoding."""
+    assert negotiate_encoding(accept_encoding) == expected
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br"])
+def test_response_compressed(client: Client, encoding: str):
+    """Verifica se uma resposta grande vem comprimida com a compressão
+    aceita pelo cliente."""
+    response = client.get("/openapi.json", headers={"Accept-Encoding": encoding})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["Content-Encoding"] == encoding
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert response.json()["paths"]
+
+
+@pytest.mark.parametrize(
+    "path, accept_encoding",
+    [
+        ("/openapi.json", "identity"),
+        ("/robots.txt", "gzip"),
+    ],
+)
+def test_response_not_compressed(client: Client, path: str, accept_encoding: str):
+    """Verifica se as respostas pequenas ou para clientes que não aceitam
+    compressão vêm sem compressão."""
+    response = client.get(path, headers={"Accept-Encoding": accept_encoding})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert "Content-Encoding" not in response.headers
+
+
+def test_put_plano_entregas_gzip(
+    truncate_pe,  # pylint: disable=unused-argument
+    client: Client,
+    input_pe: dict,
+    header_usr_1: dict,
+):
+    """Cria um plano de entregas enviando o corpo comprimido com gzip."""
+    response = client.put(
+        f"/organizacao/SIAPE/{input_pe['cod_unidade_autorizadora']}"
+        f"/plano_entregas/{input_pe['id_plano_entregas']}",
+        content=gzip.compress(json.dumps(input_pe).encode()),
+        headers={
+            **header_usr_1,
+            "Content-Type": "application/json",
+            "Content-Encoding": "gzip",
+        },
+    )
+
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json()["id_plano_entregas"] == input_pe["id_plano_entregas"]
+
+
+def test_put_plano_entregas_gzip_multi_member(
+    truncate_pe,  # pylint: disable=unused-argument
+    client: Client,
+    input_pe: dict,
+    header_usr_1: dict,
+):
+    """Cria um plano de entregas enviando o corpo em dois membros gzip
+    concatenados, que devem ser descomprimidos por inteiro."""
+    body = json.dumps(input_pe).encode()
+    metade = len(body) // 2
+    response = client.put(
+        f"/organizacao/SIAPE/{input_pe['cod_unidade_autorizadora']}"
+        f"/plano_entregas/{input_pe['id_plano_entregas']}",
+        content=gzip.compress(body[:metade]) + gzip.compress(body[metade:]),
+        headers={
+            **header_usr_1,
+            "Content-Type": "application/json",
+            "Content-Encoding": "gzip",
+        },
+    )
+
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json()["id_plano_entregas"] == input_pe["id_plano_entregas"]
+
+
+@pytest.mark.parametrize(
+    "content, content_encoding, status_code",
+    [
+        (b"{}", "gzip", status.HTTP_400_BAD_REQUEST),
+        (gzip.compress(b"{}") + b"lixo", "gzip", status.HTTP_400_BAD_REQUEST),
+        (
+            gzip.compress(b" " * (REQUEST_MAX_DECOMPRESSED_SIZE + 1)),
+            "gzip",
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        ),
+        (
+            gzip.compress(b" " * (REQUEST_MAX_DECOMPRESSED_SIZE // 2 + 1)) * 2,
+            "gzip",
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        ),
+        (b"{}", "deflate", status.HTTP_415_UNSUPPORTED_MEDIA_TYPE),
+    ],
+)
+def test_put_plano_entregas_invalid_encoding(
+    client: Client,
+    input_pe: dict,
+    header_usr_1: dict,
+    content: bytes,
+    content_encoding: str,
+    status_code: int,
+):
+    """Tenta enviar um corpo que não é gzip ou tem dados depois do gzip,
+    que passa do limite de tamanho ao ser descomprimido, mesmo somando
+    vários membros gzip, ou com compressão não suportada."""
+    response = client.put(
+        f"/organizacao/SIAPE/{input_pe['cod_unidade_autorizadora']}"
+        f"/plano_entregas/{input_pe['id_plano_entregas']}",
+        content=content,
+        headers={
+            **header_usr_1,
+            "Content-Type": "application/json",
+            "Content-Encoding": content_encoding,
+        },
+    )
+
+    assert response.status_code == status_code
@@ -6,13 +6,14 @@ from copy import deepcopy
 import os
 import sys
 import json
-from typing import Generator, Optional
+from typing import Generator, Iterator, Optional
 import asyncio
 
 import httpx
 from fastapi import status
 from fastapi.testclient import TestClient
 import pytest
+from sqlalchemy import event
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
 
@@ -24,6 +25,9 @@ from crud import (
 )
 from crud_auth import init_user_admin
 from api import app
+from audit_events import audit_event_buffer
+from db_config import engine, get_sync_engine
+import metrics
 
 USERS_CREDENTIALS = [
     {
@@ -55,6 +59,8 @@ API_BASE_URL = "http://localhost:5057"
 
 TEST_USER_AGENT = "API PGD CI Test (+https://github.com/gestaogovbr/api-pgd)"
 
+TEST_METRICS_TOKEN = "token-de-metricas-dos-testes"
+
 MAX_INT = (2**31) - 1
 MAX_BIGINT = (2**63) - 1
 
@@ -290,6 +296,14 @@ def fixture_header_usr_2(
     )
 
 
+@pytest.fixture(name="header_metrics")
+def fixture_header_metrics(monkeypatch: pytest.MonkeyPatch) -> dict:
+    """Habilita a rota /metrics com um token de teste e retorna o
+    cabeçalho HTTP que o envia."""
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", TEST_METRICS_TOKEN)
+    return {"Authorization": f"Bearer {TEST_METRICS_TOKEN}"}
+
+
 @pytest.fixture(scope="function", name="input_pe")
 def fixture_input_pe() -> dict:
     """Template de Plano de Entregas da Unidade.
@@ -553,3 +567,143 @@ def truncate_pt():
 def truncate_participantes():
     """Trunca a tabela de Participantes."""
     truncate_participante()
+
+
+# Orçamento de consultas
+
+
+# tabelas que crescem com o uso da API e não podem ser lidas por inteiro
+BIG_TABLES = frozenset(
+    {
+        "participante",
+        "plano_entregas",
+        "entrega",
+        "plano_trabalho",
+        "contribuicao",
+        "avaliacao_registros_execucao",
+        "registro_removido",
+    }
+)
+
+
+class QueryRecorder:
+    """Registra os comandos SQL executados pela API enquanto ativo, num
+    bloco `with`, para verificar o orçamento de consultas de um endpoint.
+    """
+
+    def __init__(self):
+        self.statements: list[tuple[str, object]] = []
+        self.active = False
+
+    def __enter__(self) -> "QueryRecorder":
+        self.statements.clear()
+        self.active = True
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.active = False
+
+    def record(
+        self, conn, cursor, statement, parameters, context, executemany
+    ):  # pylint: disable=unused-argument,too-many-arguments
+        """Listener de before_cursor_execute do engine da API."""
+        if self.active:
+            self.statements.append(
+                (statement, parameters[0] if executemany else parameters)
+            )
+
+    @property
+    def count(self) -> int:
+        """Quantidade de comandos SQL registrados."""
+        return len(self.statements)
+
+    def assert_max_queries(self, budget: int):
+        """Verifica se os comandos registrados cabem no orçamento."""
+        assert self.count <= budget, (
+            f"{self.count} comandos SQL, acima do orçamento de {budget}:\n"
+            + "\n".join(statement for statement, _ in self.statements)
+        )
+
+    def assert_num_queries(self, expected: int):
+        """Verifica se foi registrada exatamente a quantidade esperada de
+        comandos."""
+        assert self.count == expected, (
+            f"{self.count} comandos SQL, em vez de {expected}:\n"
+            + "\n".join(statement for statement, _ in self.statements)
+        )
+
+    def seq_scans(self, tables: frozenset = BIG_TABLES) -> list[tuple[str, str]]:
+        """Obtém, pelo EXPLAIN de cada consulta registrada, as leituras
+        sequenciais das tabelas informadas.
+
+        As tabelas dos testes são pequenas e o Postgres as leria por
+        inteiro mesmo havendo índice; por isso as leituras sequenciais são
+        desestimuladas (enable_seqscan) e só restam as que não têm índice
+        que as substitua.
+
+        Returns:
+            list[tuple[str, str]]: Pares de tabela e comando SQL.
+        """
+
+        def walk(plan: dict) -> Iterator[dict]:
+            yield plan
+            for subplan in plan.get("Plans", []):
+                yield from walk(subplan)
+
+        found = []
+        connection = get_sync_engine().raw_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SET enable_seqscan = off;")
+            for statement, parameters in self.statements:
+                if not statement.lstrip().upper().startswith(
+                    ("SELECT", "UPDATE", "DELETE", "WITH")
+                ):
+                    continue
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+                plan = cursor.fetchone()[0][0]["Plan"]
+                found.extend(
+                    (node["Relation Name"], statement)
+                    for node in walk(plan)
+                    if node["Node Type"] == "Seq Scan"
+                    and node.get("Relation Name") in tables
+                )
+        finally:
+            connection.rollback()
+            connection.close()
+        return found
+
+    def assert_no_seq_scan(self, tables: frozenset = BIG_TABLES):
+        """Verifica se nenhuma consulta registrada lê sequencialmente uma
+        das tabelas informadas."""
+        found = self.seq_scans(tables)
+        assert not found, "Leitura sequencial de tabela grande:\n" + "\n".join(
+            f"{table}: {statement}" for table, statement in found
+        )
+
+
+@pytest.fixture(name="query_recorder")
+def fixture_query_recorder(
+    client: TestClient,
+) -> Generator[QueryRecorder, None, None]:
+    """Registra os comandos SQL que a API executar dentro de um bloco
+    `with query_recorder:`.
+
+    No modo de auditoria "aggregate", a gravação dos eventos em segundo
+    plano fica parada enquanto isso, para que os seus lotes não entrem na
+    contagem dos comandos de uma requisição.
+
+    Yields:
+        QueryRecorder: O registrador de comandos.
+    """
+    buffer_started = audit_event_buffer.started
+    if buffer_started:
+        client.portal.call(audit_event_buffer.stop)
+    recorder = QueryRecorder()
+    event.listen(engine.sync_engine, "before_cursor_execute", recorder.record)
+    try:
+        yield recorder
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", recorder.record)
+        if buffer_started:
+            client.portal.call(audit_event_buffer.start)
@@ -0,0 +1,57 @@
+"""
+Testes relacionados à configuração das conexões com o banco de dados.
+"""
+
+import pytest
+
+import db_config
+
+
+@pytest.mark.parametrize(
+    "workers, total, expected",
+    [
+        (1, 30, 30),
+        (4, 30, 7),
+        (8, 20, 2),
+        (30, 30, 1),
+        (32, 20, 0),
+        (4, 0, 0),
+    ],
+)
+def test_per_worker_divides_pool_limits(
+    monkeypatch: pytest.MonkeyPatch, workers: int, total: int, expected: int
+):
+    """Verifica se os limites do pool são divididos entre os workers sem
+    que a soma das partes ultrapasse o total."""
+    monkeypatch.setattr(db_config, "API_WORKERS", workers)
+
+    assert db_config.per_worker(total) == expected
+
+
+@pytest.mark.parametrize("workers, pool_size", [(1, 30), (30, 30), (64, 0)])
+def test_check_pool_size(workers: int, pool_size: int):
+    """Aceita pools com ao menos uma conexão por worker, ou sem pool."""
+    db_config.check_pool_size(workers, pool_size)
+
+
+def test_check_pool_size_too_many_workers():
+    """Recusa mais workers do que conexões no pool."""
+    with pytest.raises(ValueError, match="API_WORKERS"):
+        db_config.check_pool_size(64, 30)
+
+
+@pytest.mark.parametrize("mode", ["row", "statement", "aggregate"])
+def test_check_audit_mode(mode: str):
+    """Aceita os modos de auditoria conhecidos."""
+    db_config.check_audit_mode(mode)
+
+
+def test_check_audit_mode_unknown():
+    """Recusa um modo de auditoria desconhecido, listando os válidos."""
+    with pytest.raises(ValueError, match='"row", "statement", "aggregate"'):
+        db_config.check_audit_mode("rows")
+
+
+def test_sync_engine_is_created_once():
+    """Verifica se o engine síncrono é criado no primeiro uso e reutilizado."""
+    assert db_config.get_sync_engine() is db_config.get_sync_engine()
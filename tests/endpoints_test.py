@@ -87,6 +87,31 @@ def test_docs_csp_header(client: Client, path: str):
     assert response.headers.get("Content-Security-Policy", None) is not None
 
 
+def test_server_timing_header(
+    client: Client, header_admin: dict, admin_credentials: dict
+):
+    """Testa se o cabeçalho Server-Timing informa as fases da requisição e
+    a quantidade de consultas ao banco de dados.
+
+    Args:
+        client (Client): fixture do cliente http.
+        header_admin (dict): cabeçalhos do usuário administrador.
+        admin_credentials (dict): credenciais do usuário administrador.
+    """
+    response = client.get(
+        f"/user/{admin_credentials['username']}", headers=header_admin
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    phases = {
+        metric.split(";")[0]: metric
+        for metric in response.headers["Server-Timing"].split(", ")
+    }
+    assert set(phases) == {"auth", "validation", "db", "serialization", "total"}
+    # uma consulta para o usuário autenticado e outra para o consultado
+    assert 'desc="2 consultas"' in phases["db"]
+
+
 def test_robots_txt(client: Client):
     """Testa a presença do arquivo robots.txt
 
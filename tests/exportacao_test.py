@@ -0,0 +1,132 @@
+"""
+Testes relacionados à exportação em NDJSON dos dados de uma unidade
+autorizadora.
+"""
+
+import json
+from typing import Optional
+
+from fastapi import status
+from httpx import Client, Response
+import pytest
+
+from util import encode_cursor
+
+
+class TestExportacao:
+    """Testes para a exportação dos dados de uma unidade autorizadora."""
+
+    # pylint: disable=too-many-arguments
+    @pytest.fixture(autouse=True)
+    def setup(
+        self,
+        truncate_participantes,  # pylint: disable=unused-argument
+        truncate_pe,  # pylint: disable=unused-argument
+        truncate_pt,  # pylint: disable=unused-argument
+        example_part,  # pylint: disable=unused-argument
+        example_part_lotacao_99,  # pylint: disable=unused-argument
+        example_pe,  # pylint: disable=unused-argument
+        example_pt,  # pylint: disable=unused-argument
+        input_part: dict,
+        input_pe: dict,
+        input_pt: dict,
+        header_usr_1: dict,
+        client: Client,
+    ):
+        """Configurar o ambiente de teste, com dois participantes, um
+        plano de entregas e um plano de trabalho na unidade autorizadora.
+        """
+        # pylint: disable=attribute-defined-outside-init
+        self.input_part = input_part
+        self.input_pe = input_pe
+        self.input_pt = input_pt
+        self.header_usr_1 = header_usr_1
+        self.client = client
+
+    def export(
+        self,
+        cursor: Optional[str] = None,
+        header_usr: Optional[dict] = None,
+    ) -> Response:
+        """Exporta os dados da unidade autorizadora pela API.
+
+        Args:
+            cursor (str): cursor para retomar a exportação.
+            header_usr (dict): Cabeçalhos HTTP para o usuário.
+
+        Returns:
+            httpx.Response: A resposta da API.
+        """
+        if header_usr is None:
+            header_usr = self.header_usr_1
+        params = {"cursor": cursor} if cursor is not None else None
+        return self.client.get(
+            f"/organizacao/SIAPE/{self.input_part['cod_unidade_autorizadora']}"
+            "/exportacao",
+            params=params,
+            headers=header_usr,
+        )
+
+    @staticmethod
+    def parse_lines(response: Response) -> list[dict]:
+        """Lê os registros NDJSON da resposta."""
+        return [json.loads(line) for line in response.text.splitlines() if line]
+
+    def test_export_unidade_autorizadora(self):
+        """Exporta todos os dados da unidade e confere os registros."""
+        response = self.export()
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["Content-Type"].startswith("application/x-ndjson")
+        registros = self.parse_lines(response)
+        assert [registro["tipo"] for registro in registros] == [
+            "participante",
+            "participante",
+            "plano_entregas",
+            "plano_trabalho",
+        ]
+        plano_entregas = registros[2]["dados"]
+        assert plano_entregas["id_plano_entregas"] == self.input_pe["id_plano_entregas"]
+        assert len(plano_entregas["entregas"]) == len(self.input_pe["entregas"])
+        plano_trabalho = registros[3]["dados"]
+        assert plano_trabalho["id_plano_trabalho"] == self.input_pt["id_plano_trabalho"]
+        assert len(plano_trabalho["contribuicoes"]) == len(
+            self.input_pt["contribuicoes"]
+        )
+        assert len(plano_trabalho["avaliacoes_registros_execucao"]) == len(
+            self.input_pt["avaliacoes_registros_execucao"]
+        )
+
+    def test_export_resume_from_cursor(self):
+        """Retoma a exportação a partir de cada um dos registros e
+        verifica se os registros seguintes são os mesmos."""
+        registros = self.parse_lines(self.export())
+
+        for position, registro in enumerate(registros):
+            response = self.export(cursor=registro["cursor"])
+            assert response.status_code == status.HTTP_200_OK
+            assert self.parse_lines(response) == registros[position + 1 :]
+
+    @pytest.mark.parametrize(
+        "cursor",
+        [
+            "invalido",
+            encode_cursor({"tipo": "participante"}),
+            encode_cursor("participante", "99", "1234567"),
+            encode_cursor("plano_trabalho", 555),
+            encode_cursor("plano_entregas", None),
+        ],
+    )
+    def test_export_invalid_cursor(self, cursor: str):
+        """Tenta retomar a exportação com um cursor inválido ou com valores
+        da chave de tipo diferente do das colunas."""
+        response = self.export(cursor=cursor)
+
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    def test_export_different_unit(self, header_usr_2: dict):
+        """Tenta exportar os dados de uma unidade à qual o usuário não
+        tem acesso."""
+        response = self.export(header_usr=header_usr_2)
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
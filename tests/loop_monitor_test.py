@@ -0,0 +1,56 @@
+"""
+Testes relacionados ao monitoramento do event loop.
+"""
+
+import asyncio
+import logging
+import time
+
+from fastapi import status
+from httpx import Client
+from prometheus_client import REGISTRY
+import pytest
+
+from loop_monitor import EventLoopMonitor
+
+
+def blocking_call():
+    """Bloqueia o event loop, como uma chamada síncrona esquecida num
+    endpoint assíncrono."""
+    time.sleep(0.3)
+
+
+def test_blocking_call_is_detected(caplog: pytest.LogCaptureFixture):
+    """Bloqueia o event loop e verifica se o bloqueio é contado e a pilha
+    com a chamada bloqueante vai para o log."""
+    monitor = EventLoopMonitor(interval=0.01, threshold=0.05)
+    blocked_before = REGISTRY.get_sample_value("api_pgd_event_loop_blocked_total")
+
+    async def block_loop():
+        monitor.start()
+        await asyncio.sleep(0.05)
+        blocking_call()
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+
+    with caplog.at_level(logging.WARNING, logger="uvicorn.error"):
+        asyncio.get_event_loop().run_until_complete(block_loop())
+
+    assert (
+        REGISTRY.get_sample_value("api_pgd_event_loop_blocked_total")
+        >= blocked_before + 1
+    )
+    assert any(
+        "Event loop bloqueado" in record.getMessage()
+        and "blocking_call" in record.getMessage()
+        for record in caplog.records
+    )
+
+
+def test_event_loop_metrics(client: Client, header_metrics: dict):
+    """Verifica se o atraso do event loop é exposto em /metrics."""
+    response = client.get("/metrics", headers=header_metrics)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert "api_pgd_event_loop_lag_seconds_count" in response.text
+    assert "api_pgd_event_loop_blocked_total" in response.text
@@ -0,0 +1,112 @@
+"""
+Testes relacionados às métricas operacionais expostas em /metrics.
+"""
+
+from fastapi import status
+from httpx import Client
+import pytest
+
+import metrics as api_metrics
+
+
+def get_metrics(client: Client, header_metrics: dict) -> str:
+    """Consulta as métricas da API."""
+    response = client.get("/metrics", headers=header_metrics)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["Content-Type"].startswith("text/plain")
+    return response.text
+
+
+def test_metrics_per_route_template(
+    client: Client,
+    header_admin: dict,
+    admin_credentials: dict,
+    header_metrics: dict,
+):
+    """Consulta um usuário e verifica se a requisição é contada pelo modelo
+    da rota, e não pela URL."""
+    response = client.get(
+        f"/user/{admin_credentials['username']}", headers=header_admin
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    metrics = get_metrics(client, header_metrics)
+
+    assert (
+        'api_pgd_http_requests_total{method="GET",route="/user/{email}",'
+        'status="200"}'
+    ) in metrics
+    assert (
+        'api_pgd_http_request_duration_seconds_count{method="GET",'
+        'route="/user/{email}",status="200"}'
+    ) in metrics
+    assert admin_credentials["username"] not in metrics
+
+
+def test_metrics_db_pool_and_bcrypt(
+    client: Client, admin_credentials: dict, header_metrics: dict
+):
+    """Autentica na API e verifica as métricas do pool de conexões e do
+    bcrypt."""
+    response = client.post(
+        "/token",
+        data={
+            "username": admin_credentials["username"],
+            "password": admin_credentials["password"],
+        },
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    metrics = get_metrics(client, header_metrics)
+
+    assert 'api_pgd_db_pool_checked_out{pool="primary"}' in metrics
+    assert 'api_pgd_db_pool_wait_seconds_count{pool="primary"}' in metrics
+    assert (
+        'api_pgd_bcrypt_queue_seconds_count{operation="verify_password"}'
+    ) in metrics
+    assert (
+        'api_pgd_bcrypt_duration_seconds_count{operation="verify_password"}'
+    ) in metrics
+
+
+def test_metrics_query_types(
+    client: Client,
+    truncate_participantes,  # pylint: disable=unused-argument
+    example_part,  # pylint: disable=unused-argument
+    header_metrics: dict,
+):
+    """Verifica se a latência da gravação de participantes é registrada."""
+    metrics = get_metrics(client, header_metrics)
+
+    assert (
+        'api_pgd_db_query_duration_seconds_count{query="create_participante"}'
+    ) in metrics
+
+
+def test_metrics_disabled_without_token(
+    client: Client, monkeypatch: pytest.MonkeyPatch
+):
+    """Verifica se /metrics não existe sem METRICS_TOKEN definida."""
+    monkeypatch.setattr(api_metrics, "METRICS_TOKEN", "")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.parametrize(
+    "authorization",
+    [None, "Bearer token-errado", "Basic token-de-metricas-dos-testes"],
+)
+def test_metrics_requires_token(
+    client: Client,
+    header_metrics: dict,  # pylint: disable=unused-argument
+    authorization: str,
+):
+    """Verifica se /metrics recusa requisições sem o token correto."""
+    headers = {"Authorization": authorization} if authorization else {}
+
+    response = client.get("/metrics", headers=headers)
+
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    assert "api_pgd_http_requests_total" not in response.text
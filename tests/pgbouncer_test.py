@@ -0,0 +1,82 @@
+"""
+Testes do acesso ao banco de dados por um pooler em modo transação
+(PgBouncer), como configurado por DB_TRANSACTION_POOLER.
+"""
+
+import asyncio
+import os
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlalchemy.sql import text
+
+from db_config import STARTUP_LOCK_ID, engine_options
+import models
+
+PGBOUNCER_DATABASE_URL = os.environ.get("PGBOUNCER_DATABASE_URL", None)
+
+# mais execuções de uma mesma consulta do que o limite a partir do qual o
+# psycopg cria prepared statements no servidor (prepare_threshold = 5)
+EXECUTIONS = 20
+
+
+async def run_queries(pool_size: int) -> set:
+    """Executa a mesma consulta várias vezes, em transações concorrentes,
+    por um engine ligado ao PgBouncer.
+
+    Args:
+        pool_size (int): Conexões mantidas no pool do engine.
+
+    Returns:
+        set: Resultados distintos obtidos nas execuções.
+    """
+    pgbouncer_engine = create_async_engine(
+        PGBOUNCER_DATABASE_URL, **engine_options(True, pool_size, 0)
+    )
+
+    async def query(numero: int):
+        async with pgbouncer_engine.begin() as conn:
+            await conn.execute(
+                text("SELECT pg_advisory_xact_lock(:lock_id);"),
+                {"lock_id": STARTUP_LOCK_ID},
+            )
+            result = await conn.execute(
+                select(models.Participante.id).filter_by(
+                    matricula_siape=str(numero % 2)
+                )
+            )
+            return tuple(result.scalars())
+
+    try:
+        return set(
+            await asyncio.gather(*(query(numero) for numero in range(EXECUTIONS)))
+        )
+    finally:
+        await pgbouncer_engine.dispose()
+
+
+def test_engine_options_transaction_pooler():
+    """Verifica se o modo de pooler em transação desativa os prepared
+    statements e se o pool vazio usa NullPool."""
+    options = engine_options(True, 0, 0)
+
+    assert options["connect_args"] == {"prepare_threshold": None}
+    assert options["poolclass"] is NullPool
+    assert "connect_args" not in engine_options(False, 5, 0)
+
+
+@pytest.mark.skipif(
+    PGBOUNCER_DATABASE_URL is None, reason="PgBouncer ausente no ambiente de testes"
+)
+@pytest.mark.parametrize("pool_size", [0, 2])
+def test_queries_through_pgbouncer(
+    truncate_participantes,  # pylint: disable=unused-argument
+    pool_size: int,
+):
+    """Executa consultas repetidas pelo PgBouncer em modo transação, com
+    e sem pool na API, sem erros de prepared statements inexistentes."""
+    results = asyncio.get_event_loop().run_until_complete(run_queries(pool_size))
+
+    assert results == {()}
@@ -0,0 +1,128 @@
+"""
+Testes relacionados à listagem paginada de planos de entregas de uma
+unidade autorizadora.
+"""
+
+from copy import deepcopy
+from typing import Optional
+
+from httpx import Response
+from fastapi import status
+
+import pytest
+
+from .core_test import BasePETest
+
+# períodos que não se sobrepõem ao do plano de entregas de exemplo
+EXTRA_PLANOS_ENTREGAS = (
+    ("2", "2024-07-01", "2024-09-30", 3),
+    ("3", "2024-10-01", "2024-12-31", 2),
+)
+
+
+class TestListPlanosEntregas(BasePETest):
+    """Testes para a listagem de planos de entregas."""
+
+    @pytest.fixture(autouse=True)
+    def create_planos_entregas(self, setup):  # pylint: disable=unused-argument
+        """Cria o plano de entregas de exemplo e mais alguns planos da
+        mesma unidade executora, em períodos distintos."""
+        response = self.put_plano_entregas(self.input_pe)
+        assert response.status_code == status.HTTP_201_CREATED
+        for id_plano_entregas, data_inicio, data_termino, status_pe in (
+            EXTRA_PLANOS_ENTREGAS
+        ):
+            input_pe = deepcopy(self.input_pe)
+            input_pe["id_plano_entregas"] = id_plano_entregas
+            input_pe["data_inicio"] = data_inicio
+            input_pe["data_termino"] = data_termino
+            input_pe["status"] = status_pe
+            input_pe["avaliacao"] = None
+            input_pe["data_avaliacao"] = None
+            response = self.put_plano_entregas(input_pe)
+            assert response.status_code == status.HTTP_201_CREATED
+
+    def list_planos_entregas(
+        self,
+        params: Optional[dict] = None,
+        cod_unidade_autorizadora: Optional[int] = None,
+        header_usr: Optional[dict] = None,
+    ) -> Response:
+        """Lista os planos de entregas pela API, usando o verbo GET.
+
+        Args:
+            params (dict): Parâmetros de consulta.
+            cod_unidade_autorizadora (int): O ID da unidade autorizadora.
+            header_usr (dict): Cabeçalhos HTTP para o usuário.
+
+        Returns:
+            httpx.Response: A resposta da API.
+        """
+        if cod_unidade_autorizadora is None:
+            cod_unidade_autorizadora = self.input_pe["cod_unidade_autorizadora"]
+        if header_usr is None:
+            header_usr = self.header_usr_1
+        return self.client.get(
+            f"/organizacao/SIAPE/{cod_unidade_autorizadora}/planos_entregas",
+            params=params,
+            headers=header_usr,
+        )
+
+    def test_list_planos_entregas_paginated(self):
+        """Percorre todas as páginas da listagem, uma por vez, e verifica
+        se todos os planos foram retornados em ordem e sem repetição."""
+        ids = []
+        params = {"limit": 2}
+        while True:
+            response = self.list_planos_entregas(params)
+            assert response.status_code == status.HTTP_200_OK
+            page = response.json()
+            assert len(page) <= 2
+            ids.extend(plano["id_plano_entregas"] for plano in page)
+            next_cursor = response.headers.get("X-Next-Cursor", None)
+            if next_cursor is None:
+                break
+            params["after"] = next_cursor
+
+        assert ids == ["1", "2", "3"]
+
+    def test_list_planos_entregas_without_entregas(self):
+        """Verifica que, por padrão, as entregas não são trazidas."""
+        response = self.list_planos_entregas()
+
+        assert response.status_code == status.HTTP_200_OK
+        assert all(plano["entregas"] is None for plano in response.json())
+
+    def test_list_planos_entregas_include_entregas(self):
+        """Verifica a inclusão das entregas na listagem."""
+        response = self.list_planos_entregas({"include": "entregas"})
+
+        assert response.status_code == status.HTTP_200_OK
+        planos = {plano["id_plano_entregas"]: plano for plano in response.json()}
+        self.assert_equal_plano_entregas(planos["1"], self.input_pe)
+
+    @pytest.mark.parametrize(
+        "params, expected_ids",
+        [
+            ({"status": 2}, ["3"]),
+            ({"cod_unidade_executora": 99}, ["1", "2", "3"]),
+            ({"cod_unidade_executora": 100}, []),
+            ({"data_inicio": "2024-06-15", "data_termino": "2024-07-15"}, ["1", "2"]),
+            ({"data_termino": "2024-03-31"}, ["1"]),
+        ],
+    )
+    def test_list_planos_entregas_filtered(self, params: dict, expected_ids: list):
+        """Verifica os filtros da listagem de planos de entregas."""
+        response = self.list_planos_entregas(params)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [plano["id_plano_entregas"] for plano in response.json()] == (
+            expected_ids
+        )
+
+    def test_list_planos_entregas_different_unit(self, header_usr_2: dict):
+        """Tenta listar os planos de entregas de uma unidade à qual o
+        usuário não tem acesso."""
+        response = self.list_planos_entregas(header_usr=header_usr_2)
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
@@ -0,0 +1,88 @@
+"""
+Testes do orçamento de consultas ao banco de dados dos endpoints de plano
+de entregas.
+"""
+
+from copy import deepcopy
+
+from fastapi import status
+from httpx import Client
+import pytest
+
+from ..conftest import QueryRecorder
+
+
+# Comandos da atualização de um plano de entregas: usuário, conflito de
+# período, plano existente, plano a apagar, remoção das entregas e do
+# plano, inclusão do plano e das entregas e releitura do plano gravado.
+PUT_QUERY_COUNT = 9
+
+
+class TestQueryBudgetPlanoEntregas:
+    """Testes da quantidade e do plano de execução das consultas feitas
+    ao consultar e gravar planos de entregas."""
+
+    # pylint: disable=too-many-arguments
+    @pytest.fixture(autouse=True)
+    def setup(
+        self,
+        truncate_pe,  # pylint: disable=unused-argument
+        input_pe: dict,
+        header_usr_1: dict,
+        query_recorder: QueryRecorder,
+        client: Client,
+    ):
+        """Configurar o ambiente de teste."""
+        # pylint: disable=attribute-defined-outside-init
+        self.input_pe = input_pe
+        self.header_usr_1 = header_usr_1
+        self.query_recorder = query_recorder
+        self.client = client
+        self.url = (
+            f"/organizacao/SIAPE/{input_pe['cod_unidade_autorizadora']}"
+            f"/plano_entregas/{input_pe['id_plano_entregas']}"
+        )
+
+    def plano_com_entregas(self, quantidade: int) -> dict:
+        """Monta o plano de entregas de exemplo com a quantidade informada
+        de entregas, copiadas da primeira entrega do exemplo."""
+        plano_entregas = deepcopy(self.input_pe)
+        plano_entregas["entregas"] = [
+            dict(self.input_pe["entregas"][0], id_entrega=str(numero))
+            for numero in range(quantidade)
+        ]
+        return plano_entregas
+
+    def count_put_queries(self, plano_entregas: dict) -> int:
+        """Grava o plano de entregas e retorna a quantidade de comandos SQL
+        executados, verificando se nenhum lê uma tabela grande por inteiro.
+        """
+        with self.query_recorder:
+            response = self.client.put(
+                self.url, json=plano_entregas, headers=self.header_usr_1
+            )
+        assert response.status_code in (status.HTTP_200_OK, status.HTTP_201_CREATED)
+        self.query_recorder.assert_no_seq_scan()
+        return self.query_recorder.count
+
+    def test_get_plano_entregas(self, example_pe):  # pylint: disable=unused-argument
+        """Consulta um plano de entregas com uma consulta para o usuário e
+        outra para o plano, com as suas entregas."""
+        with self.query_recorder:
+            response = self.client.get(self.url, headers=self.header_usr_1)
+
+        assert response.status_code == status.HTTP_200_OK
+        self.query_recorder.assert_max_queries(2)
+        self.query_recorder.assert_no_seq_scan()
+
+    def test_put_queries_independent_of_entregas(self):
+        """Verifica se a quantidade de comandos da criação e da atualização
+        de um plano de entregas é a esperada e não cresce com as
+        entregas."""
+        criacao = self.count_put_queries(self.plano_com_entregas(1))
+        atualizacao_1 = self.count_put_queries(self.plano_com_entregas(1))
+        atualizacao_50 = self.count_put_queries(self.plano_com_entregas(50))
+
+        self.query_recorder.assert_num_queries(PUT_QUERY_COUNT)
+        assert atualizacao_50 == atualizacao_1
+        assert criacao <= atualizacao_1
@@ -0,0 +1,132 @@
+"""
+Testes relacionados à listagem paginada de planos de trabalho de uma
+unidade autorizadora.
+"""
+
+from copy import deepcopy
+from typing import Optional
+
+from httpx import Response
+from fastapi import status
+
+import pytest
+
+from .core_test import BasePTTest
+
+# períodos que não se sobrepõem ao do plano de trabalho de exemplo
+EXTRA_PLANOS_TRABALHO = (
+    ("556", "2024-07-01", "2024-07-15", 3),
+    ("557", "2024-08-01", "2024-08-15", 4),
+)
+
+
+class TestListPlanosTrabalho(BasePTTest):
+    """Testes para a listagem de planos de trabalho."""
+
+    @pytest.fixture(autouse=True)
+    def create_planos_trabalho(self, setup):  # pylint: disable=unused-argument
+        """Cria o plano de trabalho de exemplo e mais alguns planos
+        do mesmo participante, em períodos distintos."""
+        response = self.put_plano_trabalho(self.input_pt)
+        assert response.status_code == status.HTTP_201_CREATED
+        for id_plano_trabalho, data_inicio, data_termino, status_pt in (
+            EXTRA_PLANOS_TRABALHO
+        ):
+            input_pt = deepcopy(self.input_pt)
+            input_pt["id_plano_trabalho"] = id_plano_trabalho
+            input_pt["data_inicio"] = data_inicio
+            input_pt["data_termino"] = data_termino
+            input_pt["status"] = status_pt
+            input_pt["avaliacoes_registros_execucao"] = []
+            response = self.put_plano_trabalho(input_pt)
+            assert response.status_code == status.HTTP_201_CREATED
+
+    def list_planos_trabalho(
+        self,
+        params: Optional[dict] = None,
+        cod_unidade_autorizadora: Optional[int] = None,
+        header_usr: Optional[dict] = None,
+    ) -> Response:
+        """Lista os planos de trabalho pela API, usando o verbo GET.
+
+        Args:
+            params (dict): Parâmetros de consulta.
+            cod_unidade_autorizadora (int): O ID da unidade autorizadora.
+            header_usr (dict): Cabeçalhos HTTP para o usuário.
+
+        Returns:
+            httpx.Response: A resposta da API.
+        """
+        if cod_unidade_autorizadora is None:
+            cod_unidade_autorizadora = self.input_pt["cod_unidade_autorizadora"]
+        if header_usr is None:
+            header_usr = self.header_usr_1
+        return self.client.get(
+            f"/organizacao/SIAPE/{cod_unidade_autorizadora}/planos_trabalho",
+            params=params,
+            headers=header_usr,
+        )
+
+    def test_list_planos_trabalho_paginated(self):
+        """Percorre todas as páginas da listagem, uma por vez, e verifica
+        se todos os planos foram retornados em ordem e sem repetição."""
+        ids = []
+        params = {"limit": 2}
+        while True:
+            response = self.list_planos_trabalho(params)
+            assert response.status_code == status.HTTP_200_OK
+            page = response.json()
+            assert len(page) <= 2
+            ids.extend(plano["id_plano_trabalho"] for plano in page)
+            next_cursor = response.headers.get("X-Next-Cursor", None)
+            if next_cursor is None:
+                break
+            params["after"] = next_cursor
+
+        assert ids == ["555", "556", "557"]
+
+    def test_list_planos_trabalho_without_children(self):
+        """Verifica que, por padrão, as listas de filhos não são trazidas."""
+        response = self.list_planos_trabalho()
+
+        assert response.status_code == status.HTTP_200_OK
+        for plano in response.json():
+            assert plano["contribuicoes"] is None
+            assert plano["avaliacoes_registros_execucao"] is None
+
+    def test_list_planos_trabalho_include_children(self):
+        """Verifica a inclusão das listas de filhos na listagem."""
+        response = self.list_planos_trabalho(
+            {"include": ["contribuicoes", "avaliacoes_registros_execucao"]}
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        planos = {plano["id_plano_trabalho"]: plano for plano in response.json()}
+        self.assert_equal_plano_trabalho(planos["555"], self.input_pt)
+
+    @pytest.mark.parametrize(
+        "params, expected_ids",
+        [
+            ({"status": 4}, ["557"]),
+            ({"matricula_siape": "1237654"}, ["555", "556", "557"]),
+            ({"matricula_siape": "7654321"}, []),
+            ({"cod_unidade_executora": 99}, ["555", "556", "557"]),
+            ({"data_inicio": "2024-07-10", "data_termino": "2024-07-20"}, ["556"]),
+            ({"data_inicio": "2024-07-16"}, ["557"]),
+        ],
+    )
+    def test_list_planos_trabalho_filtered(self, params: dict, expected_ids: list):
+        """Verifica os filtros da listagem de planos de trabalho."""
+        response = self.list_planos_trabalho(params)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [plano["id_plano_trabalho"] for plano in response.json()] == (
+            expected_ids
+        )
+
+    def test_list_planos_trabalho_different_unit(self, header_usr_2: dict):
+        """Tenta listar os planos de trabalho de uma unidade à qual o
+        usuário não tem acesso."""
+        response = self.list_planos_trabalho(header_usr=header_usr_2)
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
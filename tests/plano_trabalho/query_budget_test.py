@@ -0,0 +1,119 @@
+"""
+Testes do orçamento de consultas ao banco de dados dos endpoints de plano
+de trabalho.
+"""
+
+from copy import deepcopy
+
+from fastapi import status
+from httpx import Client
+import pytest
+
+from ..conftest import QueryRecorder
+
+
+# Entregas do plano de entregas de exemplo referenciadas pelas
+# contribuições dos testes
+QUANTIDADE_ENTREGAS = 50
+
+# Comandos da atualização de um plano de trabalho: usuário, conflito de
+# período, plano existente, plano a apagar, remoção do plano, das
+# contribuições e das avaliações, participante, entregas, inclusão do
+# plano, das contribuições e das avaliações e releitura do plano gravado.
+PUT_QUERY_COUNT = 13
+
+
+class TestQueryBudgetPlanoTrabalho:
+    """Testes da quantidade e do plano de execução das consultas feitas
+    ao consultar e gravar planos de trabalho."""
+
+    # pylint: disable=too-many-arguments
+    @pytest.fixture(autouse=True)
+    def setup(
+        self,
+        truncate_pe,  # pylint: disable=unused-argument
+        truncate_pt,  # pylint: disable=unused-argument
+        example_pe,  # pylint: disable=unused-argument
+        example_part,  # pylint: disable=unused-argument
+        input_pe: dict,
+        input_pt: dict,
+        header_usr_1: dict,
+        query_recorder: QueryRecorder,
+        client: Client,
+    ):
+        """Configurar o ambiente de teste, com QUANTIDADE_ENTREGAS entregas
+        no plano de entregas de exemplo."""
+        input_pe["entregas"] = [
+            dict(input_pe["entregas"][0], id_entrega=str(numero))
+            for numero in range(QUANTIDADE_ENTREGAS)
+        ]
+        response = client.put(
+            f"/organizacao/SIAPE/{input_pe['cod_unidade_autorizadora']}"
+            f"/plano_entregas/{input_pe['id_plano_entregas']}",
+            json=input_pe,
+            headers=header_usr_1,
+        )
+        assert response.status_code == status.HTTP_200_OK
+        # pylint: disable=attribute-defined-outside-init
+        self.input_pe = input_pe
+        self.input_pt = input_pt
+        self.header_usr_1 = header_usr_1
+        self.query_recorder = query_recorder
+        self.client = client
+        self.url = (
+            f"/organizacao/SIAPE/{input_pt['cod_unidade_autorizadora']}"
+            f"/plano_trabalho/{input_pt['id_plano_trabalho']}"
+        )
+
+    def plano_com_contribuicoes(self, quantidade: int) -> dict:
+        """Monta o plano de trabalho de exemplo com a quantidade informada
+        de contribuições, cada uma para uma entrega diferente do plano de
+        entregas de exemplo."""
+        plano_trabalho = deepcopy(self.input_pt)
+        plano_trabalho["contribuicoes"] = [
+            {
+                "id_contribuicao": str(numero),
+                "tipo_contribuicao": 1,
+                "id_plano_entregas": self.input_pe["id_plano_entregas"],
+                "id_entrega": str(numero),
+                "percentual_contribuicao": 1,
+            }
+            for numero in range(quantidade)
+        ]
+        return plano_trabalho
+
+    def count_put_queries(self, plano_trabalho: dict) -> int:
+        """Grava o plano de trabalho e retorna a quantidade de comandos SQL
+        executados, verificando se nenhum lê uma tabela grande por inteiro.
+        """
+        with self.query_recorder:
+            response = self.client.put(
+                self.url, json=plano_trabalho, headers=self.header_usr_1
+            )
+        assert response.status_code in (status.HTTP_200_OK, status.HTTP_201_CREATED)
+        self.query_recorder.assert_no_seq_scan()
+        return self.query_recorder.count
+
+    def test_get_plano_trabalho(self, example_pt):  # pylint: disable=unused-argument
+        """Consulta um plano de trabalho com uma consulta para o usuário e
+        outra para o plano, com as contribuições e avaliações."""
+        with self.query_recorder:
+            response = self.client.get(self.url, headers=self.header_usr_1)
+
+        assert response.status_code == status.HTTP_200_OK
+        self.query_recorder.assert_max_queries(2)
+        self.query_recorder.assert_no_seq_scan()
+
+    def test_put_queries_independent_of_contribuicoes(self):
+        """Verifica se a quantidade de comandos da criação e da atualização
+        de um plano de trabalho é a esperada e não cresce com as
+        contribuições vinculadas a entregas."""
+        criacao = self.count_put_queries(self.plano_com_contribuicoes(1))
+        atualizacao_1 = self.count_put_queries(self.plano_com_contribuicoes(1))
+        atualizacao_50 = self.count_put_queries(
+            self.plano_com_contribuicoes(QUANTIDADE_ENTREGAS)
+        )
+
+        self.query_recorder.assert_num_queries(PUT_QUERY_COUNT)
+        assert atualizacao_50 == atualizacao_1
+        assert criacao <= atualizacao_1
@@ -0,0 +1,77 @@
+"""
+Testes relacionados ao profiling de requisições pedido pelo administrador.
+"""
+
+from fastapi import status
+from httpx import Client
+import pytest
+
+from profiling import PROFILE_HEADER
+
+
+@pytest.mark.parametrize(
+    "profile_format, content_type",
+    [
+        ("html", "text/html"),
+        ("speedscope", "application/json"),
+    ],
+)
+def test_profiling_requested_by_admin(
+    client: Client,
+    header_admin: dict,
+    admin_credentials: dict,
+    profile_format: str,
+    content_type: str,
+):
+    """Pede o profiling de uma requisição e baixa o resultado."""
+    response = client.get(
+        f"/user/{admin_credentials['username']}",
+        headers={**header_admin, PROFILE_HEADER: profile_format},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    nome = response.headers[PROFILE_HEADER]
+
+    response = client.get(f"/profiling/{nome}", headers=header_admin)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["Content-Type"].startswith(content_type)
+    assert response.content
+
+
+def test_profiling_ignored_for_non_admin(
+    client: Client, header_usr_1: dict, user1_credentials: dict
+):
+    """Verifica se o cabeçalho de profiling é ignorado para quem não é
+    administrador."""
+    response = client.get(
+        f"/user/{user1_credentials['username']}",
+        headers={**header_usr_1, PROFILE_HEADER: "html"},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert PROFILE_HEADER not in response.headers
+
+
+def test_get_profiling_not_admin(client: Client, header_usr_1: dict):
+    """Tenta baixar um profiling sem ser administrador."""
+    response = client.get("/profiling/inexistente.html", headers=header_usr_1)
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.parametrize(
+    "nome, status_code",
+    [
+        ("inexistente.html", status.HTTP_404_NOT_FOUND),
+        (".oculto.html", status.HTTP_422_UNPROCESSABLE_ENTITY),
+        ("perfil.txt", status.HTTP_422_UNPROCESSABLE_ENTITY),
+    ],
+)
+def test_get_profiling_invalid(
+    client: Client, header_admin: dict, nome: str, status_code: int
+):
+    """Tenta baixar um profiling inexistente ou com nome inválido."""
+    response = client.get(f"/profiling/{nome}", headers=header_admin)
+
+    assert response.status_code == status_code
@@ -0,0 +1,131 @@
+"""
+Testes do direcionamento das consultas à réplica de leitura.
+"""
+
+import asyncio
+from typing import Optional
+
+from fastapi import status
+from httpx import Client
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+import db_config
+from db_config import (
+    DbContextManager,
+    PrimaryReadDbContextManager,
+    ReadDbContextManager,
+)
+from replica_consistency import (
+    WAL_LSN_COOKIE,
+    parse_wal_lsn,
+    track_replica_consistency,
+)
+
+
+@pytest.fixture(name="replica")
+def fixture_replica(monkeypatch: pytest.MonkeyPatch):
+    """Configura uma "réplica" que é outro engine para o mesmo banco de
+    dados, distinguível do engine principal. Sem pool, para que as conexões
+    não fiquem presas ao event loop do TestClient.
+
+    Como não é uma réplica de verdade, pg_last_wal_replay_lsn() é nulo e
+    ela nunca está em dia com uma gravação."""
+    replica_engine = create_async_engine(
+        db_config.SQLALCHEMY_DATABASE_URL, poolclass=NullPool
+    )
+    monkeypatch.setattr(db_config, "replica_engine", replica_engine)
+    monkeypatch.setattr(
+        db_config,
+        "replica_session_maker",
+        async_sessionmaker(replica_engine, expire_on_commit=False),
+    )
+    yield replica_engine
+    asyncio.get_event_loop().run_until_complete(replica_engine.dispose())
+
+
+def session_engines(
+    required_lsn: Optional[str], *context_managers: DbContextManager
+) -> list:
+    """Abre, em sequência, sessões numa mesma requisição, cujo cliente
+    informou a posição do WAL required_lsn, e retorna os seus engines."""
+
+    async def open_sessions():
+        engines = []
+        with track_replica_consistency(required_lsn):
+            for context_manager in context_managers:
+                async with context_manager as session:
+                    engines.append(session.bind)
+        return engines
+
+    return asyncio.get_event_loop().run_until_complete(open_sessions())
+
+
+def test_read_session_uses_replica_without_writes(replica):
+    """Verifica se as consultas de um cliente sem gravações recentes vão
+    para a réplica e as da autenticação, para o banco principal."""
+    assert session_engines(
+        None, ReadDbContextManager(), PrimaryReadDbContextManager()
+    ) == [replica, db_config.engine]
+
+
+def test_read_session_uses_primary_until_replica_replays(
+    replica,  # pylint: disable=unused-argument
+):
+    """Verifica se as consultas de um cliente com uma gravação recente vão
+    para o banco principal enquanto a réplica não a reproduz."""
+    assert session_engines("0/0", ReadDbContextManager()) == [db_config.engine]
+
+
+def test_write_session_reads_from_primary(
+    replica,  # pylint: disable=unused-argument
+):
+    """Verifica se, após gravar, as consultas da mesma requisição vão para
+    o banco principal."""
+    assert session_engines(
+        None, DbContextManager(), ReadDbContextManager()
+    ) == [db_config.engine, db_config.engine]
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("16/B374D848", "16/B374D848"),
+        ("0/0", "0/0"),
+        (None, None),
+        ("", None),
+        ("16/B374D848'; SELECT 1", None),
+        ("123456789/0", None),
+    ],
+)
+def test_parse_wal_lsn(value: Optional[str], expected: Optional[str]):
+    """Verifica se somente posições do WAL válidas são aceitas do cliente."""
+    assert parse_wal_lsn(value) == expected
+
+
+def test_write_endpoint_sets_wal_lsn_cookie(
+    replica,  # pylint: disable=unused-argument
+    truncate_participantes,  # pylint: disable=unused-argument
+    input_part: dict,
+    header_usr_1: dict,
+    client: Client,
+):
+    """Grava um participante pela API e verifica se a resposta traz a
+    posição do WAL da gravação, com a qual o cliente lê o participante."""
+    url = (
+        f"/organizacao/SIAPE/{input_part['cod_unidade_autorizadora']}"
+        f"/{input_part['cod_unidade_lotacao']}"
+        f"/participante/{input_part['matricula_siape']}"
+    )
+    try:
+        response = client.put(url, json=input_part, headers=header_usr_1)
+        assert response.status_code == status.HTTP_201_CREATED
+        assert parse_wal_lsn(response.cookies.get(WAL_LSN_COOKIE))
+        assert "Max-Age=" in response.headers["Set-Cookie"]
+
+        response = client.get(url, headers=header_usr_1)
+        assert response.status_code == status.HTTP_200_OK
+        assert "Set-Cookie" not in response.headers
+    finally:
+        client.cookies.clear()
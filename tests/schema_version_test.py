@@ -0,0 +1,41 @@
+"""
+Testes relacionados à aplicação versionada do DDL de inicialização.
+"""
+
+import asyncio
+
+from sqlalchemy.sql import text
+
+from api import DB_AUDIT_LOGS_ENABLED, DB_AUDIT_LOGS_MODE
+from db_config import apply_schema_changes, get_sync_engine
+
+AUDIT_MODE = DB_AUDIT_LOGS_MODE if DB_AUDIT_LOGS_ENABLED else None
+
+
+def test_apply_schema_changes_skips_unchanged():
+    """Aplica o DDL duas vezes e verifica se a segunda não faz nada."""
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(apply_schema_changes(AUDIT_MODE))
+
+    applied = loop.run_until_complete(apply_schema_changes(AUDIT_MODE))
+
+    assert applied == []
+
+
+def test_apply_schema_changes_reapplies_changed_component():
+    """Altera a versão registrada de um componente e verifica se somente
+    ele é aplicado novamente."""
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(apply_schema_changes(AUDIT_MODE))
+    with get_sync_engine().connect() as conn:
+        conn.execute(
+            text(
+                "UPDATE schema_version SET versao = 'antiga' "
+                "WHERE componente = 'feed_alteracoes';"
+            )
+        )
+        conn.commit()
+
+    applied = loop.run_until_complete(apply_schema_changes(AUDIT_MODE))
+
+    assert applied == ["feed_alteracoes"]
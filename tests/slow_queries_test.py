@@ -0,0 +1,151 @@
+"""
+Testes relacionados ao registro de consultas lentas.
+"""
+
+import asyncio
+import logging
+
+from fastapi import status
+from fastapi.testclient import TestClient
+from httpx import Client
+import pytest
+
+from slow_queries import (
+    REDACTED_CPF,
+    SLOW_QUERY_THRESHOLD,
+    fingerprint,
+    redact,
+    seq_scan_relations,
+    slow_query_log,
+)
+
+
+@pytest.mark.parametrize(
+    "statement, expected",
+    [
+        (
+            "SELECT * FROM plano_trabalho WHERE id IN "
+            "(%(id_1_1)s, %(id_1_2)s, %(id_1_3)s)",
+            "SELECT * FROM plano_trabalho WHERE id IN (?)",
+        ),
+        (
+            "INSERT INTO contribuicao (a, b)\n  VALUES (%s, %s), (%s, %s)",
+            "INSERT INTO contribuicao (a, b) VALUES (?)",
+        ),
+        (
+            "SELECT * FROM users WHERE email = 'a@b.com' LIMIT 10",
+            "SELECT * FROM users WHERE email = ? LIMIT ?",
+        ),
+    ],
+)
+def test_fingerprint(statement: str, expected: str):
+    """Verifica se o fingerprint não depende dos valores nem do tamanho
+    das listas de parâmetros."""
+    assert fingerprint(statement) == expected
+
+
+def test_fingerprint_same_for_different_list_sizes():
+    """Consultas iguais exceto pelo tamanho da lista têm o mesmo
+    fingerprint."""
+    assert fingerprint("SELECT 1 WHERE id IN (%s)") == fingerprint(
+        "SELECT 1 WHERE id IN (%s, %s, %s, %s)"
+    )
+
+
+def test_redact_cpf():
+    """Verifica se os CPFs são ocultados pelo nome do parâmetro e pelo
+    valor."""
+    parameters = {
+        "cpf_participante_1": "64635210046",
+        "email": "x@y.com",
+        "texto": "CPF 64635210046 citado",
+        "ids": [1, "64635210046"],
+        "id": 42,
+    }
+
+    assert redact(parameters) == {
+        "cpf_participante_1": REDACTED_CPF,
+        "email": "x@y.com",
+        "texto": f"CPF {REDACTED_CPF} citado",
+        "ids": [1, REDACTED_CPF],
+        "id": 42,
+    }
+
+
+def test_seq_scan_relations():
+    """Encontra as tabelas lidas sequencialmente num plano em JSON."""
+    plan = [
+        {
+            "Plan": {
+                "Node Type": "Nested Loop",
+                "Plans": [
+                    {"Node Type": "Seq Scan", "Relation Name": "participante"},
+                    {
+                        "Node Type": "Index Scan",
+                        "Relation Name": "plano_trabalho",
+                    },
+                ],
+            }
+        }
+    ]
+
+    assert seq_scan_relations(plan) == ["participante"]
+
+
+def test_get_consultas_lentas_admin(client: Client, header_admin: dict):
+    """Consulta os totais das consultas lentas como administrador."""
+    response = client.get("/consultas_lentas", headers=header_admin)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert isinstance(response.json(), list)
+
+
+def test_get_consultas_lentas_not_admin(client: Client, header_usr_1: dict):
+    """Tenta consultar as consultas lentas sem ser administrador."""
+    response = client.get("/consultas_lentas", headers=header_usr_1)
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.skipif(
+    SLOW_QUERY_THRESHOLD <= 0, reason="Registro de consultas lentas desativado"
+)
+def test_slow_query_logged_with_plan(
+    truncate_participantes,  # pylint: disable=unused-argument
+    input_part: dict,
+    header_usr_1: dict,
+    client: TestClient,
+    caplog: pytest.LogCaptureFixture,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """Grava um participante com um limite de consulta lenta que todo
+    comando ultrapassa e verifica se o comando de crud.py é registrado com
+    a origem, o plano de execução e o CPF ocultado."""
+    monkeypatch.setattr(slow_query_log, "threshold", 1e-9)
+    monkeypatch.setattr(slow_query_log, "stats", {})
+
+    async def wait_explains():
+        while slow_query_log.tasks:
+            await asyncio.gather(*slow_query_log.tasks)
+
+    with caplog.at_level(logging.WARNING, logger="uvicorn.error"):
+        response = client.put(
+            f"/organizacao/SIAPE/{input_part['cod_unidade_autorizadora']}"
+            f"/{input_part['cod_unidade_lotacao']}"
+            f"/participante/{input_part['matricula_siape']}",
+            json=input_part,
+            headers=header_usr_1,
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        client.portal.call(wait_explains)
+
+    inserts = [
+        stats
+        for stats in slow_query_log.summary()
+        if stats["statement"].startswith("INSERT INTO participante")
+    ]
+    assert inserts
+    assert inserts[0]["origins"] == ["crud.create_participante"]
+    assert inserts[0]["plan"] is not None
+    assert REDACTED_CPF in caplog.text
+    assert input_part["cpf"] not in caplog.text
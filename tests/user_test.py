@@ -6,9 +6,11 @@ Disclaimer:
     * header_usr_2: dict is_admin=True
 """
 
+import asyncio
 from datetime import datetime
 from imaplib import IMAP4
 import email
+import json
 import re
 from typing import Generator
 
@@ -16,7 +18,10 @@ from httpx import HTTPStatusError, Response
 from fastapi import status
 from fastapi.testclient import TestClient
 import pytest
+from sqlalchemy.sql import text
 
+from crud_auth import API_PGD_ADMIN_USER, init_user_admin
+from db_config import get_sync_engine
 from .conftest import get_bearer_token
 
 
@@ -257,6 +262,70 @@ class TestGetUsers(BaseUserTest):
         response = self.get_users(header_usr_1)
         assert response.status_code == status.HTTP_200_OK
 
+    def test_get_users_paginated(self, header_usr_1: dict):
+        """Testa a paginação por cursor da lista de usuários.
+
+        Args:
+            header_usr_1 (dict): Cabeçalhos HTTP para o usuário 1 (admin).
+        """
+        all_users = self.get_users(header_usr_1).json()
+        emails = []
+        params = {"limit": 1}
+        while True:
+            response = self.client.get("/users", headers=header_usr_1, params=params)
+            assert response.status_code == status.HTTP_200_OK
+            page = response.json()
+            assert len(page) <= 1
+            emails.extend(user["email"] for user in page)
+            next_cursor = response.headers.get("X-Next-Cursor", None)
+            if next_cursor is None:
+                break
+            params["after_id"] = next_cursor
+
+        assert emails == [user["email"] for user in all_users]
+
+    def test_get_users_filtered(self, header_usr_1: dict, user2_credentials: dict):
+        """Testa a filtragem da lista de usuários por unidade autorizadora.
+
+        Args:
+            header_usr_1 (dict): Cabeçalhos HTTP para o usuário 1 (admin).
+            user2_credentials (dict): Credenciais do usuário 2.
+        """
+        response = self.client.get(
+            "/users",
+            headers=header_usr_1,
+            params={
+                "origem_unidade": user2_credentials["origem_unidade"],
+                "cod_unidade_autorizadora": user2_credentials[
+                    "cod_unidade_autorizadora"
+                ],
+            },
+        )
+        assert response.status_code == status.HTTP_200_OK
+        users = response.json()
+        assert user2_credentials["email"] in [user["email"] for user in users]
+        assert all(
+            user["cod_unidade_autorizadora"]
+            == user2_credentials["cod_unidade_autorizadora"]
+            for user in users
+        )
+
+    def test_get_users_ndjson(self, header_usr_1: dict):
+        """Testa a obtenção da lista de usuários transmitida em NDJSON.
+
+        Args:
+            header_usr_1 (dict): Cabeçalhos HTTP para o usuário 1 (admin).
+        """
+        all_users = self.get_users(header_usr_1).json()
+        headers = {**header_usr_1, "Accept": "application/x-ndjson"}
+        response = self.client.get("/users", headers=headers)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["Content-Type"].startswith("application/x-ndjson")
+        users = [json.loads(line) for line in response.text.splitlines() if line]
+        assert users == all_users
+        assert all("password" not in user for user in users)
+
 
 # get /user
 
@@ -691,3 +760,26 @@ class TestForgotPassword(BaseUserTest):
             },
         )
         assert response.status_code == status.HTTP_200_OK
+
+
+def test_init_user_admin_concurrently():
+    """Inicializa o usuário administrador em vários processos simulados
+    ao mesmo tempo e verifica se ele é criado uma única vez, sem erros."""
+    with get_sync_engine().connect() as conn:
+        conn.execute(
+            text("DELETE FROM users WHERE email = :email;"),
+            {"email": API_PGD_ADMIN_USER},
+        )
+        conn.commit()
+
+    async def init_concurrently():
+        await asyncio.gather(*(init_user_admin() for _ in range(5)))
+
+    asyncio.get_event_loop().run_until_complete(init_concurrently())
+
+    with get_sync_engine().connect() as conn:
+        count = conn.execute(
+            text("SELECT count(*) FROM users WHERE email = :email;"),
+            {"email": API_PGD_ADMIN_USER},
+        ).scalar_one()
+    assert count == 1